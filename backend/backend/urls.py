@@ -6,5 +6,6 @@ urlpatterns = [
     path('api/auth/', include('authentication.urls')),
     path('api/shopping-lists/', include('shoppingList.urls')),
     path('api/profile/', include('profiles.urls')),
-    path('api/transactions/', include('transactions.urls'))
+    path('api/transactions/', include('transactions.urls')),
+    path('api/products/', include('products.urls'))
 ]
\ No newline at end of file
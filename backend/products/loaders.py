@@ -0,0 +1,104 @@
+# products/loaders.py
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from .models import Product
+
+
+class ProductLoader:
+    """
+    Request-scoped cache of Product instances.
+
+    Nested write serializers reference products by id, one line item at a time.
+    Instead of one SELECT per line item, the ids of a whole payload are collected
+    up front with prime() and resolved with a single id__in query; validation and
+    creation then read the cached instances with get(). Ids that were not primed
+    are loaded on demand, so a missing prime() costs queries but never correctness.
+    """
+
+    def __init__(self):
+        self._products = {}
+        self._missing = set()
+
+    @classmethod
+    def for_context(cls, context):
+        """
+        Return the loader shared by everything validated for the same request
+        (or the same serializer context when there is no request).
+        """
+        request = context.get('request')
+        if request is not None:
+            if not hasattr(request, '_product_loader'):
+                request._product_loader = cls()
+            return request._product_loader
+        return context.setdefault('product_loader', cls())
+
+    @staticmethod
+    def parse_id(value):
+        """Return value as a product primary key, or None if it is not a valid one."""
+        if isinstance(value, bool):
+            return None
+        try:
+            return Product._meta.pk.to_python(value)
+        except (DjangoValidationError, TypeError, ValueError):
+            return None
+
+    def prime(self, ids):
+        """Load every not yet known product id in one query."""
+        ids = {self.parse_id(value) for value in ids} - {None}
+        pending = ids - self._products.keys() - self._missing
+        if pending:
+            self._products.update(Product.objects.in_bulk(pending))
+            self._missing.update(pending - self._products.keys())
+
+    def prime_from(self, items, key='product_id'):
+        """prime() with the ids found under `key` in a list of raw payload items."""
+        self.prime(self._ids_in(items, key))
+
+    def prime_from_rows(self, rows, items_key='products', key='product_id'):
+        """prime() with the ids of the line items of many raw payloads (bulk uploads, imports)."""
+        self.prime(
+            product_id for row in rows if isinstance(row, dict)
+            for product_id in self._ids_in(row.get(items_key), key)
+        )
+
+    @staticmethod
+    def _ids_in(items, key):
+        if not isinstance(items, list):
+            return []
+        return [item[key] for item in items if isinstance(item, dict) and key in item]
+
+    def get(self, product_id):
+        """Return the cached Product for product_id, or None if it does not exist."""
+        product_id = self.parse_id(product_id)
+        if product_id is None:
+            return None
+        if product_id not in self._products and product_id not in self._missing:
+            self.prime([product_id])
+        return self._products.get(product_id)
+
+
+class LoadedProductField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField for products that resolves ids through the context's ProductLoader."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('queryset', Product.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or ProductLoader.parse_id(data) is None:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        product = ProductLoader.for_context(self.context).get(data)
+        if product is None:
+            self.fail('does_not_exist', pk_value=data)
+        return product
+
+
+class ProductLoadingListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer for line items: primes the product loader with every
+    `product_id` in the list before the items are validated one by one.
+    """
+
+    def to_internal_value(self, data):
+        ProductLoader.for_context(self.context).prime_from(data)
+        return super().to_internal_value(data)
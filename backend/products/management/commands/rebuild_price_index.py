@@ -0,0 +1,32 @@
+# products/management/commands/rebuild_price_index.py
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from products.services import PriceIndexService
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user product price index from ACTUAL transaction history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Only rebuild the index for the given user id (may be repeated).'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(transactions__isnull=False).distinct().order_by('id')
+        if options['user_ids']:
+            users = User.objects.filter(id__in=options['user_ids']).order_by('id')
+
+        total_users = 0
+        total_rows = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            total_rows += PriceIndexService(user_id).rebuild()
+            total_users += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {total_rows} price index row(s) for {total_users} user(s).'
+        ))
@@ -0,0 +1,12 @@
+# products/management/commands/rebuild_product_search.py
+from django.core.management.base import BaseCommand
+
+from products.search import ProductSearchIndex
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product name search index (e.g. after a bulk catalog import).'
+
+    def handle(self, *args, **options):
+        indexed = ProductSearchIndex.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} product(s).'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_productpriceindex'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFrequency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('average_interval_days', models.IntegerField()),
+                ('interval_variance', models.FloatField(default=0)),
+                ('frequency_category', models.CharField(choices=[('WEEKLY', 'Weekly'), ('FORTNIGHTLY', 'Fortnightly'), ('MONTHLY', 'Monthly'), ('CUSTOM', 'Custom')], max_length=20)),
+                ('last_purchase_date', models.DateField()),
+                ('total_purchases', models.IntegerField()),
+                ('confidence_score', models.DecimalField(decimal_places=2, max_digits=3)),
+                ('last_calculated', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='frequencies', to='products.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_frequencies', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['product__name'],
+                'unique_together': {('user', 'product')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:06
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def fill_interval_mean(apps, schema_editor):
+    """The mean interval is the span between first and last purchase day over the interval count."""
+    ProductFrequency = apps.get_model('products', 'ProductFrequency')
+    TransactionProduct = apps.get_model('transactions', 'TransactionProduct')
+    first_days = {
+        (user_id, product_id): first_day
+        for user_id, product_id, first_day in TransactionProduct.objects
+        .filter(transaction__transaction_type='ACTUAL')
+        .values_list('transaction__user_id', 'product_id')
+        .annotate(first_day=Min('transaction__transaction_date'))
+        .order_by()
+    }
+    frequencies = list(ProductFrequency.objects.filter(total_purchases__gt=1))
+    for frequency in frequencies:
+        first_day = first_days.get((frequency.user_id, frequency.product_id))
+        if first_day is None:
+            frequency.interval_mean = frequency.average_interval_days
+        else:
+            frequency.interval_mean = (
+                (frequency.last_purchase_date - first_day).days / (frequency.total_purchases - 1)
+            )
+    ProductFrequency.objects.bulk_update(frequencies, ['interval_mean'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_productfrequency'),
+        ('transactions', '0006_transaction_receipt_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productfrequency',
+            name='interval_mean',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(fill_interval_mean, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:10
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def index_existing_products(apps, schema_editor):
+    """Same normalization as ProductSearchIndex.tokenize at the time of this migration."""
+    Product = apps.get_model('products', 'Product')
+    ProductSearchTerm = apps.get_model('products', 'ProductSearchTerm')
+    terms = []
+    for product_id, name in Product.objects.values_list('id', 'name').iterator():
+        text = unicodedata.normalize('NFKD', name or '')
+        text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+        for position, term in enumerate(re.findall(r'\w+', text)):
+            terms.append(ProductSearchTerm(product_id=product_id, term=term[:100], position=position))
+    ProductSearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_productfrequency_interval_mean'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('position', models.PositiveSmallIntegerField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'name'], name='products_pr_categor_863729_idx'),
+        ),
+        migrations.AddField(
+            model_name='productsearchterm',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='products.product'),
+        ),
+        migrations.AddIndex(
+            model_name='productsearchterm',
+            index=models.Index(fields=['term', 'product'], name='products_pr_term_519224_idx'),
+        ),
+        migrations.RunPython(index_existing_products, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 
 class Product(models.Model):
@@ -8,6 +9,82 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['category', 'name']),
+        ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class ProductSearchTerm(models.Model):
+    """
+    One normalized word of a product name, maintained by ProductSearchIndex on
+    product writes. Prefix lookups are range scans on the term index.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=100)
+    # Word position in the name, 0 for the first word
+    position = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'product']),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.product_id}"
+
+class ProductPriceIndex(models.Model):
+    """
+    What a user has recently paid for a product, maintained incrementally from
+    their ACTUAL purchases so pricing an item is a single indexed lookup.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='product_prices')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_index')
+    last_price = models.DecimalField(max_digits=10, decimal_places=2)
+    last_purchased_on = models.DateField()
+    # Mean and median over the prices kept in recent_prices
+    mean_price = models.DecimalField(max_digits=10, decimal_places=2)
+    median_price = models.DecimalField(max_digits=10, decimal_places=2)
+    purchase_count = models.PositiveIntegerField(default=0)
+    # [[purchase_date, price], ...] oldest first, at most PriceIndexService.RECENT_PRICES entries
+    recent_prices = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'product')
+
+    def __str__(self):
+        return f"{self.product} for user {self.user_id}: {self.median_price}"
+
+class ProductFrequency(models.Model):
+    """
+    How often a user buys a product, computed from the intervals between the
+    distinct days of their ACTUAL purchases (see ProductFrequencyCalculator).
+    """
+    FREQUENCY_CHOICES = [
+        ('WEEKLY', 'Weekly'),
+        ('FORTNIGHTLY', 'Fortnightly'),
+        ('MONTHLY', 'Monthly'),
+        ('CUSTOM', 'Custom'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='product_frequencies')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='frequencies')
+    average_interval_days = models.IntegerField()  # Days between purchases
+    # Running statistics of the intervals, updated in place on new purchases:
+    # exact mean and population variance (days squared)
+    interval_mean = models.FloatField(default=0)
+    interval_variance = models.FloatField(default=0)
+    frequency_category = models.CharField(max_length=20, choices=FREQUENCY_CHOICES)
+    last_purchase_date = models.DateField()
+    total_purchases = models.IntegerField()
+    confidence_score = models.DecimalField(max_digits=3, decimal_places=2)  # 0.00-1.00
+    last_calculated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'product')
+        ordering = ['product__name']
+
+    def __str__(self):
+        return f"{self.product} every {self.average_interval_days} days for user {self.user_id}"
@@ -0,0 +1,108 @@
+# products/search.py
+import re
+import unicodedata
+from django.db import transaction as db_transaction
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.functions import Length
+from .models import Product, ProductSearchTerm
+
+WORD = re.compile(r'\w+')
+# Sorts after every character a term can contain, so [prefix, prefix + MAX_CHAR) covers all completions
+MAX_CHAR = '\U0010ffff'
+
+
+class ProductSearchIndex:
+    """
+    Name search over the product catalog backed by ProductSearchTerm.
+
+    Every product name is split into normalized words (lowercase, accents removed),
+    stored one row per word. A query matches the products that have, for each of its
+    words, a stored word starting with it, so "gre ap" finds "Green Apples". Each word
+    is resolved with a range scan on the term index instead of a LIKE over every name.
+    Matches are ranked exact name first, then names starting with the query, then
+    shorter names.
+
+    The terms are rewritten by the post_save signal in products/signals.py; bulk
+    loads that bypass save() should call index_products() or the
+    rebuild_product_search command.
+    """
+    MAX_TERM_LENGTH = 100
+    AUTOCOMPLETE_LIMIT = 10
+    MAX_AUTOCOMPLETE_LIMIT = 50
+    # A one-letter prefix matches a large share of the catalog, and ranking all of
+    # those costs more than the round trip, so completions start at two characters
+    MIN_AUTOCOMPLETE_LENGTH = 2
+
+    @staticmethod
+    def normalize(text):
+        text = unicodedata.normalize('NFKD', text or '')
+        return ''.join(char for char in text if not unicodedata.combining(char)).lower()
+
+    @classmethod
+    def tokenize(cls, text):
+        """Return the normalized words of text, in order."""
+        return [word[:cls.MAX_TERM_LENGTH] for word in WORD.findall(cls.normalize(text))]
+
+    @classmethod
+    def index_products(cls, products):
+        """(Re)write the search terms of the given products."""
+        products = list(products)
+        terms = [
+            ProductSearchTerm(product_id=product.id, term=term, position=position)
+            for product in products
+            for position, term in enumerate(cls.tokenize(product.name))
+        ]
+        with db_transaction.atomic():
+            ProductSearchTerm.objects.filter(product_id__in=[product.id for product in products]).delete()
+            ProductSearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        """Rewrite the terms of the whole catalog. Returns the number of products indexed."""
+        indexed = 0
+        with db_transaction.atomic():
+            ProductSearchTerm.objects.all().delete()
+            batch = []
+            for product in Product.objects.only('id', 'name').order_by('id').iterator(chunk_size=batch_size):
+                batch.append(product)
+                if len(batch) >= batch_size:
+                    cls.index_products(batch)
+                    indexed += len(batch)
+                    batch = []
+            if batch:
+                cls.index_products(batch)
+                indexed += len(batch)
+        return indexed
+
+    @classmethod
+    def search(cls, queryset, query):
+        """Restrict a Product queryset to matches for query, best matches first."""
+        words = cls.tokenize(query)
+        if not words:
+            return queryset.none()
+        for word in words:
+            queryset = queryset.filter(id__in=ProductSearchTerm.objects.filter(
+                term__gte=word, term__lt=word + MAX_CHAR
+            ).values('product_id'))
+
+        query = query.strip()
+        return queryset.annotate(
+            match_rank=Case(
+                When(name__iexact=query, then=Value(0)),
+                When(name__istartswith=query, then=Value(1)),
+                default=Value(2),
+                output_field=IntegerField()
+            ),
+            name_length=Length('name')
+        ).order_by('match_rank', 'name_length', 'name')
+
+    @classmethod
+    def autocomplete(cls, query, category=None, limit=None):
+        """Return up to `limit` ranked products completing query."""
+        if len(cls.normalize(query).strip()) < cls.MIN_AUTOCOMPLETE_LENGTH:
+            return []
+        queryset = Product.objects.all()
+        if category:
+            queryset = queryset.filter(category=category)
+        limit = min(limit or cls.AUTOCOMPLETE_LIMIT, cls.MAX_AUTOCOMPLETE_LIMIT)
+        return list(cls.search(queryset, query)[:limit])
@@ -0,0 +1,30 @@
+# products/serializers.py
+from rest_framework import serializers
+from .models import Product, ProductFrequency
+
+
+class ProductSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'category', 'default_unit', 'created_at']
+        read_only_fields = ['id', 'created_at']
+
+
+class ProductFrequencySerializer(serializers.ModelSerializer):
+    product = ProductSerializer(read_only=True)
+    confidence_score = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ProductFrequency
+        fields = [
+            'id', 'product', 'average_interval_days', 'frequency_category',
+            'last_purchase_date', 'total_purchases', 'confidence_score', 'last_calculated'
+        ]
+        read_only_fields = fields
+
+
+class ProductAutocompleteSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'category', 'default_unit']
+        read_only_fields = fields
@@ -1,9 +1,16 @@
 # products/services.py
 
+from bisect import bisect_left, insort
+from collections import defaultdict
 from datetime import date
 from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+from statistics import median
+from django.db import transaction as db_transaction
 from django.db.models import Sum
-from products.models import Product # Assuming Product model is available
+from django.utils import timezone
+from products.models import Product, ProductFrequency, ProductPriceIndex # Assuming Product model is available
 from transactions.models import Transaction, TransactionProduct # Assuming these models are available
 
 class ProductService:
@@ -17,11 +24,7 @@ class ProductService:
 
     def estimate_missed_products(self, missed_date: date) -> dict[int, Decimal]:
         """
-        Simulates the logic to estimate products for a missed shopping date.
-        In a real scenario, this would involve ML models or heuristic algorithms
-        based on user's past purchase patterns.
-
-        For now, this is a placeholder returning dummy data.
+        Estimate the products bought on a missed shopping date.
 
         Args:
             missed_date (date): The date for which to estimate missed products.
@@ -30,14 +33,76 @@ class ProductService:
             dict[int, Decimal]: A dictionary where keys are product IDs and
                                 values are estimated quantities.
         """
-        # --- Dummy/Mock Logic for testing purposes ---
-        # In a real system, this would be complex.
-        # Example: Return some products that the user frequently buys around this time
-        # or products due for re-purchase based on frequency calculations.
+        return self.estimate_missed_products_for_dates([missed_date])[missed_date]
+
+    def estimate_missed_products_for_dates(self, missed_dates) -> dict[date, dict[int, Decimal]]:
+        """
+        Estimate the products bought on each of several missed shopping dates with
+        a single pass over the user's ACTUAL purchase history.
+
+        For every product bought on at least two days before a missed date, the
+        average quantity per purchase day and the average number of days between
+        purchase days are taken from the purchases before that date. Walking the
+        missed dates in order, a product is estimated on a date once that interval
+        has elapsed since it was last bought (or last estimated in this run).
+
+        Users without any purchase history get the placeholder defaults.
+
+        Args:
+            missed_dates (iterable[date]): The missed shopping dates.
+
+        Returns:
+            dict[date, dict[int, Decimal]]: Estimated quantities per product ID, per date.
+        """
+        missed_dates = sorted(set(missed_dates))
+        if not missed_dates:
+            return {}
+
+        # One query, one pass: per product, its purchase days and running quantity totals
+        history = (
+            TransactionProduct.objects
+            .filter(
+                transaction__user=self.user,
+                transaction__transaction_type='ACTUAL',
+                transaction__transaction_date__lt=missed_dates[-1]
+            )
+            .values_list('product_id', 'transaction__transaction_date')
+            .annotate(day_quantity=Sum('quantity'))
+            .order_by('transaction__transaction_date')
+        )
+        purchase_days = defaultdict(list)
+        running_quantities = defaultdict(list)
+        for product_id, purchase_date, quantity in history.iterator():
+            totals = running_quantities[product_id]
+            purchase_days[product_id].append(purchase_date)
+            totals.append((totals[-1] if totals else Decimal('0')) + (quantity or Decimal('0')))
+
+        if not purchase_days:
+            defaults = self._default_missed_products()
+            return {missed_date: dict(defaults) for missed_date in missed_dates}
 
+        estimates = {}
+        last_estimated = {}
+        for missed_date in missed_dates:
+            estimated_products = {}
+            for product_id, days in purchase_days.items():
+                count = bisect_left(days, missed_date)  # Purchase days before missed_date
+                if count < 2:
+                    continue
+                interval = (days[count - 1] - days[0]).days / (count - 1)
+                last_seen = max(days[count - 1], last_estimated.get(product_id, days[count - 1]))
+                if (missed_date - last_seen).days < interval:
+                    continue
+                average_quantity = running_quantities[product_id][count - 1] / count
+                estimated_products[product_id] = average_quantity.quantize(Decimal('0.01'))
+                last_estimated[product_id] = missed_date
+            estimates[missed_date] = estimated_products
+        return estimates
+
+    def _default_missed_products(self) -> dict[int, Decimal]:
+        """Placeholder estimate for users with no purchase history yet."""
         estimated_products = {}
 
-        # Simulate estimating products based on user's recent purchases or typical items
         # Let's say user typically buys Apples and Milk
         apples = Product.objects.filter(name='Apples').first()
         milk = Product.objects.filter(name='Milk').first()
@@ -47,29 +112,310 @@ class ProductService:
         if milk:
             estimated_products[milk.id] = Decimal('2.0') # 2.0 liters of milk
 
-        # Add more sophisticated logic here if needed for deeper simulation
-        # For example, if no apples/milk exist in test data, create them for this mock
+        # If default products not found, just pick a couple random ones
         if not estimated_products and Product.objects.exists():
-            # If default products not found, just pick a couple random ones
             some_products = Product.objects.all()[:2]
             for prod in some_products:
                 estimated_products[prod.id] = Decimal('1.0')
 
-
-        # You might also calculate total estimated amount here or let the serializer do it.
         return estimated_products
 
-    def get_product_frequencies(self) -> list:
-        """
-        Calculates and returns product purchase frequencies for the user.
-        This would typically involve analyzing historical transaction data.
-        """
-        # Placeholder for future implementation
-        return []
+    def get_product_frequencies(self):
+        """Return the stored purchase frequencies of the user's products, with their products."""
+        return ProductFrequency.objects.filter(user=self.user).select_related('product')
 
     def recalculate_product_frequencies(self) -> dict:
         """
         Recalculates and updates product purchase frequencies for the user.
         """
-        # Placeholder for future implementation
-        return {'updated_products': 0, 'calculation_date': date.today().isoformat()}
\ No newline at end of file
+        updated_products = ProductFrequencyCalculator(self.user).refresh()
+        return {'updated_products': updated_products, 'calculation_date': timezone.now()}
+
+
+class ProductFrequencyCalculator:
+    """
+    Computes ProductFrequency rows for every product a user has bought, from one
+    ordered query over their ACTUAL (product, purchase day) pairs.
+
+    Per product the intervals between distinct purchase days give the average
+    interval, its category and, from the variance of the intervals, a confidence
+    score (see the Frequency Calculation Algorithm in shopping_list_spec.md).
+    Products bought on fewer than two days have no frequency.
+
+    Stored rows are kept fresh on writes: record_purchases() extends a product's
+    running mean and variance (Welford's update) when the new day is after its
+    last purchase, and recomputes only the products it cannot extend (first
+    purchases, backdated purchases). Edits and deletions call refresh() with the
+    affected product ids.
+    """
+    # Upper bounds (in days) of the average interval for each category; longer is CUSTOM
+    CATEGORY_BOUNDS = (
+        (10, 'WEEKLY'),
+        (21, 'FORTNIGHTLY'),
+        (45, 'MONTHLY'),
+    )
+    # Minimum number of intervals before the variance is trusted for the confidence
+    MIN_INTERVALS_FOR_VARIANCE = 3
+    DEFAULT_CONFIDENCE = 0.5
+    MIN_CONFIDENCE = 0.1
+    UPDATE_FIELDS = [
+        'average_interval_days', 'interval_mean', 'interval_variance', 'frequency_category',
+        'last_purchase_date', 'total_purchases', 'confidence_score', 'last_calculated'
+    ]
+
+    def __init__(self, user):
+        # Accepts a user instance or a user id
+        self.user_id = getattr(user, 'pk', user)
+
+    def purchase_days(self, product_ids=None):
+        """Yield (product_id, [distinct purchase days, ascending]) for the user's ACTUAL purchases."""
+        rows = (
+            TransactionProduct.objects
+            .filter(transaction__user_id=self.user_id, transaction__transaction_type='ACTUAL')
+            .values_list('product_id', 'transaction__transaction_date')
+            .order_by('product_id', 'transaction__transaction_date')
+            .distinct()
+        )
+        if product_ids is not None:
+            rows = rows.filter(product_id__in=product_ids)
+        for product_id, group in groupby(rows.iterator(), key=itemgetter(0)):
+            yield product_id, [purchase_date for _, purchase_date in group]
+
+    @classmethod
+    def statistics(cls, days):
+        """Frequency fields for one product's ascending distinct purchase days, or None."""
+        if len(days) < 2:
+            return None
+        intervals = [(later - earlier).days for earlier, later in zip(days, days[1:])]
+        count = len(intervals)
+        average = sum(intervals) / count
+        variance = sum((interval - average) ** 2 for interval in intervals) / count
+        return cls.build(average, variance, count, days[-1])
+
+    @classmethod
+    def build(cls, average, variance, interval_count, last_purchase_date):
+        """Derive the stored fields from the interval mean and variance."""
+        category = next((name for bound, name in cls.CATEGORY_BOUNDS if average <= bound), 'CUSTOM')
+        if interval_count >= cls.MIN_INTERVALS_FOR_VARIANCE:
+            confidence = max(cls.MIN_CONFIDENCE, 1.0 - variance / average ** 2)
+        else:
+            confidence = cls.DEFAULT_CONFIDENCE
+        return {
+            'average_interval_days': int(average),
+            'interval_mean': average,
+            'interval_variance': variance,
+            'frequency_category': category,
+            'last_purchase_date': last_purchase_date,
+            'total_purchases': interval_count + 1,
+            'confidence_score': Decimal(str(round(confidence, 2))),
+        }
+
+    @classmethod
+    def extend(cls, frequency, purchase_date):
+        """
+        Add one interval ending at purchase_date (after last_purchase_date) to a
+        stored frequency, updating its mean and variance in place.
+        """
+        interval = (purchase_date - frequency.last_purchase_date).days
+        count = frequency.total_purchases  # Intervals after adding this one
+        mean = frequency.interval_mean
+        m2 = frequency.interval_variance * (count - 1)
+        delta = interval - mean
+        mean += delta / count
+        m2 += delta * (interval - mean)
+        for field, value in cls.build(mean, m2 / count, count, purchase_date).items():
+            setattr(frequency, field, value)
+
+    def calculate(self, product_ids=None):
+        """Return {product_id: frequency fields} for every product with enough history."""
+        frequencies = {}
+        for product_id, days in self.purchase_days(product_ids):
+            stats = self.statistics(days)
+            if stats is not None:
+                frequencies[product_id] = stats
+        return frequencies
+
+    def record_purchases(self, purchases):
+        """
+        Bring stored frequencies up to date after new ACTUAL purchases have been
+        written.
+
+        Args:
+            purchases (iterable): (product_id, purchase_date) pairs.
+        """
+        new_days = defaultdict(set)
+        for product_id, purchase_date in purchases:
+            new_days[product_id].add(purchase_date)
+        if not new_days:
+            return
+
+        with db_transaction.atomic():
+            stored = {
+                frequency.product_id: frequency
+                for frequency in ProductFrequency.objects.select_for_update().filter(
+                    user_id=self.user_id, product_id__in=new_days
+                )
+            }
+            extended = []
+            recompute = set()
+            for product_id, days in new_days.items():
+                frequency = stored.get(product_id)
+                if frequency is None or min(days) < frequency.last_purchase_date:
+                    recompute.add(product_id)
+                    continue
+                days = sorted(day for day in days if day > frequency.last_purchase_date)
+                for purchase_date in days:
+                    self.extend(frequency, purchase_date)
+                if days:
+                    frequency.last_calculated = timezone.now()
+                    extended.append(frequency)
+
+            ProductFrequency.objects.bulk_update(extended, self.UPDATE_FIELDS)
+            if recompute:
+                self.refresh(recompute)
+
+    def refresh(self, product_ids=None):
+        """
+        Recalculate and store the user's frequencies (all products, or only
+        product_ids) with one bulk upsert, removing rows for products that no
+        longer qualify. Returns the number of rows written.
+        """
+        if product_ids is not None:
+            product_ids = set(product_ids)
+            if not product_ids:
+                return 0
+        frequencies = self.calculate(product_ids)
+        entries = [
+            ProductFrequency(user_id=self.user_id, product_id=product_id, **stats)
+            for product_id, stats in frequencies.items()
+        ]
+        stale = ProductFrequency.objects.filter(user_id=self.user_id).exclude(product_id__in=frequencies)
+        if product_ids is not None:
+            stale = stale.filter(product_id__in=product_ids)
+        with db_transaction.atomic():
+            stale.delete()
+            ProductFrequency.objects.bulk_create(
+                entries, update_conflicts=True, unique_fields=['user', 'product'],
+                update_fields=self.UPDATE_FIELDS
+            )
+        return len(entries)
+
+
+class PriceIndexService:
+    """
+    Maintains ProductPriceIndex rows for a user.
+
+    New ACTUAL purchases are folded into the existing rows with
+    record_purchases(), which only reads and writes the index rows of the
+    products involved. Edits and deletions of past purchases cannot be
+    un-applied from the stored window, so callers use rebuild() for the
+    affected products, which recomputes them from that product's history.
+    """
+    # Number of most recent purchase prices kept per product for the mean and median
+    RECENT_PRICES = 10
+    UPDATE_FIELDS = [
+        'last_price', 'last_purchased_on', 'mean_price', 'median_price',
+        'purchase_count', 'recent_prices', 'updated_at'
+    ]
+
+    def __init__(self, user):
+        # Accepts a user instance or a user id
+        self.user_id = getattr(user, 'pk', user)
+
+    def get_prices(self, product_ids) -> dict[int, Decimal]:
+        """Return the median recent price per product id, for products the user has bought."""
+        return dict(
+            ProductPriceIndex.objects
+            .filter(user_id=self.user_id, product_id__in=set(product_ids))
+            .values_list('product_id', 'median_price')
+        )
+
+    def record_purchases(self, purchases):
+        """
+        Fold new purchases into the index.
+
+        Args:
+            purchases (iterable): (product_id, purchase_date, unit_price) tuples.
+                Purchases without a unit price are ignored.
+        """
+        by_product = defaultdict(list)
+        for product_id, purchase_date, unit_price in purchases:
+            if unit_price is not None:
+                by_product[product_id].append((purchase_date, Decimal(unit_price)))
+        if not by_product:
+            return
+
+        with db_transaction.atomic():
+            existing = {
+                entry.product_id: entry
+                for entry in ProductPriceIndex.objects.select_for_update().filter(
+                    user_id=self.user_id, product_id__in=by_product
+                )
+            }
+            to_create, to_update = [], []
+            for product_id, prices in by_product.items():
+                entry = existing.get(product_id)
+                if entry is None:
+                    entry = ProductPriceIndex(user_id=self.user_id, product_id=product_id)
+                    to_create.append(entry)
+                else:
+                    to_update.append(entry)
+                self._apply(entry, prices)
+
+            # select_for_update() has no row to lock for a first purchase, so a concurrent
+            # writer may insert the same row first; upsert instead of failing on it
+            ProductPriceIndex.objects.bulk_create(
+                to_create, update_conflicts=True, unique_fields=['user', 'product'],
+                update_fields=self.UPDATE_FIELDS
+            )
+            ProductPriceIndex.objects.bulk_update(to_update, self.UPDATE_FIELDS)
+
+    def rebuild(self, product_ids=None):
+        """
+        Recompute index rows from the user's ACTUAL purchase history, for the given
+        products or for every product. Returns the number of rows written.
+        """
+        history = TransactionProduct.objects.filter(
+            transaction__user_id=self.user_id,
+            transaction__transaction_type='ACTUAL',
+            unit_price__isnull=False
+        )
+        stale = ProductPriceIndex.objects.filter(user_id=self.user_id)
+        if product_ids is not None:
+            product_ids = set(product_ids)
+            if not product_ids:
+                return 0
+            history = history.filter(product_id__in=product_ids)
+            stale = stale.filter(product_id__in=product_ids)
+
+        by_product = defaultdict(list)
+        for product_id, purchase_date, unit_price in history.values_list(
+            'product_id', 'transaction__transaction_date', 'unit_price'
+        ).order_by().iterator():
+            by_product[product_id].append((purchase_date, unit_price))
+
+        entries = []
+        for product_id, prices in by_product.items():
+            entry = ProductPriceIndex(user_id=self.user_id, product_id=product_id)
+            self._apply(entry, prices)
+            entries.append(entry)
+
+        with db_transaction.atomic():
+            stale.delete()
+            ProductPriceIndex.objects.bulk_create(entries)
+        return len(entries)
+
+    def _apply(self, entry, prices):
+        """Add (purchase_date, price) pairs to an index entry and refresh its statistics."""
+        recent = [(date.fromisoformat(day), Decimal(price)) for day, price in entry.recent_prices]
+        for purchase in prices:
+            insort(recent, purchase)
+        recent = recent[-self.RECENT_PRICES:]
+        window = [price for _, price in recent]
+
+        entry.purchase_count += len(prices)
+        entry.recent_prices = [[day.isoformat(), str(price)] for day, price in recent]
+        entry.last_purchased_on, entry.last_price = recent[-1]
+        entry.mean_price = (sum(window) / len(window)).quantize(Decimal('0.01'))
+        entry.median_price = Decimal(median(window)).quantize(Decimal('0.01'))
+        entry.updated_at = timezone.now()
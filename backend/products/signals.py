@@ -0,0 +1,13 @@
+# products/signals.py
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import Product
+from .search import ProductSearchIndex
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, update_fields=None, **kwargs):
+    """Keep the product's search terms in step with its name (terms are deleted with the product)."""
+    if update_fields is not None and 'name' not in update_fields:
+        return
+    ProductSearchIndex.index_products([instance])
@@ -1,3 +1,344 @@
+from datetime import date, timedelta
+from io import StringIO
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from products.models import Product, ProductFrequency, ProductSearchTerm
+from products.search import ProductSearchIndex
+from products.services import ProductFrequencyCalculator
+from transactions.models import Transaction, TransactionProduct
+
+User = get_user_model()
+
+
+def buy(user, product, day, transaction_type='ACTUAL'):
+    transaction = Transaction.objects.create(
+        user=user, transaction_date=day, transaction_type=transaction_type, total_amount=Decimal('1.00')
+    )
+    TransactionProduct.objects.create(
+        transaction=transaction, product=product, quantity=Decimal('1'), unit_price=Decimal('1.00')
+    )
+    return transaction
+
+
+class ProductFrequencyCalculatorTest(TestCase):
+    """Test the single-pass frequency calculation against the spec algorithm."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='frequser', password='testpass123')
+        self.start = date.today() - timedelta(days=200)
+
+    def test_statistics_follow_spec(self):
+        days = [self.start + timedelta(days=offset) for offset in (0, 7, 14, 21, 28)]
+        stats = ProductFrequencyCalculator.statistics(days)
+        self.assertEqual(stats['average_interval_days'], 7)
+        self.assertEqual(stats['interval_variance'], 0)
+        self.assertEqual(stats['frequency_category'], 'WEEKLY')
+        self.assertEqual(stats['confidence_score'], Decimal('1.0'))
+        self.assertEqual(stats['total_purchases'], 5)
+        self.assertEqual(stats['last_purchase_date'], days[-1])
+
+        # Irregular intervals 10, 30, 20: mean 20, variance 66.67
+        days = [self.start + timedelta(days=offset) for offset in (0, 10, 40, 60)]
+        stats = ProductFrequencyCalculator.statistics(days)
+        self.assertEqual(stats['frequency_category'], 'FORTNIGHTLY')
+        self.assertEqual(stats['confidence_score'], Decimal('0.83'))
+
+        # Fewer than three intervals: medium confidence; one day: no frequency
+        days = [self.start, self.start + timedelta(days=60)]
+        self.assertEqual(ProductFrequencyCalculator.statistics(days)['frequency_category'], 'CUSTOM')
+        self.assertEqual(ProductFrequencyCalculator.statistics(days)['confidence_score'], Decimal('0.5'))
+        self.assertIsNone(ProductFrequencyCalculator.statistics([self.start]))
+
+    def test_refresh_uses_one_read_and_one_write(self):
+        products = [Product.objects.create(name=f'Freq Product {index}') for index in range(20)]
+        for index, product in enumerate(products):
+            for purchase in range(4):
+                buy(self.user, product, self.start + timedelta(days=(index + 1) * purchase))
+        # Same-day repeats and estimated purchases are ignored
+        buy(self.user, products[0], self.start)
+        buy(self.user, products[0], self.start + timedelta(days=2), transaction_type='ESTIMATED')
+
+        with CaptureQueriesContext(connection) as ctx:
+            updated = ProductFrequencyCalculator(self.user).refresh()
+        self.assertEqual(updated, 20)
+        selects = [q for q in ctx.captured_queries if q['sql'].startswith('SELECT')]
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(selects), 1)
+        self.assertEqual(len(inserts), 1)
+
+        frequency = ProductFrequency.objects.get(user=self.user, product=products[0])
+        self.assertEqual(frequency.average_interval_days, 1)
+        self.assertEqual(frequency.total_purchases, 4)
+        self.assertEqual(ProductFrequency.objects.get(user=self.user, product=products[19]).frequency_category, 'FORTNIGHTLY')
+
+    def test_refresh_upserts_and_removes_stale_rows(self):
+        milk = Product.objects.create(name='Freq Milk')
+        bread = Product.objects.create(name='Freq Bread')
+        for offset in (0, 7):
+            buy(self.user, milk, self.start + timedelta(days=offset))
+            bread_purchase = buy(self.user, bread, self.start + timedelta(days=offset))
+        ProductFrequencyCalculator(self.user).refresh()
+        milk_id = ProductFrequency.objects.get(product=milk).id
+
+        buy(self.user, milk, self.start + timedelta(days=21))
+        bread_purchase.delete()
+        self.assertEqual(ProductFrequencyCalculator(self.user).refresh(), 1)
+
+        frequency = ProductFrequency.objects.get(user=self.user)
+        self.assertEqual(frequency.id, milk_id)
+        self.assertEqual(frequency.average_interval_days, 10)
+        self.assertEqual(frequency.total_purchases, 3)
+
+
+class ProductFrequencyAPITest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='freqapi', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('product-frequencies')
+        self.product = Product.objects.create(name='Freq Coffee', category='Drinks')
+        for offset in (0, 14, 28):
+            buy(self.user, self.product, date.today() - timedelta(days=60 - offset))
+
+        other = User.objects.create_user(username='freqother', password='testpass123')
+        buy(other, self.product, date.today() - timedelta(days=10))
+        buy(other, self.product, date.today() - timedelta(days=3))
+        ProductFrequencyCalculator(other).refresh()
+
+    def test_refresh_then_list(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data'], [])
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['success'])
+        self.assertEqual(response.data['data']['updated_products'], 1)
+        self.assertIn('calculation_date', response.data['data'])
+
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data['data']), 1)
+        frequency = response.data['data'][0]
+        self.assertEqual(frequency['product']['name'], 'Freq Coffee')
+        self.assertEqual(frequency['average_interval_days'], 14)
+        self.assertEqual(frequency['frequency_category'], 'FORTNIGHTLY')
+        self.assertEqual(frequency['confidence_score'], 0.5)
+        self.assertEqual(frequency['total_purchases'], 3)
+
+    def test_requires_authentication(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ProductFrequencyMaintenanceTest(APITestCase):
+    """Stored frequencies stay equal to a full recalculation across transaction writes."""
+
+    FIELDS = (
+        'product_id', 'average_interval_days', 'frequency_category',
+        'last_purchase_date', 'total_purchases', 'confidence_score'
+    )
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='freqlive', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.tea = Product.objects.create(name='Live Tea')
+        self.rice = Product.objects.create(name='Live Rice')
+        self.start = date.today() - timedelta(days=100)
+
+    def _create(self, offset, *products):
+        response = self.client.post(reverse('transaction-list'), {
+            'transaction_date': str(self.start + timedelta(days=offset)),
+            'products': [{'product_id': product.id, 'quantity': '1', 'unit_price': '2.00'} for product in products]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response.data['data']['id']
+
+    def _stored(self):
+        return {
+            row['product_id']: row for row in
+            ProductFrequency.objects.filter(user=self.user).values(*self.FIELDS, 'interval_mean', 'interval_variance')
+        }
+
+    def assertMatchesRecalculation(self):
+        stored = self._stored()
+        expected = ProductFrequencyCalculator(self.user).calculate()
+        self.assertEqual(set(stored), set(expected))
+        for product_id, stats in expected.items():
+            for field in self.FIELDS[1:]:
+                self.assertEqual(stored[product_id][field], stats[field], field)
+            self.assertAlmostEqual(stored[product_id]['interval_mean'], stats['interval_mean'])
+            self.assertAlmostEqual(stored[product_id]['interval_variance'], stats['interval_variance'])
+
+    def test_new_purchases_extend_running_statistics(self):
+        for offset in (0, 6, 13, 21, 27):
+            self._create(offset, self.tea, self.rice)
+        self.assertMatchesRecalculation()
+        self.assertEqual(self._stored()[self.tea.id]['total_purchases'], 5)
+
+        # A later purchase of known products touches only their rows: no history query
+        with CaptureQueriesContext(connection) as ctx:
+            self._create(35, self.tea)
+        history = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT DISTINCT')]
+        self.assertEqual(history, [])
+        self.assertMatchesRecalculation()
+        self.assertEqual(self._stored()[self.tea.id]['last_purchase_date'], self.start + timedelta(days=35))
+
+    def test_backdated_and_same_day_purchases(self):
+        for offset in (10, 20, 30):
+            self._create(offset, self.tea)
+        self._create(30, self.tea)  # Same day again: no new interval
+        self._create(5, self.tea)  # Backdated: recomputed
+        self.assertMatchesRecalculation()
+        self.assertEqual(self._stored()[self.tea.id]['total_purchases'], 4)
+
+    def test_bulk_and_shopping_list_paths(self):
+        from shoppingList.models import ShoppingList, ShoppingListItem
+        from shoppingList.services import ShoppingListService
+        from transactions.services import TransactionService
+
+        TransactionService.bulk_create_transactions(self.user, [
+            {'transaction_date': self.start + timedelta(days=offset), 'total_amount': Decimal('2.00'),
+             'products': [{'product': self.rice, 'quantity': Decimal('1'), 'unit_price': Decimal('2.00')}]}
+            for offset in (0, 14, 28)
+        ])
+        self.assertMatchesRecalculation()
+
+        shopping_list = ShoppingList.objects.create(user=self.user, scheduled_date=date.today(), status='PENDING')
+        item = ShoppingListItem.objects.create(
+            shopping_list=shopping_list, product=self.rice,
+            predicted_quantity=Decimal('1.000'), predicted_price=Decimal('2.00')
+        )
+        ShoppingListService.complete_shopping_list(shopping_list, {'items': [
+            {'item_id': item.id, 'is_purchased': True, 'actual_quantity': Decimal('1'), 'unit_price': Decimal('2.00')}
+        ]})
+        self.assertMatchesRecalculation()
+        self.assertEqual(self._stored()[self.rice.id]['last_purchase_date'], date.today())
+
+    def test_update_and_delete_recompute_affected_products(self):
+        first = self._create(0, self.tea, self.rice)
+        self._create(7, self.tea, self.rice)
+        self._create(14, self.tea)
+
+        response = self.client.patch(
+            reverse('transaction-detail', args=[first]),
+            {'transaction_date': str(self.start + timedelta(days=3))}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertMatchesRecalculation()
+
+        response = self.client.delete(reverse('transaction-detail', args=[first]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertMatchesRecalculation()
+        # Rice is down to one purchase day and no longer has a frequency
+        self.assertNotIn(self.rice.id, self._stored())
+
+    def test_reads_do_not_scan_history(self):
+        for offset in (0, 7, 14):
+            self._create(offset, self.tea, self.rice)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('product-frequencies'))
+        self.assertEqual(len(response.data['data']), 2)
+        self.assertFalse(any('"transactions_' in q['sql'] for q in ctx.captured_queries))
+
+
+class ProductSearchTest(APITestCase):
+    """Test the products API and its name search index."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='searchuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        for name, category in (
+            ('Green Apples', 'Produce'), ('Apples', 'Produce'), ('Apple Juice', 'Drinks'),
+            ('Crème Fraîche', 'Dairy'), ('Pineapple', 'Produce'), ('Grapes', 'Produce'),
+        ):
+            Product.objects.create(name=name, category=category)
+
+    def names(self, response):
+        return [product['name'] for product in response.data['data']['results']]
+
+    def test_terms_follow_product_writes(self):
+        product = Product.objects.get(name='Green Apples')
+        self.assertEqual(
+            list(product.search_terms.order_by('position').values_list('term', flat=True)), ['green', 'apples']
+        )
+        product.name = 'Red Apples'
+        product.save()
+        self.assertEqual(sorted(product.search_terms.values_list('term', flat=True)), ['apples', 'red'])
+        product.delete()
+        self.assertFalse(ProductSearchTerm.objects.filter(term='red').exists())
+
+    def test_search_is_ranked_prefix_match(self):
+        response = self.client.get(reverse('product-list'), {'search': 'apple'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Names starting with the query first, shortest first; "Pineapple" is not a word prefix match
+        self.assertEqual(self.names(response), ['Apples', 'Apple Juice', 'Green Apples'])
+
+        response = self.client.get(reverse('product-list'), {'search': 'gre app'})
+        self.assertEqual(self.names(response), ['Green Apples'])
+        response = self.client.get(reverse('product-list'), {'search': 'creme'})
+        self.assertEqual(self.names(response), ['Crème Fraîche'])
+        response = self.client.get(reverse('product-list'), {'search': 'apple', 'category': 'Drinks'})
+        self.assertEqual(self.names(response), ['Apple Juice'])
+
+    def test_list_is_paginated(self):
+        response = self.client.get(reverse('product-list'), {'page_size': 2})
+        self.assertEqual(self.names(response), ['Apple Juice', 'Apples'])
+        self.assertEqual(response.data['data']['meta']['count'], 6)
+        self.assertIsNotNone(response.data['data']['meta']['next'])
+
+    def test_autocomplete(self):
+        response = self.client.get(reverse('product-autocomplete'), {'q': 'Ap', 'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([product['name'] for product in response.data['data']], ['Apples', 'Apple Juice'])
+
+        for query in ('  ', 'a'):
+            response = self.client.get(reverse('product-autocomplete'), {'q': query})
+            self.assertEqual(response.data['data'], [])
+        response = self.client.get(reverse('product-autocomplete'), {'q': 'ap', 'limit': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.data['success'])
+
+    def test_autocomplete_uses_term_index(self):
+        """Every query word is a range search on the term index; no table is scanned."""
+        for category in (None, 'Produce'):
+            with CaptureQueriesContext(connection) as ctx:
+                ProductSearchIndex.autocomplete('gre ap', category=category)
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + ctx.captured_queries[-1]['sql'])
+                plan = [row[-1] for row in cursor.fetchall()]
+            self.assertEqual(len([line for line in plan if 'INDEX' in line and '(term>? AND term<?)' in line]), 2, plan)
+            self.assertFalse([line for line in plan if line.startswith('SCAN')], plan)
+
+    def test_create_and_detail(self):
+        response = self.client.post(reverse('product-list'), {'name': 'Oat Milk', 'category': 'Dairy'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        product_id = response.data['data']['id']
+        self.assertEqual(
+            [product['id'] for product in self.client.get(reverse('product-autocomplete'), {'q': 'oat'}).data['data']],
+            [product_id]
+        )
+
+        response = self.client.post(reverse('product-list'), {'name': 'Oat Milk'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('name', response.data['errors'])
+
+        response = self.client.get(reverse('product-detail', args=[product_id]))
+        self.assertEqual(response.data['data']['name'], 'Oat Milk')
+
+    def test_rebuild_command(self):
+        ProductSearchTerm.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_product_search', stdout=out)
+        self.assertIn('Indexed 6 product(s).', out.getvalue())
+        self.assertEqual([product.name for product in ProductSearchIndex.autocomplete('grap')], ['Grapes'])
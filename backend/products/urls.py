@@ -0,0 +1,10 @@
+# products/urls.py
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.ProductListCreateView.as_view(), name='product-list'),
+    path('<int:pk>/', views.ProductDetailView.as_view(), name='product-detail'),
+    path('autocomplete/', views.product_autocomplete, name='product-autocomplete'),
+    path('frequencies/', views.product_frequencies, name='product-frequencies'),
+]
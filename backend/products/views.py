@@ -1,3 +1,146 @@
-from django.shortcuts import render
+from rest_framework import generics, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from transactions.pagination import CustomPageNumberPagination
+from .models import Product
+from .search import ProductSearchIndex
+from .serializers import ProductAutocompleteSerializer, ProductFrequencySerializer, ProductSerializer
+from .services import ProductService
 
-# Create your views here.
+
+class ProductPagination(CustomPageNumberPagination):
+    page_size = 20
+
+
+class ProductListCreateView(generics.ListCreateAPIView):
+    """
+    GET /products/?search=&category=
+    Catalog listing; `search` goes through the product search index and orders
+    results by relevance.
+
+    POST /products/
+    Add a product to the catalog.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = ProductSerializer
+    pagination_class = ProductPagination
+
+    def get_queryset(self):
+        queryset = Product.objects.all()
+
+        category = self.request.query_params.get('category')
+        if category:
+            queryset = queryset.filter(category=category)
+
+        search = self.request.query_params.get('search')
+        if search:
+            queryset = ProductSearchIndex.search(queryset, search)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return Response({
+            'success': True,
+            'message': 'Products retrieved successfully',
+            'data': {
+                'results': serializer.data,
+                'meta': {
+                    'count': self.paginator.page.paginator.count,
+                    'next': self.paginator.get_next_link(),
+                    'previous': self.paginator.get_previous_link()
+                }
+            }
+        })
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Validation failed',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer.save()
+        return Response({
+            'success': True,
+            'message': 'Product created successfully',
+            'data': serializer.data
+        }, status=status.HTTP_201_CREATED)
+
+
+class ProductDetailView(generics.RetrieveAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = ProductSerializer
+    queryset = Product.objects.all()
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_object())
+        return Response({
+            'success': True,
+            'message': 'Product retrieved successfully',
+            'data': serializer.data
+        })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def product_autocomplete(request):
+    """
+    GET /products/autocomplete/?q=gre&category=&limit=10
+    Ranked completions for a partially typed product name.
+    """
+    query = request.query_params.get('q', '')
+    try:
+        limit = int(request.query_params.get('limit', ProductSearchIndex.AUTOCOMPLETE_LIMIT))
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return Response({
+            'success': False,
+            'message': 'Validation failed',
+            'errors': {'limit': ['A positive integer is required.']}
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    products = ProductSearchIndex.autocomplete(
+        query, category=request.query_params.get('category'), limit=limit
+    )
+    return Response({
+        'success': True,
+        'message': 'Suggestions retrieved successfully',
+        'data': ProductAutocompleteSerializer(products, many=True).data
+    })
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def product_frequencies(request):
+    """
+    GET /products/frequencies/
+    Stored purchase frequencies of the user's products.
+
+    POST /products/frequencies/
+    Recalculate them from the user's ACTUAL transaction history.
+    """
+    product_service = ProductService(request.user)
+
+    if request.method == 'POST':
+        result = product_service.recalculate_product_frequencies()
+        return Response({
+            'success': True,
+            'message': 'Product frequencies refreshed successfully',
+            'data': {
+                'updated_products': result['updated_products'],
+                'calculation_date': result['calculation_date'].isoformat()
+            }
+        }, status=status.HTTP_200_OK)
+
+    serializer = ProductFrequencySerializer(product_service.get_product_frequencies(), many=True)
+    return Response({
+        'success': True,
+        'message': 'Product frequencies retrieved successfully',
+        'data': serializer.data
+    }, status=status.HTTP_200_OK)
@@ -0,0 +1,15 @@
+# profiles/async_views.py
+from asgiref.sync import sync_to_async
+from transactions.async_views import AsyncReadView
+from .models import UserProfile
+
+
+class AsyncUserProfileView(AsyncReadView):
+    """Async GET for UserProfileViewSet.retrieve."""
+
+    async def read(self, view, request):
+        profile, created = await UserProfile.objects.aget_or_create(user=request.user)
+        # Reuse the authenticated user instead of lazily loading profile.user
+        profile.user = request.user
+        # retrieve_response() serializes the profile, which may touch relations
+        return await sync_to_async(view.retrieve_response)(profile)
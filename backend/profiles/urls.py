@@ -1,5 +1,6 @@
 from django.urls import path
 from .views import UserProfileViewSet
+from .async_views import AsyncUserProfileView
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -11,9 +12,10 @@ urlpatterns = [
     # User Profile endpoints
     # Using .as_view() with {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update'}
     # maps HTTP methods to viewset actions.
-    path('', UserProfileViewSet.as_view({
+    # GET is served by an async view; PUT/PATCH fall through to the viewset.
+    path('', AsyncUserProfileView.as_view(sync_view=UserProfileViewSet.as_view({
         'get': 'retrieve',
         'put': 'update',
         'patch': 'partial_update'
-    }), name='profile-detail'),
+    })), name='profile-detail'),
 ]
\ No newline at end of file
@@ -28,6 +28,10 @@ class UserProfileViewSet(viewsets.ViewSet):
         Retrieve current user's profile and preferences.
         """
         instance = self.get_object()
+        return self.retrieve_response(instance)
+
+    def retrieve_response(self, instance):
+        """Envelope for the profile (shared with the async read path)."""
         serializer = UserProfileSerializer(instance)
         return Response({
             'success': True,
@@ -1,6 +1,7 @@
 # shoppingList/admin.py
 from django.contrib import admin
 from .models import ShoppingList, ShoppingListItem
+from .services import ShoppingListService
 
 
 class ShoppingListItemInline(admin.TabularInline):
@@ -36,11 +37,12 @@ class ShoppingListAdmin(admin.ModelAdmin):
     )
     
     def item_count(self, obj):
-        return obj.items.count()
+        return getattr(obj, ShoppingListService.ITEM_COUNT_ANNOTATION)
     item_count.short_description = 'Items'
+    item_count.admin_order_field = ShoppingListService.ITEM_COUNT_ANNOTATION
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user').prefetch_related('items')
+        return ShoppingListService.annotate_totals(super().get_queryset(request).select_related('user'))
 
 
 @admin.register(ShoppingListItem)
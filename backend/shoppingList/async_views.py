@@ -0,0 +1,38 @@
+# shoppingList/async_views.py
+from asgiref.sync import sync_to_async
+from transactions.async_views import AsyncReadView
+
+
+class AsyncShoppingListListView(AsyncReadView):
+    """Async GET for ShoppingListListCreateView (filters, fieldsets, ETags)."""
+
+    async def read(self, view, request):
+        if view.paginator is not None:
+            return None  # Only the unpaginated listing has an async path
+
+        queryset = view.filter_queryset(view.get_queryset())
+
+        not_modified = await view.anot_modified_response(request, queryset)
+        if not_modified is not None:
+            return not_modified
+
+        data = await self.serialize(view, [obj async for obj in queryset], many=True)
+        return view.set_conditional_headers(view.list_response(data))
+
+
+class AsyncShoppingListDetailView(AsyncReadView):
+    """Async GET for ShoppingListDetailView."""
+
+    async def read(self, view, request, pk):
+        queryset = view.get_queryset().filter(pk=pk)
+
+        not_modified = await view.anot_modified_response(request, queryset)
+        if not_modified is not None:
+            return not_modified
+
+        instance = await queryset.afirst()
+        if instance is None:
+            return None
+        await sync_to_async(view.check_object_permissions)(request, instance)
+        data = await self.serialize(view, instance)
+        return view.set_conditional_headers(view.retrieve_response(data))
@@ -0,0 +1,198 @@
+# shoppingList/fleet.py
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import transaction as db_transaction
+from django.db.models import Avg
+from .models import ShoppingList, ShoppingListItem
+from products.models import ProductFrequency, ProductPriceIndex
+from profiles.models import UserProfile
+from transactions.models import TransactionProduct
+
+User = get_user_model()
+
+
+class FleetListGenerator:
+    """
+    Keeps a batch of users topped up with a fixed number of upcoming shopping
+    lists (see the generate_fleet_lists command, which runs one batch per worker
+    process).
+
+    New lists follow each user's profile: they fall on the preferred shopping day,
+    spaced by the preferred frequency. Items come from the user's ProductFrequency
+    rows: a product goes on the first new list on or after the day it is next due
+    (last purchase + average interval), then again one interval later, priced from
+    the ProductPriceIndex. Profiles, scheduled dates and predictions for the whole
+    batch are read with one query each and the new rows are written with two
+    bulk_create calls.
+
+    Overlapping runs are safe: before writing, a run locks the batch's users and
+    drops the new lists whose (user, scheduled_date) was taken since its snapshot,
+    together with their items. The ids of the inserted lists are read back by
+    that key, which the unique constraint on upcoming lists makes unambiguous.
+    """
+    # Lists in these statuses count towards a user's upcoming lists
+    UPCOMING_STATUSES = ShoppingList.UPCOMING_STATUSES
+    # Days between lists per UserProfile.preferred_shopping_frequency. MONTHLY is four
+    # weeks so lists stay on the preferred day; CUSTOM has no stored interval yet.
+    INTERVAL_DAYS = {
+        'WEEKLY': 7,
+        'FORTNIGHTLY': 14,
+        'MONTHLY': 28,
+        'CUSTOM': 7,
+    }
+    DEFAULT_QUANTITY = Decimal('1.000')
+
+    def __init__(self, today=None):
+        self.today = today or date.today()
+
+    def generate(self, user_ids, lists_per_user):
+        """
+        Create the missing upcoming lists of the given users.
+        Returns (lists created, items created).
+        """
+        user_ids = list(user_ids)
+        profiles = {
+            user_id: (day, frequency)
+            for user_id, day, frequency in UserProfile.objects.filter(user_id__in=user_ids).values_list(
+                'user_id', 'preferred_shopping_day', 'preferred_shopping_frequency'
+            )
+        }
+        taken_dates, upcoming = self._load_scheduled_dates(user_ids)
+        predictions = self._load_predictions(user_ids)
+
+        new_lists, new_items = [], []
+        for user_id in user_ids:
+            missing = lists_per_user - upcoming[user_id]
+            if missing <= 0:
+                continue
+            day, frequency = profiles.get(user_id, (None, 'WEEKLY'))
+            dates = self.schedule(day, frequency, missing, taken_dates[user_id])
+            for scheduled_date, items in self.plan_items(predictions.get(user_id, {}), dates):
+                shopping_list = ShoppingList(user_id=user_id, scheduled_date=scheduled_date, status='IN_PROGRESS')
+                new_lists.append(shopping_list)
+                new_items.append((shopping_list, items))
+
+        with db_transaction.atomic():
+            # Overlapping runs over the same users write one at a time (where the database
+            # has row locks; select_for_update() is a no-op on SQLite)
+            list(User.objects.select_for_update().filter(id__in=user_ids).values_list('id', flat=True))
+            # Skip dates taken since the snapshot was read, e.g. by an overlapping run
+            taken = self._list_ids(new_lists)
+            new_lists = [
+                shopping_list for shopping_list in new_lists
+                if (shopping_list.user_id, shopping_list.scheduled_date) not in taken
+            ]
+            # The unique constraint still guards against writers that take no lock
+            ShoppingList.objects.bulk_create(new_lists, ignore_conflicts=True)
+            # bulk_create with ignore_conflicts returns no ids; (user, date) identifies an upcoming list
+            list_ids = self._list_ids(new_lists, status__in=self.UPCOMING_STATUSES)
+            for shopping_list in new_lists:
+                shopping_list.id = list_ids.get((shopping_list.user_id, shopping_list.scheduled_date))
+            items = [
+                ShoppingListItem(
+                    shopping_list=shopping_list, product_id=product_id,
+                    predicted_quantity=quantity, predicted_price=price
+                )
+                for shopping_list, list_items in new_items if shopping_list.pk is not None
+                for product_id, quantity, price in list_items
+            ]
+            ShoppingListItem.objects.bulk_create(items)
+        return len(new_lists), len(items)
+
+    def schedule(self, preferred_day, frequency, count, taken_dates):
+        """
+        The next `count` dates after today on the user's schedule that have no list yet.
+        Without a preferred day, the schedule starts one interval from today.
+        """
+        interval = timedelta(days=self.INTERVAL_DAYS.get(frequency, 7))
+        if preferred_day is None:
+            scheduled_date = self.today + interval
+        else:
+            scheduled_date = self.today + timedelta(days=(preferred_day - self.today.weekday() - 1) % 7 + 1)
+
+        dates = []
+        while len(dates) < count:
+            if scheduled_date not in taken_dates:
+                dates.append(scheduled_date)
+            scheduled_date += interval
+        return dates
+
+    def plan_items(self, predictions, dates):
+        """
+        Yield (scheduled_date, [(product_id, quantity, price)]) for the user's new
+        dates, ascending, from {product_id: (next_due, interval_days, quantity, price)}.
+        """
+        next_due = {product_id: due for product_id, (due, _, _, _) in predictions.items()}
+        for scheduled_date in dates:
+            items = []
+            for product_id, (_, interval_days, quantity, price) in predictions.items():
+                if next_due[product_id] <= scheduled_date:
+                    items.append((product_id, quantity, price))
+                    next_due[product_id] = scheduled_date + timedelta(days=interval_days)
+            yield scheduled_date, items
+
+    @staticmethod
+    def _list_ids(lists, **filters):
+        """{(user_id, scheduled_date): id} of the stored lists on the dates of `lists`."""
+        if not lists:
+            return {}
+        rows = ShoppingList.objects.filter(
+            user_id__in={shopping_list.user_id for shopping_list in lists},
+            scheduled_date__in={shopping_list.scheduled_date for shopping_list in lists},
+            **filters
+        ).values_list('user_id', 'scheduled_date', 'id')
+        return {(user_id, scheduled_date): list_id for user_id, scheduled_date, list_id in rows.iterator()}
+
+    def _load_scheduled_dates(self, user_ids):
+        """Per user: every date that already has a list, and the number of upcoming lists."""
+        taken_dates = defaultdict(set)
+        upcoming = defaultdict(int)
+        rows = ShoppingList.objects.filter(user_id__in=user_ids, scheduled_date__gt=self.today).values_list(
+            'user_id', 'scheduled_date', 'status'
+        )
+        for user_id, scheduled_date, status in rows.iterator():
+            taken_dates[user_id].add(scheduled_date)
+            if status in self.UPCOMING_STATUSES:
+                upcoming[user_id] += 1
+        return taken_dates, upcoming
+
+    def _load_predictions(self, user_ids):
+        """{user_id: {product_id: (next_due, interval_days, quantity, price)}} for the batch."""
+        quantities = {
+            (user_id, product_id): quantity
+            for user_id, product_id, quantity in
+            TransactionProduct.objects
+            .filter(transaction__user_id__in=user_ids, transaction__transaction_type='ACTUAL')
+            .values_list('transaction__user_id', 'product_id')
+            .annotate(average_quantity=Avg('quantity'))
+            .order_by()
+        }
+        prices = {
+            (user_id, product_id): price
+            for user_id, product_id, price in
+            ProductPriceIndex.objects.filter(user_id__in=user_ids)
+            .values_list('user_id', 'product_id', 'median_price')
+        }
+
+        predictions = defaultdict(dict)
+        frequencies = ProductFrequency.objects.filter(user_id__in=user_ids).values_list(
+            'user_id', 'product_id', 'last_purchase_date', 'average_interval_days'
+        ).order_by('user_id', 'product_id')
+        for user_id, product_id, last_purchase_date, interval_days in frequencies.iterator():
+            interval_days = max(1, interval_days)
+            quantity = quantities.get((user_id, product_id)) or self.DEFAULT_QUANTITY
+            predictions[user_id][product_id] = (
+                last_purchase_date + timedelta(days=interval_days),
+                interval_days,
+                Decimal(quantity).quantize(Decimal('0.001')),
+                prices.get((user_id, product_id)),
+            )
+        return predictions
+
+
+def generate_for_users(user_ids, lists_per_user, today):
+    """Process pool entry point: top up one batch of users. Returns (users, lists, items)."""
+    lists_created, items_created = FleetListGenerator(today).generate(user_ids, lists_per_user)
+    return len(user_ids), lists_created, items_created
@@ -0,0 +1,49 @@
+# shoppingList/lifecycle.py
+from datetime import date
+from django.db.models import Exists, F, OuterRef, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from .models import ShoppingList
+
+
+class ShoppingListLifecycleService:
+    """
+    Time-driven status changes for every user's shopping lists, each done with a
+    single set-based UPDATE (see the maintain_shopping_lists command).
+
+    Both steps only match rows that still need the change, so running them again
+    (or from two workers at once) changes nothing: an expired list is no longer
+    TRIAGED/PENDING, and a promoted user now has a TRIAGED list.
+    """
+    # Statuses a list leaves for EXPIRED once its scheduled date has passed
+    EXPIRING_STATUSES = ('TRIAGED', 'PENDING')
+
+    @classmethod
+    def expire_overdue(cls, today=None):
+        """Move every TRIAGED/PENDING list scheduled before today to EXPIRED. Returns the row count."""
+        today = today or date.today()
+        return ShoppingList.objects.filter(
+            status__in=cls.EXPIRING_STATUSES, scheduled_date__lt=today
+        ).update(status='EXPIRED', updated_at=timezone.now())
+
+    @staticmethod
+    def promote_next(today=None):
+        """
+        Promote the earliest upcoming (today or later) IN_PROGRESS list of each user
+        who has no TRIAGED list to TRIAGED. Returns the row count.
+        """
+        today = today or date.today()
+        has_triaged = ShoppingList.objects.filter(user=OuterRef('user'), status='TRIAGED')
+        next_lists = (
+            ShoppingList.objects
+            .filter(status='IN_PROGRESS', scheduled_date__gte=today)
+            .filter(~Exists(has_triaged))
+            .annotate(position=Window(
+                RowNumber(), partition_by=[F('user')], order_by=[F('scheduled_date').asc(), F('id').asc()]
+            ))
+            .filter(position=1)
+            .values('id')
+        )
+        return ShoppingList.objects.filter(id__in=next_lists, status='IN_PROGRESS').update(
+            status='TRIAGED', updated_at=timezone.now()
+        )
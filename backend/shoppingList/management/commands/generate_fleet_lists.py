@@ -0,0 +1,69 @@
+# shoppingList/management/commands/generate_fleet_lists.py
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from shoppingList.fleet import generate_for_users
+
+User = get_user_model()
+
+
+def init_worker():
+    # Worker processes started with "spawn" import nothing from the parent
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = 'Top up every active user with N upcoming shopping lists following their profile, in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lists', type=int, default=4,
+            help='Number of upcoming lists each user should have (default 4).'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Number of worker processes; 1 runs in this process (default: CPU count).'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=200,
+            help='Users handled per batch (default 200).'
+        )
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Only top up the given user id (may be repeated).'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True).order_by('id')
+        if options['user_ids']:
+            users = users.filter(id__in=options['user_ids'])
+        user_ids = list(users.values_list('id', flat=True))
+        chunk_size = options['chunk_size']
+        chunks = [user_ids[start:start + chunk_size] for start in range(0, len(user_ids), chunk_size)]
+        today = date.today()
+
+        started = time.perf_counter()
+        if options['workers'] <= 1:
+            results = [generate_for_users(chunk, options['lists'], today) for chunk in chunks]
+        else:
+            # Forked workers must open their own connections rather than share the parent's
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as pool:
+                results = list(pool.map(generate_for_users, chunks, [options['lists']] * len(chunks),
+                                        [today] * len(chunks)))
+        elapsed = time.perf_counter() - started
+
+        total_users = sum(users for users, _, _ in results)
+        total_lists = sum(lists for _, lists, _ in results)
+        total_items = sum(items for _, _, items in results)
+        rate = total_users / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {total_lists} list(s) with {total_items} item(s) for {total_users} user(s) '
+            f'in {elapsed:.2f} s ({rate:.0f} users/s).'
+        ))
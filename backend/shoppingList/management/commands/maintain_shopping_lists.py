@@ -0,0 +1,41 @@
+# shoppingList/management/commands/maintain_shopping_lists.py
+import time
+from datetime import date
+from django.core.management.base import BaseCommand
+
+from shoppingList.lifecycle import ShoppingListLifecycleService
+
+
+class Command(BaseCommand):
+    help = 'Expire overdue shopping lists and promote each user\'s next list to TRIAGED (safe to run every minute).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every', type=int, default=None, metavar='SECONDS',
+            help='Keep running, repeating the maintenance pass every SECONDS seconds.'
+        )
+
+    def handle(self, *args, **options):
+        if not options['every']:
+            self.run_once()
+            return
+
+        try:
+            while True:
+                started = time.monotonic()
+                self.run_once()
+                time.sleep(max(0, options['every'] - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped.')
+
+    def run_once(self):
+        today = date.today()
+        steps = (
+            ('Expired', ShoppingListLifecycleService.expire_overdue),
+            ('Promoted to TRIAGED', ShoppingListLifecycleService.promote_next),
+        )
+        for label, step in steps:
+            started = time.perf_counter()
+            rows = step(today)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stdout.write(self.style.SUCCESS(f'{label}: {rows} shopping list(s) in {elapsed_ms:.1f} ms'))
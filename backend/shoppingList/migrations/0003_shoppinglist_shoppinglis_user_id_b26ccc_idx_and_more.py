@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-16 22:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingList', '0002_alter_shoppinglistitem_unique_together'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shoppinglist',
+            index=models.Index(fields=['user', 'status'], name='shoppingLis_user_id_b26ccc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppinglist',
+            index=models.Index(fields=['user', 'scheduled_date'], name='shoppingLis_user_id_ea2dea_idx'),
+        ),
+    ]
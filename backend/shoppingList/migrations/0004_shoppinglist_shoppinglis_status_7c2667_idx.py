@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingList', '0003_shoppinglist_shoppinglis_user_id_b26ccc_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shoppinglist',
+            index=models.Index(fields=['status', 'scheduled_date'], name='shoppingLis_status_7c2667_idx'),
+        ),
+    ]
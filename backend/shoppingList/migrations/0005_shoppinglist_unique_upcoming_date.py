@@ -0,0 +1,57 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:21
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+UPCOMING_STATUSES = ('IN_PROGRESS', 'TRIAGED', 'PENDING')
+# The list kept when a user has several upcoming lists on one date: the furthest along
+STATUS_RANK = {'PENDING': 0, 'TRIAGED': 1, 'IN_PROGRESS': 2}
+
+
+def merge_duplicate_upcoming_lists(apps, schema_editor):
+    """
+    Before the constraint, several upcoming lists could share a user and date.
+    Keep one per (user, scheduled_date), move over the items of products it does
+    not have yet, and delete the others.
+    """
+    ShoppingList = apps.get_model('shoppingList', 'ShoppingList')
+    ShoppingListItem = apps.get_model('shoppingList', 'ShoppingListItem')
+
+    upcoming = ShoppingList.objects.filter(status__in=UPCOMING_STATUSES)
+    duplicated = (
+        upcoming.values('user_id', 'scheduled_date')
+        .annotate(lists=Count('id'))
+        .filter(lists__gt=1)
+        .order_by()
+    )
+    for key in duplicated.iterator():
+        lists = sorted(
+            upcoming.filter(user_id=key['user_id'], scheduled_date=key['scheduled_date']),
+            key=lambda shopping_list: (STATUS_RANK[shopping_list.status], shopping_list.id)
+        )
+        kept, extra = lists[0], [shopping_list.id for shopping_list in lists[1:]]
+        products = set(ShoppingListItem.objects.filter(shopping_list=kept).values_list('product_id', flat=True))
+        moved = []
+        for item in ShoppingListItem.objects.filter(shopping_list_id__in=extra).order_by('id'):
+            if item.product_id not in products:
+                products.add(item.product_id)
+                moved.append(item.id)
+        ShoppingListItem.objects.filter(id__in=moved).update(shopping_list=kept)
+        ShoppingList.objects.filter(id__in=extra).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingList', '0004_shoppinglist_shoppinglis_status_7c2667_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_upcoming_lists, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='shoppinglist',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['IN_PROGRESS', 'TRIAGED', 'PENDING'])), fields=('user', 'scheduled_date'), name='unique_upcoming_shopping_list_per_user_date'),
+        ),
+    ]
@@ -6,6 +6,9 @@ from datetime import date
 
 User = get_user_model()
 
+# Lists still ahead of the user; at most one of these per user and date
+UPCOMING_STATUSES = ('IN_PROGRESS', 'TRIAGED', 'PENDING')
+
 
 class ShoppingList(models.Model):
     STATUS_CHOICES = [
@@ -15,6 +18,7 @@ class ShoppingList(models.Model):
         ('COMPLETED', 'Completed'),
         ('EXPIRED', 'Expired'),
     ]
+    UPCOMING_STATUSES = UPCOMING_STATUSES
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='shopping_lists')
     scheduled_date = models.DateField()
@@ -25,6 +29,21 @@ class ShoppingList(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'status']),
+            models.Index(fields=['user', 'scheduled_date']),
+            # Lifecycle maintenance scans by status across all users
+            models.Index(fields=['status', 'scheduled_date']),
+        ]
+        constraints = [
+            # Generators skip taken dates; this keeps concurrent runs from both filling one.
+            # Completed and expired lists may share a date (e.g. lists expired in one pass).
+            models.UniqueConstraint(
+                fields=['user', 'scheduled_date'],
+                condition=models.Q(status__in=UPCOMING_STATUSES),
+                name='unique_upcoming_shopping_list_per_user_date'
+            ),
+        ]
         
     def __str__(self):
         return f"Shopping List for {self.user.username} - {self.scheduled_date}"
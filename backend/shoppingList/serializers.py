@@ -1,9 +1,13 @@
 # shoppingList/serializers.py
 from rest_framework import serializers
+from django.db import transaction as db_transaction
+from django.utils import timezone
 from decimal import Decimal
 from datetime import date, datetime
 from .models import ShoppingList, ShoppingListItem
-from products.models import Product
+from .services import ShoppingListService
+from products.loaders import ProductLoader, ProductLoadingListSerializer
+from transactions.fieldsets import SparseFieldsetSerializerMixin
 
 
 class ShoppingListItemSerializer(serializers.ModelSerializer):
@@ -25,14 +29,17 @@ class ShoppingListItemCreateSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
     predicted_quantity = serializers.DecimalField(max_digits=10, decimal_places=3)
     predicted_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+
+    class Meta:
+        list_serializer_class = ProductLoadingListSerializer
     
     def validate_product_id(self, value):
-        if not Product.objects.filter(id=value).exists():
+        if ProductLoader.for_context(self.context).get(value) is None:
             raise serializers.ValidationError("Product does not exist")
         return value
 
 
-class ShoppingListSerializer(serializers.ModelSerializer):
+class ShoppingListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     items = ShoppingListItemSerializer(many=True, read_only=True)
     total_predicted_amount = serializers.SerializerMethodField()
     item_count = serializers.SerializerMethodField()
@@ -47,9 +54,16 @@ class ShoppingListSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at', 'completed_at']
     
     def get_total_predicted_amount(self, obj):
+        # Annotated by the views (ShoppingListService.annotate_totals); lists loaded elsewhere sum their items
+        annotated = getattr(obj, ShoppingListService.PREDICTED_AMOUNT_ANNOTATION, None)
+        if annotated is not None:
+            return annotated
         return sum(item.predicted_total for item in obj.items.all())
     
     def get_item_count(self, obj):
+        annotated = getattr(obj, ShoppingListService.ITEM_COUNT_ANNOTATION, None)
+        if annotated is not None:
+            return annotated
         return obj.items.count()
 
 
@@ -77,46 +91,100 @@ class ShoppingListCreateUpdateSerializer(serializers.ModelSerializer):
                 )
         return value
     
+    def validate_items(self, value):
+        product_ids = [item['product_id'] for item in value]
+        if len(product_ids) != len(set(product_ids)):
+            raise serializers.ValidationError("Each product can only appear once in a shopping list")
+        return value
+
+    def validate(self, data):
+        # Only one upcoming list per date; completed and expired lists never become upcoming again
+        scheduled_date = data.get('scheduled_date')
+        list_status = data.get('status', self.instance.status if self.instance else 'IN_PROGRESS')
+        if scheduled_date is None or list_status not in ShoppingList.UPCOMING_STATUSES:
+            return data
+        if self.instance and scheduled_date == self.instance.scheduled_date:
+            return data
+
+        user_id = self.instance.user_id if self.instance else self.context['request'].user.id
+        taken = ShoppingList.objects.filter(
+            user_id=user_id, scheduled_date=scheduled_date, status__in=ShoppingList.UPCOMING_STATUSES
+        )
+        if taken.exists():
+            raise serializers.ValidationError({
+                'scheduled_date': "An upcoming shopping list is already scheduled for this date"
+            })
+        return data
+
     def create(self, validated_data):
         items_data = validated_data.pop('items', [])
-        shopping_list = ShoppingList.objects.create(**validated_data)
-        
-        for item_data in items_data:
-            product = Product.objects.get(id=item_data['product_id'])
-            ShoppingListItem.objects.create(
-                shopping_list=shopping_list,
-                product=product,
-                predicted_quantity=item_data['predicted_quantity'],
-                predicted_price=item_data.get('predicted_price')
-            )
-        
+        with db_transaction.atomic():
+            shopping_list = ShoppingList.objects.create(**validated_data)
+            self._write_items(shopping_list, items_data, existing_items=[])
         return shopping_list
     
     def update(self, instance, validated_data):
         items_data = validated_data.pop('items', None)
         
-        # Update shopping list fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        
-        # Update items if provided
-        if items_data is not None:
-            # Clear existing items
-            instance.items.all().delete()
-            
-            # Create new items
-            for item_data in items_data:
-                product = Product.objects.get(id=item_data['product_id'])
-                ShoppingListItem.objects.create(
-                    shopping_list=instance,
-                    product=product,
-                    predicted_quantity=item_data['predicted_quantity'],
-                    predicted_price=item_data.get('predicted_price')
-                )
+        with db_transaction.atomic():
+            # Update shopping list fields
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+
+            # Update items if provided
+            if items_data is not None:
+                self._write_items(instance, items_data, existing_items=list(instance.items.all()))
         
         return instance
 
+    # Item fields the payload sets; purchase state is left to completion and item patches
+    ITEM_FIELDS = ('predicted_quantity', 'predicted_price')
+
+    def _write_items(self, shopping_list, items_data, existing_items):
+        """
+        Make the list's items match items_data with set-based writes. Items are matched
+        to existing rows by product: matches are updated in place (keeping purchase
+        state and created_at) only if a field changed, new products are inserted, and
+        products no longer listed are deleted with one query.
+        """
+        loader = ProductLoader.for_context(self.context)
+        existing_by_product = {}
+        to_delete = []
+        for item in existing_items:
+            if item.product_id in existing_by_product:
+                to_delete.append(item.id)  # Duplicate rows from before products were unique per list
+            else:
+                existing_by_product[item.product_id] = item
+
+        to_create = []
+        to_update = []
+        now = timezone.now()
+        for item_data in items_data:
+            values = {
+                'predicted_quantity': item_data['predicted_quantity'],
+                'predicted_price': item_data.get('predicted_price')
+            }
+            item = existing_by_product.pop(item_data['product_id'], None)
+            if item is None:
+                to_create.append(ShoppingListItem(
+                    shopping_list=shopping_list, product=loader.get(item_data['product_id']), **values
+                ))
+            elif any(getattr(item, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(item, field, value)
+                # bulk_update skips auto_now; conditional GETs rely on it
+                item.updated_at = now
+                to_update.append(item)
+        to_delete.extend(item.id for item in existing_by_product.values())
+
+        if to_delete:
+            ShoppingListItem.objects.filter(shopping_list=shopping_list, id__in=to_delete).delete()
+        if to_update:
+            ShoppingListItem.objects.bulk_update(to_update, [*self.ITEM_FIELDS, 'updated_at'])
+        if to_create:
+            ShoppingListItem.objects.bulk_create(to_create)
+
 
 class ShoppingListGenerateSerializer(serializers.Serializer):
     num_lists = serializers.IntegerField(min_value=1, max_value=12)
@@ -145,13 +213,67 @@ class ShoppingListCompleteSerializer(serializers.Serializer):
         return value
 
 
+class ShoppingListItemPatchSerializer(serializers.Serializer):
+    item_id = serializers.IntegerField()
+    is_purchased = serializers.BooleanField(required=False)
+    actual_quantity = serializers.DecimalField(max_digits=10, decimal_places=3, required=False, allow_null=True)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+
+    def validate(self, data):
+        if len(data) == 1:
+            raise serializers.ValidationError("At least one of is_purchased, actual_quantity or unit_price is required")
+        if data.get('actual_quantity') is not None and data['actual_quantity'] <= 0:
+            raise serializers.ValidationError({"actual_quantity": "Quantity must be a positive value."})
+        if data.get('unit_price') is not None and data['unit_price'] < 0:
+            raise serializers.ValidationError({"unit_price": "Unit price cannot be negative."})
+        return data
+
+
+class ShoppingListItemAckSerializer(serializers.ModelSerializer):
+    """Compact acknowledgement of an item patch."""
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ['id', 'is_purchased', 'actual_quantity', 'unit_price', 'updated_at']
+        read_only_fields = fields
+
+
+class ShoppingListItemsPatchSerializer(serializers.Serializer):
+    # Upper bound on the number of item deltas accepted in one request
+    MAX_ITEMS = 500
+
+    items = ShoppingListItemPatchSerializer(many=True)
+
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one item must be provided")
+        if len(value) > self.MAX_ITEMS:
+            raise serializers.ValidationError(f"At most {self.MAX_ITEMS} items can be updated at once")
+        item_ids = [item['item_id'] for item in value]
+        if len(item_ids) != len(set(item_ids)):
+            raise serializers.ValidationError("Each item can only appear once")
+        return value
+
+
 class ShoppingListSimulateSerializer(serializers.Serializer):
-    num_lists = serializers.IntegerField(min_value=1, max_value=12)
+    # Ten years of weekly lists for in-memory runs; persisted runs keep the old cap
+    MAX_LISTS = 520
+    MAX_PERSISTED_LISTS = 12
+    MAX_RUNS = 10000
+    # Upper bound on runs x lists, which keeps a dry run to about a second
+    MAX_SIMULATED_LISTS = 250000
+
+    num_lists = serializers.IntegerField(min_value=1, max_value=MAX_LISTS)
     start_date = serializers.DateField()
     completion_pattern = serializers.ListField(
         child=serializers.BooleanField(),
         required=False
     )
+    runs = serializers.IntegerField(min_value=1, max_value=MAX_RUNS, default=1)
+    seed = serializers.IntegerField(min_value=0, required=False)
+    persist = serializers.BooleanField(default=False)
+    completion_probability = serializers.FloatField(min_value=0, max_value=1, default=0.5)
+    purchase_probability = serializers.FloatField(min_value=0, max_value=1, default=0.5)
     
     def validate_start_date(self, value):
         if value < date.today():
@@ -167,4 +289,26 @@ class ShoppingListSimulateSerializer(serializers.Serializer):
                 "Completion pattern length must match num_lists"
             )
         
-        return data
\ No newline at end of file
+        if data.get('persist'):
+            if num_lists > self.MAX_PERSISTED_LISTS:
+                raise serializers.ValidationError(
+                    f"At most {self.MAX_PERSISTED_LISTS} lists can be persisted"
+                )
+            if data.get('runs', 1) > 1:
+                raise serializers.ValidationError("Only a single run can be persisted")
+        elif num_lists * data.get('runs', 1) > self.MAX_SIMULATED_LISTS:
+            raise serializers.ValidationError(
+                f"runs x num_lists cannot exceed {self.MAX_SIMULATED_LISTS}"
+            )
+        
+        return data
+
+
+class ShoppingListConvertExpiredSerializer(serializers.Serializer):
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if data.get('start_date') and data.get('end_date') and data['start_date'] > data['end_date']:
+            raise serializers.ValidationError("start_date must be on or before end_date")
+        return data
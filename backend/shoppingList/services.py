@@ -2,10 +2,19 @@
 import random
 from datetime import date, timedelta
 from decimal import Decimal
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, DecimalField, Exists, F, OuterRef, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from .models import ShoppingList, ShoppingListItem
+from .simulation import ShoppingListSimulationEngine
 from products.models import Product
+from products.services import PriceIndexService, ProductFrequencyCalculator
 from transactions.models import Transaction, TransactionProduct
+from transactions.services import SpendingRollupService
+
+# Quantity (3 decimal places) x price (2 decimal places)
+PREDICTED_AMOUNT_FIELD = DecimalField(max_digits=20, decimal_places=5)
 
 
 class ShoppingListGenerator:
@@ -19,6 +28,8 @@ class ShoppingListGenerator:
         
         created_lists = []
         products = list(Product.objects.all()[:10])  # Get some sample products
+        # What the user usually pays for these products, in one lookup
+        prices = PriceIndexService(self.user).get_prices(product.id for product in products)
         
         for i in range(num_lists):
             scheduled_date = start_date + timedelta(weeks=i)
@@ -32,11 +43,16 @@ class ShoppingListGenerator:
             if existing_list:
                 continue
             
-            shopping_list = ShoppingList.objects.create(
-                user=self.user,
-                scheduled_date=scheduled_date,
-                status='IN_PROGRESS'
-            )
+            try:
+                with db_transaction.atomic():
+                    shopping_list = ShoppingList.objects.create(
+                        user=self.user,
+                        scheduled_date=scheduled_date,
+                        status='IN_PROGRESS'
+                    )
+            except IntegrityError:
+                # Another writer scheduled a list on this date since the check above
+                continue
             
             # Add random items to the list
             num_items = random.randint(3, 8)
@@ -44,7 +60,9 @@ class ShoppingListGenerator:
             
             for product in selected_products:
                 quantity = Decimal(str(random.uniform(1, 5))).quantize(Decimal('0.01'))
-                price = Decimal(str(random.uniform(1, 20))).quantize(Decimal('0.01'))
+                price = prices.get(product.id)
+                if price is None:
+                    price = Decimal(str(random.uniform(1, 20))).quantize(Decimal('0.01'))
                 
                 ShoppingListItem.objects.create(
                     shopping_list=shopping_list,
@@ -62,109 +80,221 @@ class ShoppingListSimulator:
     def __init__(self, user):
         self.user = user
     
-    def simulate(self, num_lists, start_date, completion_pattern=None):
-        """Simulate shopping behavior"""
-        if completion_pattern is None:
-            completion_pattern = [random.choice([True, False]) for _ in range(num_lists)]
-        
-        # Generate lists using the generator
-        generator = ShoppingListGenerator(self.user)
-        lists = generator.generate_lists(num_lists, start_date)
-        
-        simulated_data = []
-        completed_count = 0
-        
-        for i, shopping_list in enumerate(lists):
-            will_complete = completion_pattern[i] if i < len(completion_pattern) else random.choice([True, False])
-            
-            if will_complete:
-                # Simulate completion
-                shopping_list.status = 'COMPLETED'
-                shopping_list.completed_at = timezone.now()
-                shopping_list.save()
-                
-                # Mark some items as purchased
-                for item in shopping_list.items.all():
-                    item.is_purchased = random.choice([True, False])
-                    if item.is_purchased:
-                        item.actual_quantity = item.predicted_quantity
-                        item.unit_price = item.predicted_price
-                    item.save()
-                
-                completed_count += 1
-            else:
-                # Mark as expired or keep pending
-                shopping_list.status = random.choice(['EXPIRED', 'PENDING'])
-                shopping_list.save()
-            
-            simulated_data.append({
-                'id': shopping_list.id,
-                'scheduled_date': str(shopping_list.scheduled_date),
-                'status': shopping_list.status,
-                'items': []  # Simplified for simulation
-            })
-        
-        # Calculate final pending products
-        pending_products = 0
-        for shopping_list in lists:
-            if shopping_list.status in ['PENDING', 'EXPIRED']:
-                pending_products += shopping_list.items.filter(is_purchased=False).count()
-        
-        completion_rate = completed_count / len(lists) if lists else 0
-        
+    def simulate(self, num_lists, start_date, completion_pattern=None, runs=1, seed=None, persist=False,
+                 completion_probability=0.5, purchase_probability=0.5):
+        """
+        Simulate shopping behavior over num_lists weekly lists.
+
+        By default this is a dry run (ShoppingListSimulationEngine): `runs` Monte
+        Carlo runs in memory, summarized as distributions, without writing anything.
+        With persist=True a single run is written as real lists and items with bulk
+        writes, skipping dates that already have a list.
+        """
+        engine = ShoppingListSimulationEngine.for_user(
+            self.user, seed=seed,
+            completion_probability=completion_probability, purchase_probability=purchase_probability
+        )
+        if persist:
+            return self._persist(engine, num_lists, start_date, completion_pattern)
+
+        plan = engine.plan(num_lists, start_date)
+        distributions = engine.monte_carlo(plan, runs, completion_pattern)
         return {
-            'simulated_lists': simulated_data,
-            'final_pending_products': pending_products,
-            'completion_rate': completion_rate
+            'seed': engine.seed,
+            'runs': runs,
+            'num_lists': len(plan.dates),
+            'planned_items': plan.item_count,
+            'completion_rate': distributions['completion_rate']['mean'],
+            'final_pending_products': distributions['final_pending_products']['mean'],
+            'statistics': distributions,
+        }
+
+    def _persist(self, engine, num_lists, start_date, completion_pattern):
+        existing_dates = set(ShoppingList.objects.filter(
+            user=self.user, scheduled_date__gte=start_date,
+            scheduled_date__lte=start_date + timedelta(weeks=num_lists)
+        ).values_list('scheduled_date', flat=True))
+        plan = engine.plan(num_lists, start_date, skip_dates=existing_dates)
+        completed, expired, purchased = outcome = engine.run(plan, completion_pattern)
+
+        now = timezone.now()
+        lists = [
+            ShoppingList(
+                user=self.user, scheduled_date=scheduled_date,
+                status='COMPLETED' if done else 'EXPIRED' if lapsed else 'PENDING',
+                completed_at=now if done else None
+            )
+            for scheduled_date, done, lapsed in zip(plan.dates, completed, expired)
+        ]
+        items = []
+        for list_index, product_id, quantity, price, bought in zip(
+            plan.item_list, plan.item_product, plan.item_quantity, plan.item_price, purchased
+        ):
+            quantity = Decimal(str(quantity)).quantize(Decimal('0.01'))
+            price = Decimal(str(price)).quantize(Decimal('0.01'))
+            items.append(ShoppingListItem(
+                shopping_list=lists[list_index], product_id=product_id,
+                predicted_quantity=quantity, predicted_price=price, is_purchased=bought,
+                actual_quantity=quantity if bought else None, unit_price=price if bought else None
+            ))
+        with db_transaction.atomic():
+            ShoppingList.objects.bulk_create(lists)
+            ShoppingListItem.objects.bulk_create(items)
+
+        metrics = engine.summarize(plan, outcome)
+        return {
+            'seed': engine.seed,
+            'simulated_lists': [
+                {
+                    'id': shopping_list.id,
+                    'scheduled_date': str(shopping_list.scheduled_date),
+                    'status': shopping_list.status,
+                    'items': []  # Simplified for simulation
+                }
+                for shopping_list in lists
+            ],
+            'final_pending_products': metrics['final_pending_products'],
+            'completion_rate': metrics['completion_rate']
         }
 
 
 class ShoppingListService:
+    # Names of the annotations added by annotate_totals(), read by ShoppingListSerializer
+    ITEM_COUNT_ANNOTATION = 'annotated_item_count'
+    PREDICTED_AMOUNT_ANNOTATION = 'annotated_total_predicted_amount'
+
+    # Statuses in which items can still be ticked off
+    EDITABLE_STATUSES = ('IN_PROGRESS', 'TRIAGED', 'PENDING')
+    ITEM_PATCH_FIELDS = ('is_purchased', 'actual_quantity', 'unit_price')
+
+    @staticmethod
+    def annotate_totals(queryset):
+        """
+        Annotate each list with its item count and predicted total (quantity x price,
+        items without a price count as zero), computed by the database in the list query.
+        """
+        return queryset.annotate(**{
+            ShoppingListService.ITEM_COUNT_ANNOTATION: Count('items'),
+            ShoppingListService.PREDICTED_AMOUNT_ANNOTATION: Coalesce(
+                Sum(F('items__predicted_quantity') * F('items__predicted_price'), output_field=PREDICTED_AMOUNT_FIELD),
+                Value(Decimal('0')), output_field=PREDICTED_AMOUNT_FIELD
+            ),
+        })
+
+    @staticmethod
+    def patch_items(shopping_list, deltas):
+        """
+        Apply per-item deltas ({item_id, is_purchased?, actual_quantity?, unit_price?})
+        with one SELECT of the addressed items and one bulk UPDATE of the fields sent.
+        The whole batch is rejected if any item_id is not on the list.
+
+        Returns:
+            list[ShoppingListItem]: The updated items, in request order.
+        """
+        if shopping_list.status not in ShoppingListService.EDITABLE_STATUSES:
+            raise ValueError("Items of a completed or expired shopping list cannot be changed")
+
+        items = ShoppingListItem.objects.filter(
+            shopping_list=shopping_list, id__in=[delta['item_id'] for delta in deltas]
+        ).only('id', 'shopping_list_id', *ShoppingListService.ITEM_PATCH_FIELDS, 'updated_at').in_bulk()
+        missing = [delta['item_id'] for delta in deltas if delta['item_id'] not in items]
+        if missing:
+            raise ShoppingListItem.DoesNotExist(missing)
+
+        now = timezone.now()
+        changed_fields = {'updated_at'}
+        updated = []
+        for delta in deltas:
+            item = items[delta['item_id']]
+            for field in ShoppingListService.ITEM_PATCH_FIELDS:
+                if field in delta:
+                    setattr(item, field, delta[field])
+                    changed_fields.add(field)
+            # bulk_update skips auto_now; conditional GETs rely on it
+            item.updated_at = now
+            updated.append(item)
+
+        ShoppingListItem.objects.bulk_update(updated, sorted(changed_fields))
+        return updated
+
     @staticmethod
     def complete_shopping_list(shopping_list, completion_data):
-        """Complete a shopping list and create transaction"""
-        if shopping_list.status not in ['TRIAGED', 'PENDING']:
-            raise ValueError("Shopping list cannot be completed in current status")
-        
-        # Update shopping list
-        shopping_list.status = 'COMPLETED'
-        shopping_list.completed_at = timezone.now()
-        shopping_list.save()
-        
-        # Update items
+        """
+        Complete a shopping list and create its ACTUAL transaction as one atomic unit.
+
+        The list row is locked and its status checked again under the lock, so a
+        second completion of the same list (e.g. from another device) waits for the
+        first and then fails instead of creating a second transaction. Items are
+        updated with one bulk_update and the transaction lines are built from the
+        same in-memory items with one bulk_create. When the client sends no
+        total_amount it is the sum of those lines.
+        """
         item_updates = {item['item_id']: item for item in completion_data['items']}
-        
-        for item in shopping_list.items.all():
-            if item.id in item_updates:
-                update_data = item_updates[item.id]
+
+        with db_transaction.atomic():
+            locked = ShoppingList.objects.select_for_update().get(pk=shopping_list.pk)
+            if locked.status not in ['TRIAGED', 'PENDING']:
+                raise ValueError("Shopping list cannot be completed in current status")
+
+            now = timezone.now()
+            locked.status = 'COMPLETED'
+            locked.completed_at = now
+            locked.save(update_fields=['status', 'completed_at', 'updated_at'])
+
+            items = list(locked.items.all())
+            updated = []
+            for item in items:
+                update_data = item_updates.get(item.id)
+                if update_data is None:
+                    continue
                 item.is_purchased = update_data['is_purchased']
                 if 'actual_quantity' in update_data:
                     item.actual_quantity = update_data['actual_quantity']
                 if 'unit_price' in update_data:
                     item.unit_price = update_data['unit_price']
-                item.save()
-        
-        # Create transaction
-        transaction = Transaction.objects.create(
-            user=shopping_list.user,
-            transaction_type='ACTUAL',
-            transaction_date=date.today(),
-            total_amount=completion_data.get('total_amount', Decimal('0.00')),
-            shopping_list=shopping_list
-        )
+                # bulk_update skips auto_now; conditional GETs rely on it
+                item.updated_at = now
+                updated.append(item)
+            ShoppingListItem.objects.bulk_update(
+                updated, ['is_purchased', 'actual_quantity', 'unit_price', 'updated_at']
+            )
 
-        
-        # Add transaction products
-        for item in shopping_list.items.filter(is_purchased=True):
-            if item.actual_quantity and item.unit_price:
-                TransactionProduct.objects.create(
-                    transaction=transaction,
-                    product=item.product,
+            lines = [
+                TransactionProduct(
+                    product_id=item.product_id,
                     quantity=item.actual_quantity,
                     unit_price=item.unit_price,
                     total_price=item.actual_total
                 )
-        
+                for item in items
+                if item.is_purchased and item.actual_quantity and item.unit_price
+            ]
+            total_amount = completion_data.get('total_amount')
+            if total_amount is None:
+                total_amount = sum((line.total_price for line in lines), Decimal('0.00')).quantize(Decimal('0.01'))
+
+            transaction = Transaction.objects.create(
+                user_id=locked.user_id,
+                transaction_type='ACTUAL',
+                transaction_date=date.today(),
+                total_amount=total_amount,
+                shopping_list=locked
+            )
+            for line in lines:
+                line.transaction = transaction
+            TransactionProduct.objects.bulk_create(lines)
+
+            purchases = [(line.product_id, transaction.transaction_date, line.unit_price) for line in lines]
+            SpendingRollupService(locked.user_id).refresh_dates([transaction.transaction_date])
+            PriceIndexService(locked.user_id).record_purchases(purchases)
+            ProductFrequencyCalculator(locked.user_id).record_purchases(
+                (product_id, purchase_date) for product_id, purchase_date, _ in purchases
+            )
+
+        # Keep the caller's instance in step with the stored row
+        shopping_list.status = locked.status
+        shopping_list.completed_at = locked.completed_at
+        shopping_list.updated_at = locked.updated_at
         return transaction
     
     @staticmethod
@@ -173,26 +303,76 @@ class ShoppingListService:
         if shopping_list.status != 'EXPIRED':
             raise ValueError("Only expired shopping lists can be converted")
 
-        # Calculate total amount
-        total_amount = sum(item.predicted_total for item in shopping_list.items.all() if item.predicted_price)
+        transaction, lines = ShoppingListService._estimated_transaction(shopping_list)
+        with db_transaction.atomic():
+            transaction.save()
+            for line in lines:
+                line.transaction = transaction
+            TransactionProduct.objects.bulk_create(lines)
+            SpendingRollupService(shopping_list.user_id).refresh_dates([transaction.transaction_date])
+
+        return transaction
+
+    @staticmethod
+    def convert_expired_lists(user, start_date=None, end_date=None):
+        """
+        Convert every EXPIRED list of the user that has no transaction yet (optionally
+        only those scheduled within start_date..end_date) to an estimated transaction,
+        in one atomic job: the lists and their items are read with two queries and the
+        transactions and their products written with one bulk_create each.
+
+        Returns {shopping_list_id: transaction_id}.
+        """
+        shopping_lists = (
+            ShoppingList.objects
+            .filter(user=user, status='EXPIRED')
+            .filter(~Exists(Transaction.objects.filter(shopping_list=OuterRef('pk'))))
+            .order_by('scheduled_date', 'id')
+            .prefetch_related('items')
+        )
+        if start_date:
+            shopping_lists = shopping_lists.filter(scheduled_date__gte=start_date)
+        if end_date:
+            shopping_lists = shopping_lists.filter(scheduled_date__lte=end_date)
+
+        with db_transaction.atomic():
+            # Lock the lists so a concurrent run cannot convert them a second time
+            shopping_lists = list(shopping_lists.select_for_update())
+            converted = [
+                ShoppingListService._estimated_transaction(shopping_list) for shopping_list in shopping_lists
+            ]
+            transactions = Transaction.objects.bulk_create([transaction for transaction, _ in converted])
+            lines = []
+            for transaction, transaction_lines in converted:
+                for line in transaction_lines:
+                    line.transaction = transaction
+                lines.extend(transaction_lines)
+            TransactionProduct.objects.bulk_create(lines)
+            SpendingRollupService(user).refresh_dates({transaction.transaction_date for transaction in transactions})
+
+        return {transaction.shopping_list_id: transaction.id for transaction in transactions}
 
-        # Create estimated transaction
-        transaction = Transaction.objects.create(
-            user=shopping_list.user,
+    @staticmethod
+    def _estimated_transaction(shopping_list):
+        """
+        Build (unsaved) the estimated transaction of an expired list and its product
+        lines, one per priced item, in a single pass over the items.
+        """
+        lines = [
+            TransactionProduct(
+                product_id=item.product_id,
+                quantity=item.predicted_quantity,
+                unit_price=item.predicted_price,
+                total_price=item.predicted_total
+            )
+            for item in shopping_list.items.all()
+            if item.predicted_price
+        ]
+        transaction = Transaction(
+            user_id=shopping_list.user_id,
             transaction_type='ESTIMATED',
             transaction_date=shopping_list.scheduled_date,
-            total_amount=total_amount,
+            total_amount=sum((line.total_price for line in lines), Decimal('0.00')).quantize(Decimal('0.01')),
             shopping_list=shopping_list
         )
-
-        # Add transaction products
-        for item in shopping_list.items.all():
-            if item.predicted_price:
-                TransactionProduct.objects.create(
-                    transaction=transaction,
-                    product=item.product,
-                    quantity=item.predicted_quantity,
-                    unit_price=item.predicted_price
-                )
-
-        return transaction
+        return transaction, lines
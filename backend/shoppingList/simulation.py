@@ -0,0 +1,143 @@
+# shoppingList/simulation.py
+import random
+import statistics
+from array import array
+from datetime import timedelta
+from products.models import Product
+from products.services import PriceIndexService
+
+
+class SimulationPlan:
+    """
+    Simulated lists and their items, held column-wise: one entry per list in
+    `dates`, and one entry per item in each item_* array, where item_list is the
+    index of the item's list in `dates`.
+    """
+
+    def __init__(self, dates):
+        self.dates = list(dates)
+        self.item_list = array('l')
+        self.item_product = array('l')
+        self.item_quantity = array('d')
+        self.item_price = array('d')
+
+    def add_item(self, list_index, product_id, quantity, price):
+        self.item_list.append(list_index)
+        self.item_product.append(product_id)
+        self.item_quantity.append(quantity)
+        self.item_price.append(price)
+
+    @property
+    def item_count(self):
+        return len(self.item_list)
+
+
+class ShoppingListSimulationEngine:
+    """
+    Simulates shopping behaviour over planned lists entirely in memory.
+
+    plan() draws the lists once (weekly from the start date, 3-8 of the catalogue
+    products each, priced from the user's price index). run() then draws one
+    outcome over the whole plan: which lists are completed (or follow
+    completion_pattern), which of the rest expire or stay pending, and which items
+    of completed lists were bought. monte_carlo() repeats run() and reports the
+    distribution of each metric. A seed makes the whole simulation reproducible;
+    when none is given one is drawn and returned with the results.
+
+    Outcomes are drawn per column in flat arrays (numpy is not a dependency of
+    this project, so the stdlib random and array modules stand in for it).
+    """
+    ITEMS_PER_LIST = (3, 8)
+    # Products offered to the simulated lists (as ShoppingListGenerator does)
+    CATALOGUE_SIZE = 10
+    METRICS = ('completion_rate', 'final_pending_products', 'purchased_items', 'expired_lists', 'spend')
+
+    def __init__(self, products, prices, seed=None, completion_probability=0.5, purchase_probability=0.5):
+        self.products = list(products)
+        self.prices = prices
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.completion_probability = completion_probability
+        self.purchase_probability = purchase_probability
+
+    @classmethod
+    def for_user(cls, user, **kwargs):
+        """Engine over the sample catalogue, with the user's indexed prices (two queries)."""
+        products = list(Product.objects.order_by('id').values_list('id', flat=True)[:cls.CATALOGUE_SIZE])
+        prices = PriceIndexService(user).get_prices(products)
+        return cls(products, {product_id: float(price) for product_id, price in prices.items()}, **kwargs)
+
+    def plan(self, num_lists, start_date, skip_dates=()):
+        """Plan num_lists weekly lists from start_date, leaving out dates in skip_dates."""
+        rng = self.rng
+        dates = [start_date + timedelta(weeks=week) for week in range(num_lists)]
+        plan = SimulationPlan(scheduled_date for scheduled_date in dates if scheduled_date not in skip_dates)
+        for list_index in range(len(plan.dates)):
+            count = min(rng.randint(*self.ITEMS_PER_LIST), len(self.products))
+            for product_id in rng.sample(self.products, count):
+                price = self.prices.get(product_id)
+                if price is None:
+                    price = round(rng.uniform(1, 20), 2)
+                plan.add_item(list_index, product_id, round(rng.uniform(1, 5), 2), price)
+        return plan
+
+    def run(self, plan, completion_pattern=None):
+        """
+        Draw one outcome. Returns (completed, expired, purchased): a flag per list
+        for the first two and a flag per item for the last.
+        """
+        rng = self.rng.random
+        list_count = len(plan.dates)
+        if completion_pattern:
+            completed = [bool(flag) for flag in completion_pattern[:list_count]]
+            completed += [rng() < self.completion_probability for _ in range(list_count - len(completed))]
+        else:
+            completed = [rng() < self.completion_probability for _ in range(list_count)]
+        # Lists that are not completed expire or stay pending with equal odds
+        expired = [not done and rng() < 0.5 for done in completed]
+        draws = [rng() < self.purchase_probability for _ in range(plan.item_count)]
+        purchased = [completed[list_index] and draw for list_index, draw in zip(plan.item_list, draws)]
+        return completed, expired, purchased
+
+    def summarize(self, plan, outcome):
+        """Metrics of one outcome."""
+        completed, expired, purchased = outcome
+        list_count = len(plan.dates)
+        return {
+            'completion_rate': sum(completed) / list_count if list_count else 0,
+            # Items of lists left pending or expired (their items were never bought)
+            'final_pending_products': sum(1 for list_index in plan.item_list if not completed[list_index]),
+            'purchased_items': sum(purchased),
+            'expired_lists': sum(expired),
+            'spend': round(sum(
+                quantity * price
+                for quantity, price, bought in zip(plan.item_quantity, plan.item_price, purchased) if bought
+            ), 2),
+        }
+
+    def monte_carlo(self, plan, runs, completion_pattern=None):
+        """Run the plan `runs` times. Returns {metric: distribution statistics}."""
+        samples = {metric: [] for metric in self.METRICS}
+        for _ in range(runs):
+            for metric, value in self.summarize(plan, self.run(plan, completion_pattern)).items():
+                samples[metric].append(value)
+        return {metric: self.distribution(values) for metric, values in samples.items()}
+
+    @staticmethod
+    def distribution(values):
+        """Mean, standard deviation, range and 5th/50th/95th percentiles of a sample."""
+        if len(values) > 1:
+            percentiles = statistics.quantiles(values, n=20, method='inclusive')
+            p5, p95, stdev = percentiles[0], percentiles[-1], statistics.stdev(values)
+        else:
+            p5 = p95 = values[0]
+            stdev = 0.0
+        return {
+            'mean': round(statistics.fmean(values), 4),
+            'stdev': round(stdev, 4),
+            'min': min(values),
+            'p5': round(p5, 4),
+            'median': round(statistics.median(values), 4),
+            'p95': round(p95, 4),
+            'max': max(values),
+        }
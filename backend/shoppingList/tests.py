@@ -1,7 +1,12 @@
 import json
 from datetime import date, timedelta
 from decimal import Decimal
-from django.test import TestCase
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
@@ -9,8 +14,12 @@ from rest_framework import status
 from rest_framework.authtoken.models import Token
 from unittest.mock import patch, MagicMock
 
+from shoppingList.fleet import FleetListGenerator
+from shoppingList.lifecycle import ShoppingListLifecycleService
+from shoppingList.services import ShoppingListGenerator, ShoppingListService
+from shoppingList.simulation import ShoppingListSimulationEngine
 from shoppingList.models import ShoppingList, ShoppingListItem
-from products.models import Product
+from products.models import Product, ProductFrequency, ProductPriceIndex
 from transactions.models import Transaction, TransactionProduct
 from profiles.models import UserProfile
 
@@ -197,6 +206,39 @@ class ShoppingListAPITest(APITestCase):
         self.assertEqual(shopping_list.status, 'TRIAGED')
         self.assertEqual(shopping_list.items.count(), 1)
         
+    def test_one_list_per_date(self):
+        """A second list on a taken date is rejected; updating a list keeps its own date."""
+        scheduled_date = date.today() + timedelta(days=7)
+        shopping_list = ShoppingList.objects.create(user=self.user, scheduled_date=scheduled_date)
+
+        response = self.client.post(reverse('shopping-list-list'), {
+            'scheduled_date': str(scheduled_date), 'status': 'IN_PROGRESS'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('scheduled_date', response.data)
+
+        url = reverse('shopping-list-detail', kwargs={'pk': shopping_list.pk})
+        response = self.client.patch(url, {'scheduled_date': str(scheduled_date)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_generate_skips_date_taken_concurrently(self):
+        """A date another writer takes between the existence check and the insert is skipped."""
+        start_date = date.today() + timedelta(days=7)
+        filter_lists = ShoppingList.objects.filter
+
+        def check_then_competitor_writes(**kwargs):
+            checked = filter_lists(**kwargs)
+            if kwargs.get('scheduled_date') == start_date:
+                list(checked)  # The generator's check sees the date free...
+                ShoppingList.objects.create(user=self.user, scheduled_date=start_date)  # ...then it is taken
+            return checked
+
+        with patch.object(ShoppingList.objects, 'filter', side_effect=check_then_competitor_writes):
+            created = ShoppingListGenerator(self.user).generate_lists(2, start_date)
+
+        self.assertEqual([shopping_list.scheduled_date for shopping_list in created], [start_date + timedelta(weeks=1)])
+        self.assertEqual(ShoppingList.objects.filter(user=self.user, scheduled_date=start_date).count(), 1)
+
     def test_delete_shopping_list_in_progress(self):
         """Test DELETE /shopping-lists/{id}/ for IN_PROGRESS list"""
         shopping_list = ShoppingList.objects.create(
@@ -491,4 +533,790 @@ class ShoppingListItemTest(TestCase):
         # This would depend on your actual model implementation
         items = self.shopping_list.items.all()
         total = sum(item.predicted_quantity * (item.predicted_price or 0) for item in items)
-        self.assertEqual(total, Decimal('7.00'))
\ No newline at end of file
+        self.assertEqual(total, Decimal('7.00'))
+
+class ShoppingListConditionalGetTest(APITestCase):
+    """Test ETag / Last-Modified handling on shopping list reads"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='etaglistuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.product = Product.objects.create(name='Butter', category='Dairy')
+        self.shopping_list = ShoppingList.objects.create(
+            user=self.user, scheduled_date=date.today() + timedelta(days=7), status='PENDING'
+        )
+        self.item = ShoppingListItem.objects.create(
+            shopping_list=self.shopping_list, product=self.product,
+            predicted_quantity=Decimal('1.000'), predicted_price=Decimal('2.50')
+        )
+        self.list_url = reverse('shopping-list-list')
+        self.detail_url = reverse('shopping-list-detail', args=[self.shopping_list.id])
+
+    def test_list_and_detail_not_modified(self):
+        for url in (self.list_url, self.detail_url):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response.content, b'')
+
+    def test_item_change_without_parent_save_invalidates(self):
+        """Item rows are part of the validator, not just the list's own updated_at"""
+        etag = self.client.get(self.detail_url)['ETag']
+        self.item.is_purchased = True
+        self.item.save()
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['data']['items'][0]['is_purchased'])
+
+    def test_item_removal_invalidates(self):
+        etag = self.client.get(self.list_url)['ETag']
+        self.item.delete()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ShoppingListSparseFieldsetTest(APITestCase):
+    """Test ?fields= / ?expand= on shopping list reads"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='fieldslistuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.product = Product.objects.create(name='Pasta', category='Grains')
+        for weeks in range(1, 4):
+            shopping_list = ShoppingList.objects.create(
+                user=self.user, scheduled_date=date.today() + timedelta(weeks=weeks), status='PENDING'
+            )
+            ShoppingListItem.objects.create(
+                shopping_list=shopping_list, product=self.product,
+                predicted_quantity=Decimal('2.000'), predicted_price=Decimal('1.25')
+            )
+        self.url = reverse('shopping-list-list')
+
+    def test_summary_skips_items(self):
+        response = self.client.get(self.url + '?fields=id,scheduled_date,status')
+        results = response.data['data']['results']
+        self.assertEqual(len(results), 3)
+        self.assertEqual(set(results[0]), {'id', 'scheduled_date', 'status'})
+
+    def test_summary_does_not_query_items(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url + '?fields=id,scheduled_date')
+        item_reads = [
+            q['sql'] for q in ctx.captured_queries
+            if 'shoppingList_shoppinglistitem' in q['sql'] and 'MAX(' not in q['sql']
+        ]
+        self.assertEqual(item_reads, [])
+
+    def test_expand_items_and_totals(self):
+        response = self.client.get(self.url + '?fields=id,item_count,total_predicted_amount&expand=items')
+        result = response.data['data']['results'][0]
+        self.assertEqual(set(result), {'id', 'item_count', 'total_predicted_amount', 'items'})
+        self.assertEqual(result['item_count'], 1)
+        self.assertEqual(result['items'][0]['product_name'], 'Pasta')
+
+    def test_detail_fields(self):
+        shopping_list = ShoppingList.objects.filter(user=self.user).first()
+        response = self.client.get(reverse('shopping-list-detail', args=[shopping_list.id]) + '?fields=status')
+        self.assertEqual(response.data['data'], {'status': 'PENDING'})
+
+
+class ShoppingListProductLoaderTest(APITestCase):
+    """Item products are checked and attached with a single product query."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='listloader', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.products = [Product.objects.create(name=f'List Loader {i}') for i in range(6)]
+
+    def test_create_resolves_products_once(self):
+        items = [{'product_id': product.id, 'predicted_quantity': '1.000'} for product in self.products]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('shopping-list-list'), {
+                'scheduled_date': str(date.today() + timedelta(days=3)), 'status': 'IN_PROGRESS', 'items': items
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        # Product lookups made before the response is serialized
+        write_queries = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('INSERT') or 'FROM "products_product"' in q['sql']
+        ]
+        last_insert = max(i for i, sql in enumerate(write_queries) if sql.startswith('INSERT'))
+        self.assertEqual(len([sql for sql in write_queries[:last_insert] if sql.startswith('SELECT')]), 1)
+        self.assertEqual(ShoppingList.objects.get(id=response.data['data']['id']).items.count(), 6)
+
+    def test_missing_product_error(self):
+        response = self.client.post(reverse('shopping-list-list'), {
+            'scheduled_date': str(date.today() + timedelta(days=3)), 'status': 'IN_PROGRESS',
+            'items': [{'product_id': 999999, 'predicted_quantity': '1.000'}]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['items'][0]['product_id'], ['Product does not exist'])
+
+
+class ShoppingListItemDiffWriteTest(APITestCase):
+    """List edits only touch the items that changed, with a constant number of queries."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='diffwriter', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.products = [Product.objects.create(name=f'Diff Product {i:02d}') for i in range(52)]
+
+    def create_list(self, count):
+        response = self.client.post(reverse('shopping-list-list'), {
+            # One list per user and date
+            'scheduled_date': str(date.today() + timedelta(days=3 + ShoppingList.objects.count())),
+            'status': 'IN_PROGRESS',
+            'items': [
+                {'product_id': product.id, 'predicted_quantity': '1.000', 'predicted_price': '2.00'}
+                for product in self.products[:count]
+            ]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return ShoppingList.objects.get(id=response.data['data']['id'])
+
+    def edit(self, shopping_list, count):
+        """Change one quantity, drop the last item and add a new product."""
+        items = [
+            {'product_id': product.id, 'predicted_quantity': '1.000', 'predicted_price': '2.00'}
+            for product in self.products[:count - 1]
+        ]
+        items[0]['predicted_quantity'] = '3.000'
+        items.append({'product_id': self.products[51].id, 'predicted_quantity': '2.000'})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.put(
+                reverse('shopping-list-detail', args=[shopping_list.id]),
+                {'scheduled_date': str(shopping_list.scheduled_date), 'status': 'IN_PROGRESS', 'items': items},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response, len(ctx.captured_queries)
+
+    def test_edit_keeps_unchanged_items(self):
+        shopping_list = self.create_list(5)
+        items = {item.product_id: item for item in shopping_list.items.all()}
+        ShoppingListItem.objects.filter(id=items[self.products[1].id].id).update(
+            is_purchased=True, actual_quantity=Decimal('1.000')
+        )
+
+        response, _ = self.edit(shopping_list, 5)
+        after = {item.product_id: item for item in shopping_list.items.all()}
+        self.assertEqual(len(after), 5)
+        self.assertNotIn(self.products[4].id, after)
+        self.assertEqual(after[self.products[51].id].predicted_price, None)
+        self.assertEqual(after[self.products[0].id].predicted_quantity, Decimal('3.000'))
+        self.assertGreater(after[self.products[0].id].updated_at, items[self.products[0].id].updated_at)
+        # Matched rows keep their identity and purchase state
+        for product in self.products[:4]:
+            self.assertEqual(after[product.id].id, items[product.id].id)
+            self.assertEqual(after[product.id].created_at, items[product.id].created_at)
+        self.assertTrue(after[self.products[1].id].is_purchased)
+        self.assertEqual(after[self.products[2].id].updated_at, items[self.products[2].id].updated_at)
+
+        # The response reflects the new items
+        self.assertEqual(
+            sorted(item['product'] for item in response.data['data']['items']), sorted(after)
+        )
+
+    def test_edit_query_count_is_constant(self):
+        _, small = self.edit(self.create_list(5), 5)
+        _, large = self.edit(self.create_list(50), 50)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 15)
+
+    def test_duplicate_products_rejected(self):
+        shopping_list = self.create_list(2)
+        item = {'product_id': self.products[0].id, 'predicted_quantity': '1.000'}
+        response = self.client.put(
+            reverse('shopping-list-detail', args=[shopping_list.id]),
+            {'scheduled_date': str(shopping_list.scheduled_date), 'status': 'IN_PROGRESS', 'items': [item, item]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(shopping_list.items.count(), 2)
+
+
+class ShoppingListItemPatchTest(APITestCase):
+    """Test PATCH /api/shopping-lists/{id}/items/."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='ticker', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.shopping_list = ShoppingList.objects.create(
+            user=self.user, scheduled_date=date.today(), status='PENDING'
+        )
+        self.items = [
+            ShoppingListItem.objects.create(
+                shopping_list=self.shopping_list, product=Product.objects.create(name=f'Tick {i}'),
+                predicted_quantity=Decimal('1.000'), predicted_price=Decimal('2.00')
+            )
+            for i in range(3)
+        ]
+        self.url = reverse('shopping-list-items', args=[self.shopping_list.id])
+
+    def test_tick_item_is_one_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(self.url, {'items': [
+                {'item_id': self.items[0].id, 'is_purchased': True, 'actual_quantity': '2.000', 'unit_price': '1.99'}
+            ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['data']['updated'], 1)
+        ack = response.data['data']['items'][0]
+        self.assertEqual(ack['id'], self.items[0].id)
+        self.assertTrue(ack['is_purchased'])
+        self.assertEqual(ack['unit_price'], '1.99')
+
+        writes = [q['sql'] for q in ctx.captured_queries if not q['sql'].startswith('SELECT')]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE "shoppingList_shoppinglistitem"'))
+        self.assertNotIn('predicted_quantity', writes[0])
+
+        item = ShoppingListItem.objects.get(id=self.items[0].id)
+        self.assertTrue(item.is_purchased)
+        self.assertEqual(item.actual_quantity, Decimal('2.000'))
+        self.assertGreater(item.updated_at, self.items[0].updated_at)
+
+    def test_batch_only_touches_sent_fields(self):
+        ShoppingListItem.objects.filter(id=self.items[1].id).update(unit_price=Decimal('5.00'))
+        response = self.client.patch(self.url, {'items': [
+            {'item_id': self.items[1].id, 'is_purchased': True},
+            {'item_id': self.items[2].id, 'actual_quantity': '3.000'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual([ack['id'] for ack in response.data['data']['items']], [self.items[1].id, self.items[2].id])
+        second, third = ShoppingListItem.objects.get(id=self.items[1].id), ShoppingListItem.objects.get(id=self.items[2].id)
+        self.assertEqual(second.unit_price, Decimal('5.00'))
+        self.assertTrue(second.is_purchased)
+        self.assertFalse(third.is_purchased)
+        self.assertEqual(third.actual_quantity, Decimal('3.000'))
+
+    def test_rejects_unknown_items_and_closed_lists(self):
+        other_list = ShoppingList.objects.create(
+            user=self.user, scheduled_date=date.today() + timedelta(days=1), status='PENDING'
+        )
+        foreign = ShoppingListItem.objects.create(
+            shopping_list=other_list, product=Product.objects.create(name='Elsewhere'), predicted_quantity=Decimal('1')
+        )
+        response = self.client.patch(self.url, {'items': [
+            {'item_id': self.items[0].id, 'is_purchased': True},
+            {'item_id': foreign.id, 'is_purchased': True},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ShoppingListItem.objects.get(id=self.items[0].id).is_purchased)
+
+        for payload in ({'items': []}, {'items': [{'item_id': self.items[0].id}]},
+                        {'items': [{'item_id': self.items[0].id, 'is_purchased': True}] * 2}):
+            response = self.client.patch(self.url, payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, payload)
+
+        self.shopping_list.status = 'COMPLETED'
+        self.shopping_list.save()
+        response = self.client.patch(self.url, {'items': [{'item_id': self.items[0].id, 'is_purchased': True}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        other_user = User.objects.create_user(username='notmine', password='testpass123')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=other_user).key)
+        response = self.client.patch(self.url, {'items': [{'item_id': self.items[0].id, 'is_purchased': True}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ShoppingListTotalsTest(APITestCase):
+    """item_count and total_predicted_amount are aggregated by the list query."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='totalsuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.products = [Product.objects.create(name=f'Totals {i}') for i in range(3)]
+        self.url = reverse('shopping-list-list')
+
+    def create_lists(self, count):
+        existing = ShoppingList.objects.filter(user=self.user).count()
+        for offset in range(existing, existing + count):
+            shopping_list = ShoppingList.objects.create(
+                user=self.user, scheduled_date=date.today() + timedelta(days=offset), status='PENDING'
+            )
+            ShoppingListItem.objects.bulk_create([
+                ShoppingListItem(
+                    shopping_list=shopping_list, product=product,
+                    predicted_quantity=Decimal('2.000'), predicted_price=Decimal('1.25')
+                )
+                for product in self.products
+            ])
+
+    def count_list_queries(self, query=''):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_lists(self):
+        self.create_lists(5)
+        few = self.count_list_queries('?fields=id,item_count,total_predicted_amount')
+        few_full = self.count_list_queries()
+        self.create_lists(195)
+        self.assertEqual(self.count_list_queries('?fields=id,item_count,total_predicted_amount'), few)
+        self.assertEqual(self.count_list_queries(), few_full)
+
+    def test_totals_match_items(self):
+        priced = ShoppingList.objects.create(user=self.user, scheduled_date=date.today(), status='PENDING')
+        ShoppingListItem.objects.create(
+            shopping_list=priced, product=self.products[0],
+            predicted_quantity=Decimal('1.500'), predicted_price=Decimal('2.10')
+        )
+        ShoppingListItem.objects.create(
+            shopping_list=priced, product=self.products[1], predicted_quantity=Decimal('4.000')
+        )
+        empty = ShoppingList.objects.create(
+            user=self.user, scheduled_date=date.today() + timedelta(days=1), status='PENDING'
+        )
+
+        response = self.client.get(self.url + '?fields=id,item_count,total_predicted_amount')
+        totals = {row['id']: row for row in response.data['data']['results']}
+        self.assertEqual(totals[priced.id]['item_count'], 2)
+        self.assertEqual(totals[priced.id]['total_predicted_amount'], Decimal('3.15'))
+        self.assertEqual(totals[empty.id]['item_count'], 0)
+        self.assertEqual(totals[empty.id]['total_predicted_amount'], Decimal('0'))
+
+        detail = self.client.get(reverse('shopping-list-detail', args=[priced.id])).data['data']
+        self.assertEqual(detail['item_count'], 2)
+        self.assertEqual(detail['total_predicted_amount'], sum(item.predicted_total for item in priced.items.all()))
+
+    def test_admin_changelist(self):
+        self.create_lists(20)
+        admin = User.objects.create_superuser(username='totalsadmin', password='testpass123')
+        self.client.force_login(admin)
+        url = reverse('admin:shoppingList_shoppinglist_changelist')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url + '?o=5')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        per_list_counts = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('SELECT COUNT(*) AS "__count" FROM "shoppingList_shoppinglistitem"')
+        ]
+        self.assertEqual(per_list_counts, [])
+        self.assertContains(response, '<td class="field-item_count">3</td>', count=20)
+
+
+class ShoppingListLifecycleTest(TestCase):
+    """Expiry and promotion run as one UPDATE each, across all users."""
+
+    def setUp(self):
+        self.today = date.today()
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', password='testpass123')
+        self.carol = User.objects.create_user(username='carol', password='testpass123')
+
+    def make(self, user, days, status):
+        return ShoppingList.objects.create(
+            user=user, scheduled_date=self.today + timedelta(days=days), status=status
+        )
+
+    def statuses(self, *lists):
+        return [ShoppingList.objects.get(id=shopping_list.id).status for shopping_list in lists]
+
+    def test_expire_overdue(self):
+        overdue = [self.make(self.alice, -1, 'TRIAGED'), self.make(self.bob, -10, 'PENDING')]
+        kept = [
+            self.make(self.alice, 0, 'PENDING'), self.make(self.bob, -3, 'IN_PROGRESS'),
+            self.make(self.carol, -3, 'COMPLETED'),
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(ShoppingListLifecycleService.expire_overdue(self.today), 2)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(self.statuses(*overdue), ['EXPIRED', 'EXPIRED'])
+        self.assertEqual(self.statuses(*kept), ['PENDING', 'IN_PROGRESS', 'COMPLETED'])
+
+    def test_promote_next(self):
+        alice_next = self.make(self.alice, 3, 'IN_PROGRESS')
+        alice_later = self.make(self.alice, 10, 'IN_PROGRESS')
+        alice_past = self.make(self.alice, -2, 'IN_PROGRESS')
+        bob_triaged = self.make(self.bob, 5, 'TRIAGED')
+        bob_next = self.make(self.bob, 1, 'IN_PROGRESS')
+        carol_first = self.make(self.carol, 0, 'IN_PROGRESS')
+        carol_later = self.make(self.carol, 7, 'IN_PROGRESS')
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(ShoppingListLifecycleService.promote_next(self.today), 2)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn('ROW_NUMBER() OVER', ctx.captured_queries[0]['sql'])
+        self.assertEqual(
+            self.statuses(alice_next, alice_later, alice_past, bob_triaged, bob_next, carol_first, carol_later),
+            ['TRIAGED', 'IN_PROGRESS', 'IN_PROGRESS', 'TRIAGED', 'IN_PROGRESS', 'TRIAGED', 'IN_PROGRESS']
+        )
+
+    def test_command_is_idempotent(self):
+        overdue = self.make(self.alice, -1, 'TRIAGED')
+        upcoming = self.make(self.alice, 2, 'IN_PROGRESS')
+
+        out = StringIO()
+        call_command('maintain_shopping_lists', stdout=out)
+        self.assertIn('Expired: 1 shopping list(s)', out.getvalue())
+        self.assertIn('Promoted to TRIAGED: 1 shopping list(s)', out.getvalue())
+        self.assertEqual(self.statuses(overdue, upcoming), ['EXPIRED', 'TRIAGED'])
+
+        out = StringIO()
+        call_command('maintain_shopping_lists', stdout=out)
+        self.assertIn('Expired: 0 shopping list(s)', out.getvalue())
+        self.assertIn('Promoted to TRIAGED: 0 shopping list(s)', out.getvalue())
+        self.assertEqual(self.statuses(overdue, upcoming), ['EXPIRED', 'TRIAGED'])
+
+
+class FleetListGeneratorTest(TestCase):
+    """generate_fleet_lists tops users up to N upcoming lists from their profile and predictions."""
+
+    def setUp(self):
+        # A Wednesday, so the weekday arithmetic is easy to follow
+        self.today = date(2026, 10, 14)
+        self.user = User.objects.create_user(username='fleetuser', password='testpass123')
+        UserProfile.objects.filter(user=self.user).update(
+            preferred_shopping_day=5, preferred_shopping_frequency='FORTNIGHTLY'
+        )
+        self.bread = Product.objects.create(name='Fleet Bread')
+        self.rice = Product.objects.create(name='Fleet Rice')
+        for product, interval, last_purchase in ((self.bread, 7, date(2026, 10, 10)),
+                                                 (self.rice, 30, date(2026, 10, 1))):
+            ProductFrequency.objects.create(
+                user=self.user, product=product, average_interval_days=interval, interval_mean=interval,
+                frequency_category='WEEKLY', last_purchase_date=last_purchase, total_purchases=4,
+                confidence_score=Decimal('0.80')
+            )
+        ProductPriceIndex.objects.create(
+            user=self.user, product=self.bread, last_price=Decimal('2.10'), last_purchased_on=date(2026, 10, 10),
+            mean_price=Decimal('2.00'), median_price=Decimal('2.05'), purchase_count=4
+        )
+        transaction = Transaction.objects.create(
+            user=self.user, transaction_date=date(2026, 10, 10), total_amount=Decimal('4.20')
+        )
+        TransactionProduct.objects.create(
+            transaction=transaction, product=self.bread, quantity=Decimal('2'), unit_price=Decimal('2.10')
+        )
+
+    def test_lists_follow_profile_and_predictions(self):
+        lists_created, items_created = FleetListGenerator(self.today).generate([self.user.id], 3)
+        self.assertEqual((lists_created, items_created), (3, 4))
+
+        lists = ShoppingList.objects.filter(user=self.user).order_by('scheduled_date')
+        self.assertEqual(
+            [shopping_list.scheduled_date for shopping_list in lists],
+            [date(2026, 10, 17), date(2026, 10, 31), date(2026, 11, 14)]
+        )
+        items = {
+            shopping_list.scheduled_date: {
+                item.product_id: (item.predicted_quantity, item.predicted_price) for item in shopping_list.items.all()
+            }
+            for shopping_list in lists
+        }
+        self.assertEqual(items[date(2026, 10, 17)], {self.bread.id: (Decimal('2.000'), Decimal('2.05'))})
+        self.assertEqual(items[date(2026, 10, 31)], {
+            self.bread.id: (Decimal('2.000'), Decimal('2.05')), self.rice.id: (Decimal('1.000'), None)
+        })
+        self.assertEqual(set(items[date(2026, 11, 14)]), {self.bread.id})
+
+    def test_tops_up_without_duplicates(self):
+        ShoppingList.objects.create(user=self.user, scheduled_date=date(2026, 10, 31), status='PENDING')
+        ShoppingList.objects.create(user=self.user, scheduled_date=date(2026, 10, 17), status='EXPIRED')
+        FleetListGenerator(self.today).generate([self.user.id], 3)
+        self.assertEqual(
+            list(ShoppingList.objects.filter(user=self.user, status='IN_PROGRESS')
+                 .order_by('scheduled_date').values_list('scheduled_date', flat=True)),
+            [date(2026, 11, 14), date(2026, 11, 28)]
+        )
+        self.assertEqual(FleetListGenerator(self.today).generate([self.user.id], 3), (0, 0))
+
+    def test_overlapping_runs_do_not_duplicate(self):
+        """A second run working from the same (now stale) snapshot creates nothing."""
+        generator = FleetListGenerator(self.today)
+        snapshot = generator._load_scheduled_dates([self.user.id])
+        self.assertEqual(generator.generate([self.user.id], 3), (3, 4))
+
+        with patch.object(FleetListGenerator, '_load_scheduled_dates', return_value=snapshot):
+            self.assertEqual(FleetListGenerator(self.today).generate([self.user.id], 3), (0, 0))
+        self.assertEqual(ShoppingList.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(ShoppingListItem.objects.filter(shopping_list__user=self.user).count(), 4)
+
+    def test_query_count_does_not_grow_with_users(self):
+        def queries_for(user_count, prefix):
+            user_ids = [
+                User.objects.create_user(username=f'{prefix}{i}', password='testpass123').id
+                for i in range(user_count)
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                FleetListGenerator(self.today).generate(user_ids + [self.user.id], 2)
+            ShoppingList.objects.filter(user_id=self.user.id).delete()
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries_for(2, 'few'), queries_for(40, 'many'))
+
+    def test_command(self):
+        other = User.objects.create_user(username='fleetother', password='testpass123')
+        out = StringIO()
+        call_command('generate_fleet_lists', '--lists', '2', '--workers', '1', '--chunk-size', '1', stdout=out)
+        self.assertIn('for 2 user(s)', out.getvalue())
+        self.assertIn('users/s', out.getvalue())
+        self.assertEqual(ShoppingList.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(ShoppingList.objects.filter(user=other).count(), 2)
+
+
+class ShoppingListDryRunSimulationTest(APITestCase):
+    """Simulations run in memory unless persist is requested."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='simuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        for i in range(10):
+            Product.objects.create(name=f'Sim {i}')
+        self.url = reverse('shopping-list-simulate')
+        self.start_date = date.today() + timedelta(days=7)
+
+    def simulate(self, **data):
+        data.setdefault('start_date', str(self.start_date))
+        return self.client.post(self.url, data, format='json')
+
+    def test_dry_run_is_seeded_and_read_only(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.simulate(num_lists=520, runs=200, seed=42)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertFalse([q for q in ctx.captured_queries if not q['sql'].startswith('SELECT')])
+        self.assertFalse(ShoppingList.objects.exists())
+
+        data = response.data['data']
+        self.assertEqual((data['seed'], data['runs'], data['num_lists']), (42, 200, 520))
+        self.assertEqual(set(data['statistics']), set(ShoppingListSimulationEngine.METRICS))
+        rate = data['statistics']['completion_rate']
+        self.assertTrue(rate['min'] <= rate['p5'] <= rate['median'] <= rate['p95'] <= rate['max'])
+        self.assertAlmostEqual(rate['mean'], 0.5, delta=0.05)
+        self.assertEqual(self.simulate(num_lists=520, runs=200, seed=42).data['data'], data)
+
+    def test_engine_outcomes(self):
+        engine = ShoppingListSimulationEngine([1, 2, 3, 4, 5], {1: 2.5}, seed=7, purchase_probability=1)
+        plan = engine.plan(4, self.start_date)
+        self.assertEqual(plan.dates, [self.start_date + timedelta(weeks=week) for week in range(4)])
+        self.assertTrue(all(price == 2.5 for product, price in zip(plan.item_product, plan.item_price) if product == 1))
+
+        completed, expired, purchased = outcome = engine.run(plan, [True, False, True, False])
+        self.assertEqual(completed, [True, False, True, False])
+        self.assertFalse(expired[0] or expired[2])
+        self.assertEqual(purchased, [completed[list_index] for list_index in plan.item_list])
+        metrics = engine.summarize(plan, outcome)
+        self.assertEqual(metrics['completion_rate'], 0.5)
+        self.assertEqual(metrics['purchased_items'] + metrics['final_pending_products'], plan.item_count)
+
+    def test_persist_uses_bulk_writes(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.simulate(num_lists=6, seed=3, persist=True, completion_pattern=[True, False] * 3)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        inserts = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+
+        lists = ShoppingList.objects.filter(user=self.user).order_by('scheduled_date')
+        self.assertEqual([sl['id'] for sl in response.data['data']['simulated_lists']], [sl.id for sl in lists])
+        self.assertEqual([sl.status == 'COMPLETED' for sl in lists], [True, False] * 3)
+        self.assertFalse(ShoppingListItem.objects.filter(
+            shopping_list__status__in=['PENDING', 'EXPIRED'], is_purchased=True
+        ).exists())
+        self.assertEqual(response.data['data']['completion_rate'], 0.5)
+
+        # Dates that already have a list are skipped
+        self.simulate(num_lists=7, seed=3, persist=True)
+        self.assertEqual(ShoppingList.objects.filter(user=self.user).count(), 7)
+
+    def test_limits(self):
+        for data in ({'num_lists': 13, 'persist': True}, {'num_lists': 2, 'runs': 2, 'persist': True},
+                     {'num_lists': 521}, {'num_lists': 500, 'runs': 1000}, {'num_lists': 2, 'purchase_probability': 2}):
+            self.assertEqual(self.simulate(**data).status_code, status.HTTP_400_BAD_REQUEST, data)
+
+
+class ShoppingListCompletionTest(TestCase):
+    """complete_shopping_list is one atomic unit with bulk item and line writes."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='completer', password='testpass123')
+        self.products = [Product.objects.create(name=f'Complete {i}') for i in range(20)]
+
+    def make_list(self, item_count):
+        shopping_list = ShoppingList.objects.create(
+            user=self.user, scheduled_date=date.today() + timedelta(days=ShoppingList.objects.count()),
+            status='TRIAGED'
+        )
+        items = ShoppingListItem.objects.bulk_create([
+            ShoppingListItem(shopping_list=shopping_list, product=product, predicted_quantity=Decimal('1.000'))
+            for product in self.products[:item_count]
+        ])
+        payload = {'items': [
+            {'item_id': item.id, 'is_purchased': index % 2 == 0,
+             'actual_quantity': Decimal('1.500'), 'unit_price': Decimal('2.00')}
+            for index, item in enumerate(items)
+        ]}
+        return shopping_list, payload
+
+    def test_query_count_does_not_grow_with_items(self):
+        counts = []
+        for item_count in (2, 20):
+            shopping_list, payload = self.make_list(item_count)
+            with CaptureQueriesContext(connection) as ctx:
+                ShoppingListService.complete_shopping_list(shopping_list, payload)
+            counts.append([q['sql'].split()[0] for q in ctx.captured_queries
+                           if 'shoppingList_shoppinglistitem' in q['sql'] or 'transactionproduct' in q['sql']])
+            ShoppingList.objects.filter(id=shopping_list.id).delete()
+        self.assertEqual(counts[0], counts[1])
+
+    def test_total_amount_from_lines(self):
+        shopping_list, payload = self.make_list(3)
+        transaction = ShoppingListService.complete_shopping_list(shopping_list, payload)
+        self.assertEqual(transaction.total_amount, Decimal('6.00'))
+        self.assertEqual(
+            sorted(transaction.products.values_list('total_price', flat=True)), [Decimal('3.00'), Decimal('3.00')]
+        )
+        self.assertEqual(shopping_list.status, 'COMPLETED')
+        self.assertEqual(ShoppingListItem.objects.filter(shopping_list=shopping_list, is_purchased=True).count(), 2)
+
+        shopping_list, payload = self.make_list(1)
+        payload['total_amount'] = Decimal('9.99')
+        self.assertEqual(ShoppingListService.complete_shopping_list(shopping_list, payload).total_amount, Decimal('9.99'))
+
+    def test_second_completion_is_rejected(self):
+        shopping_list, payload = self.make_list(2)
+        stale_copy = ShoppingList.objects.get(id=shopping_list.id)
+        ShoppingListService.complete_shopping_list(shopping_list, payload)
+        with self.assertRaises(ValueError):
+            ShoppingListService.complete_shopping_list(stale_copy, payload)
+        self.assertEqual(Transaction.objects.filter(shopping_list=shopping_list).count(), 1)
+
+    def test_failure_rolls_back(self):
+        shopping_list, payload = self.make_list(2)
+        with patch.object(TransactionProduct.objects, 'bulk_create', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                ShoppingListService.complete_shopping_list(shopping_list, payload)
+        self.assertEqual(ShoppingList.objects.get(id=shopping_list.id).status, 'TRIAGED')
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+        self.assertFalse(ShoppingListItem.objects.filter(shopping_list=shopping_list, is_purchased=True).exists())
+
+
+class ShoppingListConvertExpiredTest(APITestCase):
+    """POST /shopping-lists/convert-expired/ converts every eligible list in one job."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='returning', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.products = [Product.objects.create(name=f'Expired {i}') for i in range(3)]
+        self.url = reverse('shopping-list-convert-expired')
+
+    def make_expired(self, weeks_ago, status='EXPIRED'):
+        shopping_list = ShoppingList.objects.create(
+            user=self.user, scheduled_date=date.today() - timedelta(weeks=weeks_ago), status=status
+        )
+        ShoppingListItem.objects.bulk_create([
+            ShoppingListItem(shopping_list=shopping_list, product=self.products[0],
+                             predicted_quantity=Decimal('2.000'), predicted_price=Decimal('1.50')),
+            ShoppingListItem(shopping_list=shopping_list, product=self.products[1],
+                             predicted_quantity=Decimal('1.000'), predicted_price=Decimal('4.00')),
+            ShoppingListItem(shopping_list=shopping_list, product=self.products[2],
+                             predicted_quantity=Decimal('1.000')),
+        ])
+        return shopping_list
+
+    def test_converts_all_eligible_lists(self):
+        expired = [self.make_expired(weeks) for weeks in range(1, 6)]
+        already_converted = self.make_expired(8)
+        ShoppingListService.convert_expired_to_transaction(already_converted)
+        pending = self.make_expired(2, status='PENDING')
+
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        converted = response.data['data']['converted']
+        self.assertEqual(set(converted), {shopping_list.id for shopping_list in expired})
+        self.assertEqual(response.data['data']['count'], 5)
+
+        for shopping_list in expired:
+            transaction = Transaction.objects.get(id=converted[shopping_list.id])
+            self.assertEqual(transaction.shopping_list_id, shopping_list.id)
+            self.assertEqual(transaction.transaction_type, 'ESTIMATED')
+            self.assertEqual(transaction.transaction_date, shopping_list.scheduled_date)
+            self.assertEqual(transaction.total_amount, Decimal('7.00'))
+            self.assertEqual(transaction.products.count(), 2)
+        self.assertFalse(Transaction.objects.filter(shopping_list=pending).exists())
+
+        # Nothing is left to convert
+        self.assertEqual(self.client.post(self.url, {}, format='json').data['data']['converted'], {})
+
+    def test_query_count_does_not_grow_with_lists(self):
+        def queries_for(list_count):
+            for weeks in range(1, list_count + 1):
+                self.make_expired(weeks)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(self.url, {}, format='json')
+            self.assertEqual(response.data['data']['count'], list_count)
+            Transaction.objects.all().delete()
+            ShoppingList.objects.all().delete()
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries_for(2), queries_for(30))
+
+    def test_date_range_and_rollback(self):
+        recent, older = self.make_expired(1), self.make_expired(10)
+        response = self.client.post(self.url, {
+            'start_date': str(date.today() - timedelta(weeks=2)), 'end_date': str(date.today())
+        }, format='json')
+        self.assertEqual(set(response.data['data']['converted']), {recent.id})
+
+        with patch.object(TransactionProduct.objects, 'bulk_create', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                ShoppingListService.convert_expired_lists(self.user)
+        self.assertFalse(Transaction.objects.filter(shopping_list=older).exists())
+
+        response = self.client.post(self.url, {
+            'start_date': str(date.today()), 'end_date': str(date.today() - timedelta(days=1))
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MergeDuplicateUpcomingListsMigrationTest(TransactionTestCase):
+    """0005 merges upcoming lists sharing a user and date before adding the constraint."""
+    migrate_from = [('shoppingList', '0004_shoppinglist_shoppinglis_status_7c2667_idx')]
+    migrate_to = [('shoppingList', '0005_shoppinglist_unique_upcoming_date')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_duplicates_are_merged(self):
+        apps = self.migrate(self.migrate_from)
+        ShoppingList = apps.get_model('shoppingList', 'ShoppingList')
+        ShoppingListItem = apps.get_model('shoppingList', 'ShoppingListItem')
+        Product = apps.get_model('products', 'Product')
+        user = apps.get_model('auth', 'User').objects.create(username='migrated')
+        bread, milk = Product.objects.create(name='Merge Bread'), Product.objects.create(name='Merge Milk')
+        day = date(2026, 11, 7)
+
+        in_progress = ShoppingList.objects.create(user=user, scheduled_date=day, status='IN_PROGRESS')
+        pending = ShoppingList.objects.create(user=user, scheduled_date=day, status='PENDING')
+        expired = ShoppingList.objects.create(user=user, scheduled_date=day, status='EXPIRED')
+        for shopping_list, product in ((in_progress, bread), (in_progress, milk), (pending, bread)):
+            ShoppingListItem.objects.create(shopping_list=shopping_list, product=product, predicted_quantity=1)
+
+        apps = self.migrate(self.migrate_to)
+        ShoppingList = apps.get_model('shoppingList', 'ShoppingList')
+        self.assertEqual(
+            sorted(ShoppingList.objects.filter(user_id=user.id).values_list('id', flat=True)),
+            [pending.id, expired.id]
+        )
+        # The kept (furthest along) list gains the products only the removed list had
+        kept = ShoppingList.objects.get(id=pending.id)
+        self.assertEqual(sorted(kept.items.values_list('product_id', flat=True)), [bread.id, milk.id])
+
@@ -1,12 +1,20 @@
 # shoppingList/urls.py
 from django.urls import path
 from . import views
+from .async_views import AsyncShoppingListListView, AsyncShoppingListDetailView
 
 urlpatterns = [
-    path('', views.ShoppingListListCreateView.as_view(), name='shopping-list-list'),
-    path('<int:pk>/', views.ShoppingListDetailView.as_view(), name='shopping-list-detail'),
+    # Reads are served by async views; other methods fall through to the DRF views
+    path('', AsyncShoppingListListView.as_view(
+        sync_view=views.ShoppingListListCreateView.as_view()
+    ), name='shopping-list-list'),
+    path('<int:pk>/', AsyncShoppingListDetailView.as_view(
+        sync_view=views.ShoppingListDetailView.as_view()
+    ), name='shopping-list-detail'),
     path('generate/', views.generate_shopping_lists, name='shopping-list-generate'),
     path('<int:pk>/complete/', views.complete_shopping_list, name='shopping-list-complete'),
+    path('<int:pk>/items/', views.patch_shopping_list_items, name='shopping-list-items'),
     path('<int:pk>/convert-to-transaction/', views.convert_to_transaction, name='shopping-list-convert-to-transaction'),
+    path('convert-expired/', views.convert_expired_shopping_lists, name='shopping-list-convert-expired'),
     path('simulate/', views.simulate_shopping_behavior, name='shopping-list-simulate'),
-]
\ No newline at end of file
+]
@@ -13,13 +13,39 @@ from .serializers import (
     ShoppingListCreateUpdateSerializer,
     ShoppingListGenerateSerializer,
     ShoppingListCompleteSerializer,
+    ShoppingListConvertExpiredSerializer,
+    ShoppingListItemAckSerializer,
+    ShoppingListItemsPatchSerializer,
     ShoppingListSimulateSerializer
 )
 from .services import ShoppingListGenerator, ShoppingListSimulator, ShoppingListService
+from transactions.conditional import ConditionalGetMixin
+from transactions.fieldsets import SparseFieldsetViewMixin
 
+# Prefetches needed to render each ShoppingListSerializer field that reads the items
+SHOPPING_LIST_PREFETCHES = {
+    'items': ('items__product',),
+}
+# Serializer fields computed by ShoppingListService.annotate_totals in the list query
+SHOPPING_LIST_TOTALS = {'item_count', 'total_predicted_amount'}
 
-class ShoppingListListCreateView(generics.ListCreateAPIView):
+
+class ShoppingListTotalsMixin:
+    """Annotates item_count/total_predicted_amount when the response renders them."""
+
+    def annotate_totals(self, queryset):
+        names = self.get_requested_field_names()
+        if names is None or names & SHOPPING_LIST_TOTALS:
+            return ShoppingListService.annotate_totals(queryset)
+        return queryset
+
+
+class ShoppingListListCreateView(ShoppingListTotalsMixin, SparseFieldsetViewMixin, ConditionalGetMixin,
+                                 generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
+    conditional_nested = ('items',)
+    fieldset_prefetches = SHOPPING_LIST_PREFETCHES
+    fieldset_required = ('id', 'created_at')
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -43,7 +69,7 @@ class ShoppingListListCreateView(generics.ListCreateAPIView):
         if end_date:
             queryset = queryset.filter(scheduled_date__lte=end_date)
         
-        return queryset.prefetch_related('items__product')
+        return self.annotate_totals(self.narrow_queryset(queryset))
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -51,7 +77,7 @@ class ShoppingListListCreateView(generics.ListCreateAPIView):
         
         shopping_list = serializer.save(user=request.user)
         
-        response_serializer = ShoppingListSerializer(shopping_list)
+        response_serializer = ShoppingListSerializer(self.get_queryset().get(pk=shopping_list.pk))
         return Response({
             'success': True,
             'data': response_serializer.data,
@@ -60,13 +86,17 @@ class ShoppingListListCreateView(generics.ListCreateAPIView):
     
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
+
+        not_modified = self.not_modified_response(request, queryset)
+        if not_modified is not None:
+            return not_modified
         
         # Handle pagination
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
             paginated_response = self.get_paginated_response(serializer.data)
-            return Response({
+            return self.set_conditional_headers(Response({
                 'success': True,
                 'data': {
                     'results': serializer.data,
@@ -76,15 +106,19 @@ class ShoppingListListCreateView(generics.ListCreateAPIView):
                         'previous': paginated_response.data['previous']
                     }
                 }
-            })
+            }))
         
         serializer = self.get_serializer(queryset, many=True)
+        return self.set_conditional_headers(self.list_response(serializer.data))
+
+    def list_response(self, data):
+        """Envelope for an unpaginated list (shared with the async read path)."""
         return Response({
             'success': True,
             'data': {
-                'results': serializer.data,
+                'results': data,
                 'meta': {
-                    'count': len(serializer.data),
+                    'count': len(data),
                     'next': None,
                     'previous': None
                 }
@@ -92,8 +126,11 @@ class ShoppingListListCreateView(generics.ListCreateAPIView):
         })
 
 
-class ShoppingListDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ShoppingListDetailView(ShoppingListTotalsMixin, SparseFieldsetViewMixin, ConditionalGetMixin,
+                             generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
+    conditional_nested = ('items',)
+    fieldset_prefetches = SHOPPING_LIST_PREFETCHES
     
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -101,14 +138,22 @@ class ShoppingListDetailView(generics.RetrieveUpdateDestroyAPIView):
         return ShoppingListSerializer
     
     def get_queryset(self):
-        return ShoppingList.objects.filter(user=self.request.user).prefetch_related('items__product')
+        return self.annotate_totals(self.narrow_queryset(ShoppingList.objects.filter(user=self.request.user)))
     
     def retrieve(self, request, *args, **kwargs):
+        not_modified = self.not_modified_response(request, self.get_queryset().filter(pk=kwargs['pk']))
+        if not_modified is not None:
+            return not_modified
+
         instance = self.get_object()
         serializer = self.get_serializer(instance)
+        return self.set_conditional_headers(self.retrieve_response(serializer.data))
+
+    def retrieve_response(self, data):
+        """Envelope for a single shopping list (shared with the async read path)."""
         return Response({
             'success': True,
-            'data': serializer.data
+            'data': data
         })
     
     def update(self, request, *args, **kwargs):
@@ -117,9 +162,10 @@ class ShoppingListDetailView(generics.RetrieveUpdateDestroyAPIView):
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
         
-        shopping_list = serializer.save()
-        
-        response_serializer = ShoppingListSerializer(shopping_list)
+        serializer.save()
+
+        # Reload with the item prefetches; the instance's prefetched items are stale
+        response_serializer = ShoppingListSerializer(self.get_object())
         return Response({
             'success': True,
             'data': response_serializer.data,
@@ -200,6 +246,47 @@ def complete_shopping_list(request, pk):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['PATCH'])
+@permission_classes([IsAuthenticated])
+def patch_shopping_list_items(request, pk):
+    """
+    PATCH /shopping-lists/{id}/items/
+    Tick items off (or correct them) without resending the list. Accepts
+    {"items": [{item_id, is_purchased, actual_quantity, unit_price}, ...]} where
+    every field but item_id is optional, and returns a compact acknowledgement.
+    """
+    shopping_list = get_object_or_404(
+        ShoppingList.objects.filter(user=request.user).only('id', 'user_id', 'status'),
+        pk=pk
+    )
+
+    serializer = ShoppingListItemsPatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    try:
+        items = ShoppingListService.patch_items(shopping_list, serializer.validated_data['items'])
+    except ShoppingListItem.DoesNotExist as e:
+        return Response({
+            'success': False,
+            'message': 'Validation failed',
+            'errors': {'items': [f'Item {item_id} is not on this shopping list' for item_id in e.args[0]]}
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except ValueError as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'success': True,
+        'message': 'Shopping list items updated successfully',
+        'data': {
+            'updated': len(items),
+            'items': ShoppingListItemAckSerializer(items, many=True).data
+        }
+    })
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def convert_to_transaction(request, pk):
@@ -233,6 +320,25 @@ def convert_to_transaction(request, pk):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def convert_expired_shopping_lists(request):
+    """Convert all of the user's unconverted expired lists to estimated transactions"""
+    serializer = ShoppingListConvertExpiredSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    converted = ShoppingListService.convert_expired_lists(request.user, **serializer.validated_data)
+    
+    return Response({
+        'success': True,
+        'data': {
+            'converted': converted,
+            'count': len(converted)
+        },
+        'message': f'Converted {len(converted)} expired shopping list(s) to estimated transactions'
+    })
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def simulate_shopping_behavior(request):
@@ -241,11 +347,7 @@ def simulate_shopping_behavior(request):
     serializer.is_valid(raise_exception=True)
     
     simulator = ShoppingListSimulator(request.user)
-    simulation_result = simulator.simulate(
-        num_lists=serializer.validated_data['num_lists'],
-        start_date=serializer.validated_data['start_date'],
-        completion_pattern=serializer.validated_data.get('completion_pattern')
-    )
+    simulation_result = simulator.simulate(**serializer.validated_data)
     
     return Response({
         'success': True,
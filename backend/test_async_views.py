@@ -0,0 +1,194 @@
+import asyncio
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient
+from django.urls import get_resolver, resolve, reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import BasePermission
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework.throttling import BaseThrottle
+
+from products.models import Product
+from profiles.views import UserProfileViewSet
+from shoppingList.models import ShoppingList, ShoppingListItem
+from shoppingList.views import ShoppingListDetailView, ShoppingListListCreateView
+from transactions.async_views import AsyncReadView
+from transactions.models import Transaction, TransactionProduct
+from transactions.views import TransactionViewSet
+
+User = get_user_model()
+
+
+class DenyAll(BasePermission):
+    def has_permission(self, request, view):
+        return False
+
+
+class ThrottleAll(BaseThrottle):
+    def allow_request(self, request, view):
+        return False
+
+
+def fail_delegate(self, request, *args, **kwargs):
+    raise AssertionError(f'{request.method} {request.get_full_path()} was delegated to the sync view')
+
+
+class AsyncReadViewTest(APITestCase):
+    """
+    The list/detail reads of transactions and shopping lists and the profile read
+    are served by async views. Their output must match the sync DRF views exactly.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='asyncuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.auth = f'Token {self.token.key}'
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+        self.factory = APIRequestFactory()
+
+        self.product = Product.objects.create(name='Tea', category='Drinks')
+        for days_ago in range(3):
+            transaction = Transaction.objects.create(
+                user=self.user, transaction_date=date.today() - timedelta(days=days_ago),
+                total_amount=Decimal('4.00')
+            )
+            TransactionProduct.objects.create(
+                transaction=transaction, product=self.product, quantity=Decimal('2'), unit_price=Decimal('2.00')
+            )
+        self.transaction = transaction
+        self.shopping_list = ShoppingList.objects.create(
+            user=self.user, scheduled_date=date.today() + timedelta(days=7), status='PENDING'
+        )
+        ShoppingListItem.objects.create(
+            shopping_list=self.shopping_list, product=self.product,
+            predicted_quantity=Decimal('1.000'), predicted_price=Decimal('3.00')
+        )
+
+    def sync_response(self, view, path, **kwargs):
+        """Call the sync DRF view directly, bypassing the async URL."""
+        request = self.factory.get(path, HTTP_AUTHORIZATION=self.auth)
+        response = view(request, **kwargs)
+        response.render()
+        return response
+
+    def read_cases(self):
+        transaction_list = TransactionViewSet.as_view({'get': 'list'})
+        transaction_detail = TransactionViewSet.as_view({'get': 'retrieve'})
+        list_url = reverse('transaction-list')
+        shopping_list_url = reverse('shopping-list-list')
+        return [
+            (list_url, transaction_list, {}),
+            (list_url + '?page_size=2&page=2', transaction_list, {}),
+            (list_url + '?pagination=cursor&page_size=2&include_count=true', transaction_list, {}),
+            (list_url + '?fields=id,total_amount&transaction_type=ACTUAL', transaction_list, {}),
+            (reverse('transaction-detail', args=[self.transaction.id]), transaction_detail, {'pk': self.transaction.id}),
+            (shopping_list_url, ShoppingListListCreateView.as_view(), {}),
+            (shopping_list_url + '?status=PENDING&fields=id,item_count', ShoppingListListCreateView.as_view(), {}),
+            (reverse('shopping-list-detail', args=[self.shopping_list.id]), ShoppingListDetailView.as_view(),
+             {'pk': self.shopping_list.id}),
+            (reverse('profile-detail'), UserProfileViewSet.as_view({'get': 'retrieve'}), {}),
+        ]
+
+    def test_routes_are_async(self):
+        for url in (reverse('transaction-list'), reverse('shopping-list-list'), reverse('profile-detail'),
+                    reverse('transaction-detail', args=[1]), reverse('shopping-list-detail', args=[1])):
+            self.assertTrue(resolve(url).func.view_class.view_is_async, url)
+
+    def test_async_reads_match_sync_views(self):
+        with patch.object(AsyncReadView, 'delegate', fail_delegate):
+            async_responses = [self.client.get(url) for url, _, _ in self.read_cases()]
+
+        for (url, sync_view, kwargs), async_response in zip(self.read_cases(), async_responses):
+            sync_response = self.sync_response(sync_view, url, **kwargs)
+            self.assertEqual(async_response.status_code, sync_response.status_code, url)
+            self.assertEqual(json.loads(async_response.content), json.loads(sync_response.content), url)
+            self.assertEqual(async_response['Content-Type'], sync_response['Content-Type'], url)
+            if 'ETag' in sync_response:
+                self.assertEqual(async_response['ETag'], sync_response['ETag'], url)
+
+    def test_async_conditional_get(self):
+        url = reverse('shopping-list-detail', args=[self.shopping_list.id])
+        with patch.object(AsyncReadView, 'delegate', fail_delegate):
+            etag = self.client.get(url)['ETag']
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_errors_are_answered_by_sync_view(self):
+        """Missing credentials, bad filters and unknown ids keep DRF's error responses."""
+        self.client.credentials()
+        response = self.client.get(reverse('transaction-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+        response = self.client.get(reverse('transaction-list') + '?transaction_type=BOGUS')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('transaction-list') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse('shopping-list-detail', args=[999999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_nested_fields_without_prefetch(self):
+        """Nested and expanded fields that load relations lazily are served by the async path."""
+        cases = [
+            (reverse('transaction-list') + '?fields=id&expand=products',
+             TransactionViewSet.as_view({'get': 'list'}), {}),
+            (reverse('transaction-detail', args=[self.transaction.id]),
+             TransactionViewSet.as_view({'get': 'retrieve'}), {'pk': self.transaction.id}),
+            (reverse('shopping-list-list'), ShoppingListListCreateView.as_view(), {}),
+            (reverse('shopping-list-detail', args=[self.shopping_list.id]), ShoppingListDetailView.as_view(),
+             {'pk': self.shopping_list.id}),
+        ]
+        with patch.object(TransactionViewSet, 'fieldset_prefetches', {}), \
+                patch.object(ShoppingListListCreateView, 'fieldset_prefetches', {}), \
+                patch.object(ShoppingListDetailView, 'fieldset_prefetches', {}):
+            for url, sync_view, kwargs in cases:
+                with patch.object(AsyncReadView, 'delegate', fail_delegate):
+                    async_response = self.client.get(url)
+                self.assertEqual(async_response.status_code, status.HTTP_200_OK, url)
+                sync_response = self.sync_response(sync_view, url, **kwargs)
+                self.assertEqual(json.loads(async_response.content), json.loads(sync_response.content), url)
+
+    def test_permissions_and_throttles_are_enforced(self):
+        """The async path runs the view's permission and throttle checks before reading."""
+        url = reverse('transaction-list')
+        with patch.object(TransactionViewSet, 'permission_classes', [DenyAll]):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        with patch.object(ShoppingListDetailView, 'throttle_classes', [ThrottleAll]):
+            response = self.client.get(reverse('shopping-list-detail', args=[self.shopping_list.id]))
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        other = User.objects.create_user(username='otherasync', password='testpass123')
+        with patch.object(TransactionViewSet, 'get_queryset', lambda view: Transaction.objects.all()):
+            self.transaction.user = other
+            self.transaction.save()
+            response = self.client.get(reverse('transaction-detail', args=[self.transaction.id]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_route_names_are_unique(self):
+        """The router does not register a second pattern under the async routes' names."""
+        for name in ('transaction-list', 'transaction-detail'):
+            self.assertEqual(len(get_resolver().reverse_dict.getlist(name)), 1, name)
+
+    def test_writes_still_reach_drf_views(self):
+        response = self.client.put(reverse('profile-detail'), {'preferred_shopping_day': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['preferred_shopping_day'], 2)
+
+        response = self.client.delete(reverse('shopping-list-detail', args=[self.shopping_list.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    async def test_concurrent_reads(self):
+        """Several reads in flight at once on one event loop."""
+        client = AsyncClient()
+        urls = [url for url, _, _ in self.read_cases()]
+        with patch.object(AsyncReadView, 'delegate', fail_delegate):
+            responses = await asyncio.gather(*(
+                client.get(url, headers={'Authorization': self.auth}) for url in urls
+            ))
+        self.assertEqual([response.status_code for response in responses], [200] * len(urls))
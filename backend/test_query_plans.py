@@ -0,0 +1,166 @@
+import re
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from products.models import Product
+from shoppingList.models import ShoppingList, ShoppingListItem
+from shoppingList.services import ShoppingListService
+from transactions.models import Transaction, TransactionProduct
+from transactions.services import SpendingRollupService
+
+User = get_user_model()
+
+# Plan lines such as "SCAN transactions_transaction" (or "SCAN TABLE ..." on older
+# SQLite versions) mean every row of a per-user table is read.
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?"?(transactions_|shoppingList_)\w+', re.IGNORECASE)
+
+
+class QueryPlanRegressionTest(APITestCase):
+    """
+    Runs the real view and service code paths, captures every statement they issue
+    and checks the EXPLAIN QUERY PLAN output of each one. A statement against the
+    transaction or shopping list tables that falls back to a full table scan fails
+    the test, which catches a dropped index or an unindexable filter.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='planuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+        self.products = [
+            Product.objects.create(name=f'Plan Product {i}', category='Plan') for i in range(3)
+        ]
+        self.transaction = Transaction.objects.create(
+            user=self.user, transaction_date=date.today() - timedelta(days=3),
+            transaction_type='ACTUAL', total_amount=Decimal('3.00')
+        )
+        for product in self.products:
+            TransactionProduct.objects.create(
+                transaction=self.transaction, product=product,
+                quantity=Decimal('1.00'), unit_price=Decimal('1.00')
+            )
+        self.shopping_list = ShoppingList.objects.create(
+            user=self.user, scheduled_date=date.today() + timedelta(days=7), status='PENDING'
+        )
+        for product in self.products:
+            ShoppingListItem.objects.create(
+                shopping_list=self.shopping_list, product=product,
+                predicted_quantity=Decimal('1.000'), predicted_price=Decimal('2.00')
+            )
+
+    def assertNoFullScans(self, captured_queries):
+        checked = 0
+        for query in captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+            scans = [line for line in plan if FULL_SCAN.match(line)]
+            self.assertFalse(scans, f'Full table scan in plan {plan} for query: {sql}')
+            checked += 1
+        self.assertGreater(checked, 0)
+
+    def run_and_check(self, method, url, data=None, expected_status=status.HTTP_200_OK):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertEqual(response.status_code, expected_status, getattr(response, 'data', None))
+        self.assertNoFullScans(ctx.captured_queries)
+        return response
+
+    def test_transaction_list_plans(self):
+        Transaction.objects.create(
+            user=self.user, transaction_date=date.today() - timedelta(days=10), transaction_type='ESTIMATED'
+        )
+        url = reverse('transaction-list')
+        self.run_and_check('get', url)
+        self.run_and_check('get', url + f'?transaction_type=ACTUAL&date_from={date.today() - timedelta(days=30)}')
+        self.run_and_check('get', url + '?page=1&page_size=10')
+        response = self.run_and_check('get', url + '?pagination=cursor&page_size=1&include_count=true')
+        self.run_and_check('get', url + f"?cursor={response.data['data']['next_cursor']}&page_size=1")
+
+    def test_transaction_detail_plans(self):
+        url = reverse('transaction-detail', args=[self.transaction.id])
+        self.run_and_check('get', url)
+        self.run_and_check('patch', url, {
+            'products': [{'product_id': self.products[0].id, 'quantity': '2.00', 'unit_price': '1.00'}]
+        })
+        self.run_and_check('delete', url, expected_status=status.HTTP_204_NO_CONTENT)
+
+    def test_transaction_write_and_report_plans(self):
+        self.run_and_check('post', reverse('transaction-list'), {
+            'transaction_date': str(date.today()),
+            'products': [{'product_id': self.products[1].id, 'quantity': '1.00', 'unit_price': '2.00'}]
+        }, expected_status=status.HTTP_201_CREATED)
+        self.run_and_check('post', reverse('transaction-bulk-create'), [{
+            'transaction_date': str(date.today()),
+            'products': [{'product_id': self.products[2].id, 'quantity': '1.00', 'unit_price': '2.00'}]
+        }], expected_status=status.HTTP_201_CREATED)
+        self.run_and_check('get', reverse('transaction-analytics') + '?period=week')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('transaction-export') + '?format=csv')
+            b''.join(response.streaming_content)
+        self.assertNoFullScans(ctx.captured_queries)
+
+    def test_shopping_list_plans(self):
+        list_url = reverse('shopping-list-list')
+        detail_url = reverse('shopping-list-detail', args=[self.shopping_list.id])
+        self.run_and_check('get', list_url)
+        self.run_and_check('get', list_url + '?status=PENDING')
+        self.run_and_check('get', detail_url)
+        self.run_and_check('patch', detail_url, {
+            'items': [{'product_id': self.products[0].id, 'predicted_quantity': '2.000'}]
+        })
+
+    def test_shopping_list_service_plans(self):
+        items = list(self.shopping_list.items.all())
+        with CaptureQueriesContext(connection) as ctx:
+            ShoppingListService.complete_shopping_list(self.shopping_list, {
+                'items': [
+                    {'item_id': item.id, 'is_purchased': True, 'actual_quantity': Decimal('1.000'),
+                     'unit_price': Decimal('2.00')}
+                    for item in items
+                ]
+            })
+        self.assertNoFullScans(ctx.captured_queries)
+
+        expired = ShoppingList.objects.create(
+            user=self.user, scheduled_date=date.today() - timedelta(days=7), status='EXPIRED'
+        )
+        ShoppingListItem.objects.create(
+            shopping_list=expired, product=self.products[0],
+            predicted_quantity=Decimal('1.000'), predicted_price=Decimal('2.00')
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            ShoppingListService.convert_expired_to_transaction(expired)
+        self.assertNoFullScans(ctx.captured_queries)
+
+        expired.pk = None
+        expired.save()
+        with CaptureQueriesContext(connection) as ctx:
+            ShoppingListService.convert_expired_lists(self.user, start_date=expired.scheduled_date)
+        self.assertNoFullScans(ctx.captured_queries)
+
+    def test_rollup_refresh_plans(self):
+        with CaptureQueriesContext(connection) as ctx:
+            SpendingRollupService(self.user).refresh_dates([self.transaction.transaction_date])
+        self.assertNoFullScans(ctx.captured_queries)
+
+    def test_product_history_lookup_plan(self):
+        # Purchase history per product, as used by the frequency calculations
+        queryset = TransactionProduct.objects.filter(
+            product=self.products[0], transaction__user=self.user
+        ).values_list('transaction__transaction_date', flat=True)
+        with CaptureQueriesContext(connection) as ctx:
+            list(queryset)
+        self.assertNoFullScans(ctx.captured_queries)
@@ -0,0 +1,153 @@
+# transactions/async_views.py
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.authentication import get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+
+async def aauthenticate(request):
+    """
+    Async counterpart of TokenAuthentication. Returns the active user for a valid
+    `Authorization: Token <key>` header, otherwise None.
+    """
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != b'token':
+        return None
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        return None
+    token = await Token.objects.select_related('user').filter(key=key).afirst()
+    if token is None or not token.user.is_active:
+        return None
+    return token.user
+
+
+class AsyncReadView(View):
+    """
+    Serves GET/HEAD for a DRF view with the async ORM, so a read does not hold a
+    worker thread while it waits on the database under ASGI.
+
+    `sync_view` is the DRF view (the result of as_view()) for the same route. The
+    async path builds that view class, runs the read through `read()` and renders
+    the DRF Response inline, so envelopes and headers are unchanged. Everything the
+    fast path does not cover is handed to `sync_view`: other HTTP methods, missing
+    or invalid credentials, non-JSON renderers, requests the view's permission or
+    throttle classes refuse and reads that raise (invalid filters or cursors,
+    missing objects). Error responses therefore stay exactly what DRF produces.
+    Serializers run through serialize(), on a thread, since a field may load a
+    relation the queryset did not prefetch and the ORM is sync-only there.
+    """
+    sync_view = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # CSRF is enforced by DRF's authentication classes for the delegated view
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def delegate(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+    post = put = patch = delete = options = delegate
+
+    async def get(self, request, *args, **kwargs):
+        user = await aauthenticate(request)
+        if user is None:
+            return await self.delegate(request, *args, **kwargs)
+
+        view = self.build_view(request, *args, **kwargs)
+        drf_request = view.request
+        drf_request.user = user
+        if not isinstance(drf_request.accepted_renderer, JSONRenderer):
+            return await self.delegate(request, *args, **kwargs)
+
+        try:
+            # The same checks DRF's initial() runs; throttles may use the (sync) cache
+            await sync_to_async(view.check_permissions)(drf_request)
+            await sync_to_async(view.check_throttles)(drf_request)
+        except APIException:
+            return await self.delegate(request, *args, **kwargs)
+
+        try:
+            response = await self.read(view, drf_request, *args, **kwargs)
+        except (APIException, Http404):
+            response = None
+        if response is None:
+            return await self.delegate(request, *args, **kwargs)
+        return self.render(view, drf_request, response)
+
+    async def read(self, view, request, *args, **kwargs):
+        """Return a DRF Response (or a Django 304/412), or None to let the sync view answer."""
+        raise NotImplementedError
+
+    @staticmethod
+    @sync_to_async
+    def serialize(view, instance, many=False):
+        """The view's serializer data for instance (or a list of instances with many=True)."""
+        return view.get_serializer(instance, many=many).data
+
+    def build_view(self, request, *args, **kwargs):
+        """Set up an instance of the DRF view class as its dispatch() would, without authenticating."""
+        view = self.sync_view.cls(**self.sync_view.initkwargs)
+        actions = getattr(self.sync_view, 'actions', None)
+        if actions:
+            view.action_map = actions
+            view.action = actions.get(request.method.lower())
+        view.args = args
+        view.kwargs = kwargs
+        view.request = view.initialize_request(request, *args, **kwargs)
+        view.headers = view.default_response_headers
+        view.format_kwarg = view.get_format_suffix(**kwargs)
+        view.request.accepted_renderer, view.request.accepted_media_type = (
+            view.perform_content_negotiation(view.request)
+        )
+        return view
+
+    def render(self, view, request, response):
+        if isinstance(response, Response):
+            response = view.finalize_response(request, response)
+            # JSON rendering is CPU-only; doing it here saves the handler a thread hop
+            response.render()
+        return response
+
+
+class AsyncTransactionListView(AsyncReadView):
+    """Async GET for TransactionViewSet.list (filters, both paginators, fieldsets, ETags)."""
+
+    async def read(self, view, request):
+        queryset = view.filter_queryset(view.get_queryset())
+
+        not_modified = await view.anot_modified_response(request, queryset)
+        if not_modified is not None:
+            return not_modified
+
+        page = await view.paginator.apaginate_queryset(queryset, request, view=view)
+        if page is not None:
+            data = await self.serialize(view, page, many=True)
+            return view.set_conditional_headers(view.get_paginated_response(data))
+
+        data = await self.serialize(view, [obj async for obj in queryset], many=True)
+        return view.set_conditional_headers(view.list_response(data))
+
+
+class AsyncTransactionDetailView(AsyncReadView):
+    """Async GET for TransactionViewSet.retrieve."""
+
+    async def read(self, view, request, pk):
+        queryset = view.get_queryset().filter(pk=pk)
+
+        not_modified = await view.anot_modified_response(request, queryset)
+        if not_modified is not None:
+            return not_modified
+
+        instance = await queryset.afirst()
+        if instance is None:
+            return None
+        await sync_to_async(view.check_object_permissions)(request, instance)
+        data = await self.serialize(view, instance)
+        return view.set_conditional_headers(view.retrieve_response(data))
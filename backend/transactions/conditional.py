@@ -0,0 +1,98 @@
+# transactions/conditional.py
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for list and detail reads of models with an
+    `updated_at` column.
+
+    The validators come from one aggregate (row count and latest updated_at) over
+    the same filtered queryset the view would serialize, plus one per related name
+    in `conditional_nested`, so a 304 costs no serialization. The ETag also covers
+    the user and the full request path (filters, page, cursor). Deleting a row
+    lowers the count and therefore changes the ETag; If-Modified-Since alone cannot
+    see deletions, which is why If-None-Match takes precedence when both are sent.
+
+    Writers that change nested rows without saving the parent must set the child's
+    updated_at (bulk_update and queryset.update() skip auto_now).
+    """
+    # Related names of child rows (with their own updated_at) that are part of the representation
+    conditional_nested = ()
+
+    def get_conditional_validators(self, queryset):
+        """Return (etag, last_modified) for the rows in queryset, or (None, None) if it is empty."""
+        states = []
+        for state_queryset in self._conditional_querysets(queryset):
+            states.append(state_queryset.aggregate(count=Count('pk'), last_modified=Max('updated_at')))
+            if not states[0]['count']:
+                return None, None
+        return self._build_validators(states)
+
+    async def aget_conditional_validators(self, queryset):
+        """get_conditional_validators() for async views."""
+        states = []
+        for state_queryset in self._conditional_querysets(queryset):
+            states.append(await state_queryset.aaggregate(count=Count('pk'), last_modified=Max('updated_at')))
+            if not states[0]['count']:
+                return None, None
+        return self._build_validators(states)
+
+    def _conditional_querysets(self, queryset):
+        """The queryset itself followed by the nested rows listed in conditional_nested."""
+        queryset = queryset.order_by()
+        yield queryset
+        for related_name in self.conditional_nested:
+            relation = queryset.model._meta.get_field(related_name)
+            yield (
+                relation.related_model.objects
+                .filter(**{f'{relation.field.name}__in': queryset.values('pk')})
+                .order_by()
+            )
+
+    def _build_validators(self, states):
+        last_modified = max(state['last_modified'] for state in states if state['last_modified'])
+        fingerprint = repr((
+            self.request.user.pk,
+            self.request.get_full_path(),
+            [(state['count'], state['last_modified'] and state['last_modified'].isoformat()) for state in states]
+        ))
+        etag = '"%s"' % hashlib.sha1(fingerprint.encode()).hexdigest()
+        return etag, last_modified
+
+    def not_modified_response(self, request, queryset):
+        """
+        Evaluate the request's preconditions against queryset. Returns a 304 (or 412)
+        response when they short-circuit the read, otherwise None.
+        """
+        self._conditional_validators = self.get_conditional_validators(queryset)
+        return self._conditional_response(request)
+
+    async def anot_modified_response(self, request, queryset):
+        """not_modified_response() for async views."""
+        self._conditional_validators = await self.aget_conditional_validators(queryset)
+        return self._conditional_response(request)
+
+    def _conditional_response(self, request):
+        etag, last_modified = self._conditional_validators
+        if etag is None:
+            return None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified.timestamp())
+        )
+        if response is not None:
+            self.set_conditional_headers(response)
+        return response
+
+    def set_conditional_headers(self, response):
+        """Attach the validators computed by not_modified_response() to a response."""
+        etag, last_modified = getattr(self, '_conditional_validators', (None, None))
+        if etag is not None:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        # Representations are per user, so shared caches must key on the credentials
+        patch_vary_headers(response, ['Authorization'])
+        return response
@@ -0,0 +1,67 @@
+# transactions/fieldsets.py
+from rest_framework import permissions
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Restricts a read serializer to the fields named in context['fields'] plus the
+    nested relations named in context['expand']. Without a `fields` entry the
+    serializer returns its full representation. Unknown names are ignored.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get('fields')
+        if requested is None:
+            return fields
+        keep = requested | self.context.get('expand', set())
+        return {name: field for name, field in fields.items() if name in keep}
+
+
+class SparseFieldsetViewMixin:
+    """
+    Reads `?fields=a,b` and `?expand=x` on safe requests, passes them to the
+    serializer and narrows the queryset to match: nested relations are only
+    prefetched when a requested field renders them, and a restricted fieldset
+    loads only the requested columns (plus `fieldset_required`) with .only().
+    """
+    # Serializer field name -> prefetch lookups needed to render it
+    fieldset_prefetches = {}
+    # Model fields the view or serializer always reads (ordering keys, permission checks)
+    fieldset_required = ('id',)
+
+    def get_fieldset(self):
+        """Return (fields, expand); fields is None when the full representation is wanted."""
+        if not hasattr(self, '_fieldset'):
+            fields, expand = None, set()
+            if self.request is not None and self.request.method in permissions.SAFE_METHODS:
+                params = self.request.query_params
+                if 'fields' in params:
+                    fields = {name.strip() for name in params['fields'].split(',') if name.strip()}
+                expand = {name.strip() for name in params.get('expand', '').split(',') if name.strip()}
+            self._fieldset = (fields, expand)
+        return self._fieldset
+
+    def get_requested_field_names(self):
+        """Names the response will contain, or None for the full representation."""
+        fields, expand = self.get_fieldset()
+        return None if fields is None else fields | expand
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'], context['expand'] = self.get_fieldset()
+        return context
+
+    def narrow_queryset(self, queryset):
+        names = self.get_requested_field_names()
+        if names is None:
+            lookups = [lookup for lookups in self.fieldset_prefetches.values() for lookup in lookups]
+            return queryset.prefetch_related(*dict.fromkeys(lookups))
+
+        lookups = [
+            lookup for name, lookups in self.fieldset_prefetches.items() if name in names for lookup in lookups
+        ]
+        if lookups:
+            queryset = queryset.prefetch_related(*dict.fromkeys(lookups))
+        columns = {field.name for field in queryset.model._meta.concrete_fields}
+        return queryset.only(*(set(self.fieldset_required) | (names & columns)))
@@ -0,0 +1,192 @@
+# transactions/imports.py
+import csv
+import json
+from datetime import timedelta
+from django.db import DatabaseError, transaction as db_transaction
+from django.db.models import Q
+from django.utils import timezone
+from products.loaders import ProductLoader
+from .models import TransactionImport
+from .serializers import CreateTransactionSerializer
+from .services import TransactionService
+
+
+class TransactionImportService:
+    """
+    Processes TransactionImport jobs by streaming the source file line by line.
+
+    NDJSON files hold one transaction object per line, in the same shape accepted
+    by POST /transactions/. CSV files hold one product line per row with the columns
+    transaction_date, product_id, quantity and optionally unit_price, total_amount
+    and transaction_ref. Consecutive rows sharing a transaction_ref (or, if absent,
+    a transaction_date) form one transaction. Quoted fields may not span lines.
+    """
+    # Cap on the number of row errors kept on the job record
+    MAX_RECORDED_ERRORS = 100
+    # A RUNNING job whose progress has not moved for this long lost its worker and
+    # can be claimed again (every committed chunk refreshes updated_at)
+    STALE_AFTER = timedelta(minutes=30)
+    CSV_PRODUCT_COLUMNS = ['product_id', 'quantity', 'unit_price']
+
+    def __init__(self, job):
+        self.job = job
+
+    @classmethod
+    def claimable(cls):
+        """Jobs a worker may pick up: PENDING ones and RUNNING ones whose worker died."""
+        return TransactionImport.objects.filter(
+            Q(status='PENDING') | Q(status='RUNNING', updated_at__lt=timezone.now() - cls.STALE_AFTER)
+        )
+
+    @classmethod
+    def is_stale(cls, job):
+        return job.status == 'RUNNING' and job.updated_at < timezone.now() - cls.STALE_AFTER
+
+    @classmethod
+    def claim(cls, job_id):
+        """
+        Atomically move a claimable job to RUNNING.
+        Returns the job, or None if another worker already claimed it.
+        """
+        claimed = cls.claimable().filter(id=job_id).update(
+            status='RUNNING', updated_at=timezone.now()
+        )
+        if not claimed:
+            return None
+        return TransactionImport.objects.select_related('user').get(id=job_id)
+
+    def run(self):
+        """Process the job from its last committed offset to the end of the file."""
+        job = self.job
+        job.status = 'RUNNING'
+        job.error_message = ''
+        if job.started_at is None:
+            job.started_at = timezone.now()
+        job.save(update_fields=['status', 'error_message', 'started_at', 'updated_at'])
+
+        try:
+            with job.source_file.open('rb') as handle:
+                chunk = []
+                for record in self._iter_records(handle):
+                    chunk.append(record)
+                    if len(chunk) >= job.chunk_size:
+                        self._commit_chunk(chunk)
+                        chunk = []
+                if chunk:
+                    self._commit_chunk(chunk)
+        except (OSError, ValueError, csv.Error, DatabaseError) as e:
+            return self._fail(str(e))
+
+        job.status = 'COMPLETED'
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'completed_at', 'updated_at'])
+        return job
+
+    def _fail(self, message):
+        """
+        Mark the job FAILED with a fresh write, then reload it: a chunk that failed
+        part-way may have advanced the in-memory progress past what was committed.
+        """
+        job = self.job
+        TransactionImport.objects.filter(id=job.id).update(
+            status='FAILED', error_message=message, updated_at=timezone.now()
+        )
+        job.refresh_from_db()
+        return job
+
+    def _iter_records(self, handle):
+        """
+        Yield (line_number, data, error, end_offset, end_line) for every transaction
+        after the last committed offset. Exactly one of data/error is set.
+        """
+        if self.job.file_format == 'CSV':
+            return self._iter_csv_records(handle)
+        return self._iter_ndjson_records(handle)
+
+    def _iter_ndjson_records(self, handle):
+        handle.seek(self.job.last_committed_offset)
+        line_number = self.job.last_committed_line
+        while True:
+            raw = handle.readline()
+            if not raw:
+                break
+            line_number += 1
+            if not raw.strip():
+                continue
+            try:
+                data = json.loads(raw)
+                if not isinstance(data, dict):
+                    raise ValueError('Expected a JSON object')
+            except ValueError as e:
+                yield line_number, None, {'line': [str(e)]}, handle.tell(), line_number
+                continue
+            yield line_number, data, None, handle.tell(), line_number
+
+    def _iter_csv_records(self, handle):
+        header_line = handle.readline()
+        header = [column.strip() for column in next(csv.reader([header_line.decode('utf-8-sig')]), [])]
+        missing = {'transaction_date', 'product_id', 'quantity'} - set(header)
+        if missing:
+            raise ValueError(f"CSV header is missing required columns: {', '.join(sorted(missing))}")
+
+        handle.seek(max(self.job.last_committed_offset, handle.tell()))
+        line_number = max(self.job.last_committed_line, 1)
+        current_key = None
+        current = None
+        while True:
+            line_start = handle.tell()
+            raw = handle.readline()
+            if not raw:
+                break
+            if not raw.strip():
+                line_number += 1
+                continue
+            row = dict(zip(header, next(csv.reader([raw.decode('utf-8')]))))
+            key = row.get('transaction_ref') or row.get('transaction_date')
+            if current is not None and key != current_key:
+                yield current['line'], current['data'], None, line_start, line_number
+                current = None
+            line_number += 1
+            if current is None:
+                current_key = key
+                current = {'line': line_number, 'data': {'transaction_date': row.get('transaction_date'), 'products': []}}
+                if row.get('total_amount'):
+                    current['data']['total_amount'] = row['total_amount']
+            current['data']['products'].append({
+                column: row[column] for column in self.CSV_PRODUCT_COLUMNS if row.get(column)
+            })
+        if current is not None:
+            yield current['line'], current['data'], None, handle.tell(), line_number
+
+    def _commit_chunk(self, chunk):
+        """Validate a chunk and persist its valid rows together with the job's progress."""
+        job = self.job
+        valid_rows = []
+        row_errors = []
+        # One product lookup for the whole chunk, shared by the row serializers
+        context = {'product_loader': ProductLoader()}
+        context['product_loader'].prime_from_rows(data for _, data, error, _, _ in chunk if error is None)
+        for line_number, data, error, _, _ in chunk:
+            if error is None:
+                serializer = CreateTransactionSerializer(data=data, context=context)
+                if serializer.is_valid():
+                    valid_rows.append(serializer.validated_data)
+                    continue
+                error = serializer.errors
+            row_errors.append({'line': line_number, 'errors': error})
+
+        _, _, _, end_offset, end_line = chunk[-1]
+        with db_transaction.atomic():
+            TransactionService.bulk_create_transactions(job.user, valid_rows)
+            job.last_committed_offset = end_offset
+            job.last_committed_line = end_line
+            job.rows_processed += len(chunk)
+            job.rows_imported += len(valid_rows)
+            job.rows_failed += len(row_errors)
+            room = self.MAX_RECORDED_ERRORS - len(job.row_errors)
+            if room > 0:
+                job.row_errors = job.row_errors + row_errors[:room]
+            job.save(update_fields=[
+                'last_committed_offset', 'last_committed_line', 'rows_processed',
+                'rows_imported', 'rows_failed', 'row_errors', 'updated_at'
+            ])
@@ -0,0 +1,41 @@
+# transactions/management/commands/process_receipt_images.py
+from django.core.management.base import BaseCommand
+
+from transactions.receipts import ReceiptImageService
+
+
+class Command(BaseCommand):
+    help = 'Compress uploaded receipt images and generate their thumbnails.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--transaction', type=int, action='append', dest='transaction_ids',
+            help='Only process the receipt of the given transaction id (may be repeated).'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Maximum number of receipts to process in this run.'
+        )
+
+    def handle(self, *args, **options):
+        # Queued receipts, plus PROCESSING ones whose worker stopped without finishing them
+        pending = ReceiptImageService.claimable().order_by('updated_at')
+        if options['transaction_ids']:
+            pending = pending.filter(id__in=options['transaction_ids'])
+        transaction_ids = list(pending.values_list('id', flat=True)[:options['limit']])
+
+        processed = 0
+        for transaction_id in transaction_ids:
+            transaction = ReceiptImageService.claim(transaction_id)
+            if transaction is None:
+                continue  # Claimed by another worker in the meantime
+
+            transaction = ReceiptImageService(transaction).process()
+            processed += 1
+            message = f'Receipt for transaction {transaction.id}: {transaction.receipt_status}'
+            if transaction.receipt_status == 'FAILED':
+                self.stderr.write(self.style.ERROR(message))
+            else:
+                self.stdout.write(self.style.SUCCESS(message))
+
+        self.stdout.write(f'Processed {processed} receipt image(s).')
@@ -0,0 +1,44 @@
+# transactions/management/commands/process_transaction_imports.py
+from django.core.management.base import BaseCommand
+
+from transactions.imports import TransactionImportService
+
+
+class Command(BaseCommand):
+    help = 'Process queued transaction import jobs in fixed-size, resumable chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--job', type=int, action='append', dest='job_ids',
+            help='Only process the given job id (may be repeated).'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Maximum number of jobs to process in this run.'
+        )
+
+    def handle(self, *args, **options):
+        # Queued jobs, plus RUNNING jobs whose worker stopped without finishing them
+        pending = TransactionImportService.claimable().order_by('created_at')
+        if options['job_ids']:
+            pending = pending.filter(id__in=options['job_ids'])
+        job_ids = list(pending.values_list('id', flat=True)[:options['limit']])
+
+        processed = 0
+        for job_id in job_ids:
+            job = TransactionImportService.claim(job_id)
+            if job is None:
+                continue  # Claimed by another worker in the meantime
+
+            job = TransactionImportService(job).run()
+            processed += 1
+            message = (
+                f'Import {job.id}: {job.status} - {job.rows_imported} imported, '
+                f'{job.rows_failed} failed, offset {job.last_committed_offset}/{job.file_size}'
+            )
+            if job.status == 'FAILED':
+                self.stderr.write(self.style.ERROR(f'{message} ({job.error_message})'))
+            else:
+                self.stdout.write(self.style.SUCCESS(message))
+
+        self.stdout.write(f'Processed {processed} import job(s).')
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-16 22:29
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0003_transactionimport'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('DAY', 'Day'), ('WEEK', 'Week'), ('MONTH', 'Month')], max_length=5)),
+                ('bucket_start', models.DateField()),
+                ('category', models.CharField(blank=True, default='', max_length=100)),
+                ('transaction_type', models.CharField(choices=[('ACTUAL', 'Actual Purchase'), ('ESTIMATED', 'Estimated Missed Purchase')], max_length=10)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['period', 'bucket_start', 'category', 'transaction_type'],
+                'unique_together': {('user', 'period', 'bucket_start', 'category', 'transaction_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-16 22:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+        ('shoppingList', '0003_shoppinglist_shoppinglis_user_id_b26ccc_idx_and_more'),
+        ('transactions', '0004_spendingrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'transaction_date'], name='transaction_user_id_e55ebe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'transaction_type'], name='transaction_user_id_98a6b3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionimport',
+            index=models.Index(fields=['status', 'created_at'], name='transaction_status_d7e11d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionproduct',
+            index=models.Index(fields=['product', 'transaction'], name='transaction_product_3bb869_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.3 on 2026-10-16 22:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def queue_existing_receipts(apps, schema_editor):
+    # Receipts uploaded before background processing existed still need thumbnails
+    Transaction = apps.get_model('transactions', 'Transaction')
+    Transaction.objects.exclude(receipt_image__isnull=True).exclude(receipt_image='').update(receipt_status='PENDING')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shoppingList', '0003_shoppinglist_shoppinglis_user_id_b26ccc_idx_and_more'),
+        ('transactions', '0005_transaction_transaction_user_id_e55ebe_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='receipt_status',
+            field=models.CharField(choices=[('NONE', 'No Receipt'), ('PENDING', 'Pending Processing'), ('PROCESSING', 'Processing'), ('READY', 'Ready'), ('FAILED', 'Failed')], default='NONE', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='receipt_thumbnail_medium',
+            field=models.ImageField(blank=True, null=True, upload_to='receipts/thumbnails/'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='receipt_thumbnail_small',
+            field=models.ImageField(blank=True, null=True, upload_to='receipts/thumbnails/'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['receipt_status', 'updated_at'], name='transaction_receipt_95fa2b_idx'),
+        ),
+        migrations.RunPython(queue_existing_receipts, migrations.RunPython.noop),
+    ]
@@ -9,12 +9,23 @@ class Transaction(models.Model):
         ('ACTUAL', 'Actual Purchase'),
         ('ESTIMATED', 'Estimated Missed Purchase'),
     ]
+    RECEIPT_STATUS_CHOICES = [
+        ('NONE', 'No Receipt'),
+        ('PENDING', 'Pending Processing'),
+        ('PROCESSING', 'Processing'),
+        ('READY', 'Ready'),
+        ('FAILED', 'Failed'),
+    ]
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='transactions')
     transaction_date = models.DateField()
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPE_CHOICES, default='ACTUAL')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     receipt_image = models.ImageField(upload_to='receipts/', null=True, blank=True)
+    # Receipts are stored as uploaded and compressed/thumbnailed later by process_receipt_images
+    receipt_status = models.CharField(max_length=10, choices=RECEIPT_STATUS_CHOICES, default='NONE')
+    receipt_thumbnail_small = models.ImageField(upload_to='receipts/thumbnails/', null=True, blank=True)
+    receipt_thumbnail_medium = models.ImageField(upload_to='receipts/thumbnails/', null=True, blank=True)
     # Link to ShoppingList if this transaction originated from one
     shopping_list = models.OneToOneField(
         'shoppingList.ShoppingList',
@@ -28,6 +39,11 @@ class Transaction(models.Model):
 
     class Meta:
         ordering = ['-transaction_date', '-created_at']
+        indexes = [
+            models.Index(fields=['user', 'transaction_date']),
+            models.Index(fields=['user', 'transaction_type']),
+            models.Index(fields=['receipt_status', 'updated_at']),
+        ]
 
     def __str__(self):
         return f"{self.transaction_type} Transaction by {self.user.username} on {self.transaction_date}"
@@ -53,6 +69,12 @@ class TransactionProduct(models.Model):
     unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Covers product -> transaction lookups (purchase history per product)
+            models.Index(fields=['product', 'transaction']),
+        ]
+
     def __str__(self):
         return f"{self.quantity} x {self.product.name} in Transaction {self.transaction.id}"
 
@@ -60,4 +82,90 @@ class TransactionProduct(models.Model):
         # Ensure total_price is calculated before saving TransactionProduct
         if self.unit_price is not None and self.quantity is not None:
             self.total_price = self.quantity * self.unit_price
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class TransactionImport(models.Model):
+    """
+    A streaming import of transaction history from an uploaded NDJSON or CSV file.
+    The file is processed in fixed-size chunks; every committed chunk advances
+    last_committed_offset so a failed job can resume where it stopped.
+    """
+    FORMAT_CHOICES = [
+        ('NDJSON', 'Newline-delimited JSON'),
+        ('CSV', 'Comma-separated values'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='transaction_imports')
+    source_file = models.FileField(upload_to='imports/')
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    file_size = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    chunk_size = models.PositiveIntegerField(default=500)
+    # Byte offset and line number just past the last committed chunk
+    last_committed_offset = models.BigIntegerField(default=0)
+    last_committed_line = models.PositiveIntegerField(default=0)
+    rows_processed = models.PositiveIntegerField(default=0)
+    rows_imported = models.PositiveIntegerField(default=0)
+    rows_failed = models.PositiveIntegerField(default=0)
+    row_errors = models.JSONField(default=list, blank=True)
+    error_message = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.file_format} import #{self.id} for {self.user.username} ({self.status})"
+
+    @property
+    def progress(self):
+        """Fraction of the source file committed so far (0.0 - 1.0)."""
+        if self.status == 'COMPLETED':
+            return 1.0
+        if not self.file_size:
+            return 0.0
+        return min(1.0, self.last_committed_offset / self.file_size)
+
+
+class SpendingRollup(models.Model):
+    """
+    Pre-aggregated spend per user, period bucket, product category and transaction type.
+    Rows are rebuilt for the affected buckets whenever transactions are written
+    (see SpendingRollupService) and can be rebuilt in full with the
+    `backfill_spending_rollups` management command.
+    """
+    PERIOD_CHOICES = [
+        ('DAY', 'Day'),
+        ('WEEK', 'Week'),
+        ('MONTH', 'Month'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='spending_rollups')
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    bucket_start = models.DateField()
+    # Empty string for products without a category
+    category = models.CharField(max_length=100, blank=True, default='')
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    transaction_count = models.PositiveIntegerField(default=0)
+    item_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['period', 'bucket_start', 'category', 'transaction_type']
+        unique_together = ['user', 'period', 'bucket_start', 'category', 'transaction_type']
+
+    def __str__(self):
+        return f"{self.period} {self.bucket_start} {self.category or '-'} ({self.transaction_type}) for {self.user.username}"
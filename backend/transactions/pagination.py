@@ -1,12 +1,41 @@
 # transactions/pagination.py
 
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import NotFound
+from django.core.paginator import InvalidPage
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views: the count and the page are read with the async ORM."""
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Prime Paginator.count so page() does not run a blocking COUNT query
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+        self.page.object_list = [obj async for obj in self.page.object_list]
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return list(self.page)
+
     def get_paginated_response(self, data):
         return Response({
             'success': True,
@@ -17,4 +46,150 @@ class CustomPageNumberPagination(PageNumberPagination):
                 'previous': self.get_previous_link(),
                 'results': data
             }
-        })
\ No newline at end of file
+        })
+
+
+class TransactionCursorPagination(BasePagination):
+    """
+    Keyset pagination over the transaction ordering (-transaction_date, -created_at)
+    with id as the tie-breaker. Each page is a bounded index range read after the
+    position encoded in an opaque cursor, so deep pages cost the same as the first.
+    The total count is only computed when `include_count=true` is passed.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'include_count'
+    page_size = 20
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        window = self._prepare(queryset, request)
+        self.count = queryset.count() if self.wants_count(request) else None
+        return self._set_page(list(window))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views."""
+        window = self._prepare(queryset, request)
+        self.count = await queryset.acount() if self.wants_count(request) else None
+        return self._set_page([obj async for obj in window])
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true')
+
+    def _prepare(self, queryset, request):
+        """Decode the cursor and return the (lazy) queryset window for the requested page."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.reverse, self.position = self.decode_cursor(request)
+
+        if self.reverse:
+            queryset = queryset.order_by('transaction_date', 'created_at', 'id')
+            queryset = queryset.filter(self._after(self.position))
+        else:
+            queryset = queryset.order_by('-transaction_date', '-created_at', '-id')
+            if self.position is not None:
+                queryset = queryset.filter(self._before(self.position))
+
+        # Fetch one extra row to find out whether there is another page
+        return queryset[:self.page_size + 1]
+
+    def _set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_next_cursor(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_cursor(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        next_cursor = self.get_next_cursor()
+        previous_cursor = self.get_previous_cursor()
+        payload = {
+            'next': self.get_link(next_cursor),
+            'previous': self.get_link(previous_cursor),
+            'next_cursor': next_cursor,
+            'previous_cursor': previous_cursor,
+            'results': data
+        }
+        if self.count is not None:
+            payload['count'] = self.count
+        return Response({
+            'success': True,
+            'message': 'Data retrieved successfully',
+            'data': payload
+        })
+
+    def encode_cursor(self, instance, reverse):
+        position = {
+            'd': instance.transaction_date.isoformat(),
+            'c': instance.created_at.isoformat(),
+            'i': instance.id,
+            'r': int(reverse)
+        }
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, request):
+        """Returns (reverse, position); position is None on the first page."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            transaction_date = parse_date(position['d'])
+            created_at = parse_datetime(position['c'])
+            transaction_id = int(position['i'])
+            reverse = bool(position.get('r'))
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+        if transaction_date is None or created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, (transaction_date, created_at, transaction_id)
+
+    @staticmethod
+    def _before(position):
+        transaction_date, created_at, transaction_id = position
+        return (
+            Q(transaction_date__lt=transaction_date) |
+            Q(transaction_date=transaction_date, created_at__lt=created_at) |
+            Q(transaction_date=transaction_date, created_at=created_at, id__lt=transaction_id)
+        )
+
+    @staticmethod
+    def _after(position):
+        transaction_date, created_at, transaction_id = position
+        return (
+            Q(transaction_date__gt=transaction_date) |
+            Q(transaction_date=transaction_date, created_at__gt=created_at) |
+            Q(transaction_date=transaction_date, created_at=created_at, id__gt=transaction_id)
+        )
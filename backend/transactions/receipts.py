@@ -0,0 +1,166 @@
+# transactions/receipts.py
+import os
+from datetime import timedelta
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+from .models import Transaction
+
+
+class ReceiptImageService:
+    """
+    Post-processes uploaded receipt photos outside the request cycle.
+
+    The upload request only stores the file and marks the transaction PENDING.
+    A worker (see the process_receipt_images command) then decodes the photo once,
+    applies its EXIF orientation, and writes a downscaled, recompressed JPEG without
+    metadata in place of the original plus fixed-size thumbnails for list views.
+    A receipt whose worker died stays PROCESSING until STALE_AFTER has passed,
+    after which the next worker claims it again.
+    """
+    # Longest edge of the stored receipt after processing
+    MAX_DIMENSION = 2048
+    JPEG_QUALITY = 85
+    THUMBNAIL_QUALITY = 80
+    # A receipt PROCESSING for longer than this is assumed abandoned by its worker
+    STALE_AFTER = timedelta(minutes=10)
+    # Bounding boxes of the generated thumbnails, keyed by field suffix
+    THUMBNAIL_SIZES = {
+        'small': (160, 160),
+        'medium': (480, 480),
+    }
+
+    def __init__(self, transaction):
+        self.transaction = transaction
+
+    @staticmethod
+    def mark_pending(validated_data):
+        """
+        Set receipt processing fields on serializer data that carries a receipt_image.
+        Clearing the receipt also clears its thumbnails.
+        """
+        if 'receipt_image' not in validated_data:
+            return validated_data
+        validated_data['receipt_status'] = 'PENDING' if validated_data['receipt_image'] else 'NONE'
+        validated_data['receipt_thumbnail_small'] = None
+        validated_data['receipt_thumbnail_medium'] = None
+        return validated_data
+
+    @classmethod
+    def claimable(cls):
+        """Transactions whose receipt a worker may pick up: PENDING and stale PROCESSING ones."""
+        return Transaction.objects.filter(
+            Q(receipt_status='PENDING')
+            | Q(receipt_status='PROCESSING', updated_at__lt=timezone.now() - cls.STALE_AFTER)
+        )
+
+    @classmethod
+    def claim(cls, transaction_id):
+        """
+        Atomically move a claimable receipt to PROCESSING.
+        Returns the transaction, or None if another worker already claimed it.
+        """
+        claimed = cls.claimable().filter(id=transaction_id).update(
+            receipt_status='PROCESSING', updated_at=timezone.now()
+        )
+        if not claimed:
+            return None
+        return Transaction.objects.get(id=transaction_id)
+
+    def process(self):
+        """Compress the receipt and generate its thumbnails. Returns the transaction."""
+        transaction = self.transaction
+        source_name = transaction.receipt_image.name
+        if not source_name:
+            return self._finish(source_name, 'NONE', {})
+
+        try:
+            image = self._load(transaction.receipt_image)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return self._finish(source_name, 'FAILED', {})
+
+        try:
+            stem = os.path.splitext(os.path.basename(source_name))[0]
+            outputs = {'receipt_image': (f'{stem}.jpg', self._encode(image, self.JPEG_QUALITY))}
+            for suffix, size in self.THUMBNAIL_SIZES.items():
+                thumbnail = image.copy()
+                thumbnail.thumbnail(size, Image.Resampling.LANCZOS)
+                outputs[f'receipt_thumbnail_{suffix}'] = (
+                    f'{stem}_{suffix}.jpg', self._encode(thumbnail, self.THUMBNAIL_QUALITY)
+                )
+            return self._finish(source_name, 'READY', outputs)
+        except Exception:
+            # Encoding, storage or database errors must not leave the receipt PROCESSING
+            return self._fail(source_name)
+
+    def _load(self, field_file):
+        """Decode the photo upright, in RGB, no larger than MAX_DIMENSION."""
+        with field_file.open('rb') as handle:
+            image = Image.open(handle)
+            # Let the JPEG decoder scale down by a power of two while decoding
+            image.draft('RGB', (self.MAX_DIMENSION, self.MAX_DIMENSION))
+            image.load()
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.thumbnail((self.MAX_DIMENSION, self.MAX_DIMENSION), Image.Resampling.LANCZOS)
+        return image
+
+    @staticmethod
+    def _encode(image, quality):
+        # No exif/icc_profile is passed to save(), so the output carries no metadata
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+        return buffer.getvalue()
+
+    def _finish(self, source_name, receipt_status, outputs):
+        """
+        Store the generated files and publish them, unless the receipt was replaced
+        while it was being processed, in which case the generated files are discarded.
+        """
+        transaction = self.transaction
+        storage = transaction.receipt_image.storage
+        stale_names = [
+            name for name in (transaction.receipt_thumbnail_small.name, transaction.receipt_thumbnail_medium.name)
+            if name
+        ]
+
+        updates = {'receipt_status': receipt_status, 'updated_at': timezone.now()}
+        for field_name, (file_name, content) in outputs.items():
+            field_file = getattr(transaction, field_name)
+            field_file.save(file_name, ContentFile(content), save=False)
+            updates[field_name] = field_file.name
+
+        published = Transaction.objects.filter(
+            id=transaction.id, receipt_status='PROCESSING', receipt_image=source_name
+        ).update(**updates)
+
+        if not published:
+            for field_name in outputs:
+                storage.delete(getattr(transaction, field_name).name)
+            transaction.refresh_from_db()
+            return transaction
+
+        if 'receipt_image' in outputs:
+            stale_names.append(source_name)
+        for name in stale_names:
+            if name not in updates.values():
+                storage.delete(name)
+        transaction.refresh_from_db()
+        return transaction
+
+    def _fail(self, source_name):
+        """Mark the receipt FAILED with a fresh UPDATE, unless it was replaced meanwhile."""
+        transaction = self.transaction
+        Transaction.objects.filter(
+            id=transaction.id, receipt_status='PROCESSING', receipt_image=source_name
+        ).update(receipt_status='FAILED', updated_at=timezone.now())
+        transaction.refresh_from_db()
+        return transaction
@@ -1,9 +1,15 @@
 # transactions/serializers.py
 from rest_framework import serializers
-from .models import Transaction, TransactionProduct
+from django.db import transaction as db_transaction
+from .models import Transaction, TransactionProduct, TransactionImport, SpendingRollup
+from .services import SpendingRollupService
+from .receipts import ReceiptImageService
+from .fieldsets import SparseFieldsetSerializerMixin
 from products.models import Product
+from products.loaders import LoadedProductField, ProductLoadingListSerializer
+from products.services import PriceIndexService, ProductFrequencyCalculator
 from decimal import Decimal
-from datetime import date
+from datetime import date, timedelta
 
 # Helper for Product detail in Transaction response
 class ProductSerializer(serializers.ModelSerializer):
@@ -15,14 +21,13 @@ class ProductSerializer(serializers.ModelSerializer):
 
 class TransactionProductSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True) # Nested serializer for GET responses
-    product_id = serializers.PrimaryKeyRelatedField(
-        queryset=Product.objects.all(), source='product', write_only=True
-    )
+    product_id = LoadedProductField(source='product', write_only=True)
 
     class Meta:
         model = TransactionProduct
         fields = ['id', 'product', 'product_id', 'quantity', 'unit_price', 'total_price']
         read_only_fields = ['id', 'total_price'] # total_price is calculated
+        list_serializer_class = ProductLoadingListSerializer
 
     def create(self, validated_data):
         # 'product' is handled by source='product' in product_id field
@@ -56,13 +61,12 @@ class TransactionProductSerializer(serializers.ModelSerializer):
         return data
 
 class CreateTransactionProductSerializer(serializers.ModelSerializer):
-    product_id = serializers.PrimaryKeyRelatedField(
-        queryset=Product.objects.all(), source='product', write_only=True
-    )
+    product_id = LoadedProductField(source='product', write_only=True)
 
     class Meta:
         model = TransactionProduct
         fields = ['product_id', 'quantity', 'unit_price']
+        list_serializer_class = ProductLoadingListSerializer
 
     def validate(self, data):
         quantity = data.get('quantity')
@@ -78,7 +82,7 @@ class CreateTransactionProductSerializer(serializers.ModelSerializer):
         return data
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     products = TransactionProductSerializer(many=True, read_only=True) # Nested for GET
     # total_amount will be calculated if not provided for ACTUAL types
     # receipt_image might need a special field for upload
@@ -87,19 +91,29 @@ class TransactionSerializer(serializers.ModelSerializer):
         model = Transaction
         fields = [
             'id', 'transaction_date', 'transaction_type', 'total_amount',
-            'receipt_image', 'shopping_list', 'products', 'created_at'
+            'receipt_image', 'receipt_status', 'receipt_thumbnail_small', 'receipt_thumbnail_medium',
+            'shopping_list', 'products', 'created_at'
         ]
-        read_only_fields = ['transaction_type', 'shopping_list', 'created_at'] # These are set by backend logic or linked
+        read_only_fields = [
+            'transaction_type', 'receipt_status', 'receipt_thumbnail_small', 'receipt_thumbnail_medium',
+            'shopping_list', 'created_at'
+        ] # These are set by backend logic or linked
 
     def to_representation(self, instance):
         """Override to ensure total_amount is calculated on retrieve if needed."""
         representation = super().to_representation(instance)
         # Recalculate total_amount dynamically if it's null, or ensure it's correct
+        if 'total_amount' not in representation:
+            return representation
         if instance.transaction_type == 'ACTUAL' and (instance.total_amount is None or instance.total_amount == 0):
-            calculated_total = sum(
-                (item.quantity * item.unit_price if item.unit_price is not None else Decimal('0.00'))
-                for item in instance.products.all()
-            )
+            if hasattr(instance, 'products_total'):
+                # Annotated by the view when the items themselves are not loaded
+                calculated_total = instance.products_total or Decimal('0.00')
+            else:
+                calculated_total = sum(
+                    (item.quantity * item.unit_price if item.unit_price is not None else Decimal('0.00'))
+                    for item in instance.products.all()
+                )
             representation['total_amount'] = str(calculated_total.quantize(Decimal('0.01'))) # Format to 2 decimal places
         return representation
 
@@ -138,18 +152,27 @@ class CreateTransactionSerializer(serializers.ModelSerializer):
         products_data = validated_data.pop('products')
         validated_data['user'] = self.context['request'].user
         validated_data['transaction_type'] = 'ACTUAL' # Manual creation is always ACTUAL
+        # The receipt is only stored here; compression and thumbnails happen in the background
+        ReceiptImageService.mark_pending(validated_data)
 
-        transaction = Transaction.objects.create(**validated_data)
-        for item_data in products_data:
-            TransactionProduct.objects.create(transaction=transaction, **item_data)
+        with db_transaction.atomic():
+            transaction = Transaction.objects.create(**validated_data)
+            for item_data in products_data:
+                TransactionProduct.objects.create(transaction=transaction, **item_data)
+            SpendingRollupService(transaction.user_id).refresh_dates([transaction.transaction_date])
+            PriceIndexService(transaction.user_id).record_purchases(
+                (item_data['product'].id, transaction.transaction_date, item_data.get('unit_price'))
+                for item_data in products_data
+            )
+            ProductFrequencyCalculator(transaction.user_id).record_purchases(
+                (item_data['product'].id, transaction.transaction_date) for item_data in products_data
+            )
         return transaction
 
 
 class UpdateTransactionProductSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(required=False) # For existing items
-    product_id = serializers.PrimaryKeyRelatedField(
-        queryset=Product.objects.all(), source='product', write_only=True
-    )
+    product_id = LoadedProductField(source='product', write_only=True)
     # Allows marking for deletion by sending id and _delete: true
     _delete = serializers.BooleanField(write_only=True, required=False)
 
@@ -160,6 +183,7 @@ class UpdateTransactionProductSerializer(serializers.ModelSerializer):
             'quantity': {'required': True},
             'unit_price': {'required': False, 'allow_null': True}
         }
+        list_serializer_class = ProductLoadingListSerializer
 
     def validate(self, data):
         if data.get('quantity') is not None and data.get('quantity') <= 0:
@@ -177,6 +201,11 @@ class UpdateTransactionSerializer(serializers.ModelSerializer):
         fields = ['transaction_date', 'total_amount', 'receipt_image', 'products']
         read_only_fields = ['transaction_type', 'shopping_list'] # Cannot change type or shopping list link via this endpoint
 
+    def _get_existing_products(self):
+        """Load the transaction's current items once, keyed by id, for validate() and update()."""
+        if not hasattr(self, '_existing_products'):
+            self._existing_products = {item.id: item for item in self.instance.products.all()}
+        return self._existing_products
 
     def validate(self, data):
         # Disallow updating 'ESTIMATED' transactions via this endpoint
@@ -202,25 +231,22 @@ class UpdateTransactionSerializer(serializers.ModelSerializer):
                     if quantity is not None and unit_price is not None:
                         calculated_total += quantity * unit_price
                     else:
-                        # This scenario means an existing product might be updated without unit_price
-                        # or a new one added without unit_price.
                         # For updates, we need to consider existing unit_price if not provided.
                         item_id = item_data.get('id')
                         if item_id:
-                            try:
-                                existing_item = self.instance.products.get(id=item_id)
-                                effective_quantity = quantity if quantity is not None else existing_item.quantity
-                                effective_unit_price = unit_price if unit_price is not None else existing_item.unit_price
-                                if effective_quantity is not None and effective_unit_price is not None:
-                                    calculated_total += effective_quantity * effective_unit_price
-                                else:
-                                    # Still missing info to calculate for an existing item
-                                    raise serializers.ValidationError(
-                                        {"total_amount": "Total amount cannot be automatically calculated if product unit price is missing after update."}
-                                    )
-                            except TransactionProduct.DoesNotExist:
-                                # New item being added, if unit_price is null, this would have been caught earlier in CreateTransactionProductSerializer's validate
-                                pass
+                            existing_item = self._get_existing_products().get(item_id) if self.instance else None
+                            if existing_item is None:
+                                # Unknown items are reported by update()
+                                continue
+                            effective_quantity = quantity if quantity is not None else existing_item.quantity
+                            effective_unit_price = unit_price if unit_price is not None else existing_item.unit_price
+                            if effective_quantity is not None and effective_unit_price is not None:
+                                calculated_total += effective_quantity * effective_unit_price
+                            else:
+                                # Still missing info to calculate for an existing item
+                                raise serializers.ValidationError(
+                                    {"total_amount": "Total amount cannot be automatically calculated if product unit price is missing after update."}
+                                )
                         else:
                             # This is a new product being added in the update, must have unit_price
                             raise serializers.ValidationError(
@@ -234,45 +260,83 @@ class UpdateTransactionSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         products_data = validated_data.pop('products', None)
 
-        # Update main Transaction fields
-        instance.transaction_date = validated_data.get('transaction_date', instance.transaction_date)
-        instance.total_amount = validated_data.get('total_amount', instance.total_amount)
-        instance.receipt_image = validated_data.get('receipt_image', instance.receipt_image)
-        instance.save()
-
+        to_update = {}
+        to_create = []
+        to_delete_ids = set()
         if products_data is not None:
-            # Handle nested TransactionProducts
+            # Resolve every item against the existing rows before writing anything
+            existing_products = self._get_existing_products()
             for item_data in products_data:
-                item_id = item_data.get('id')
+                item_data = dict(item_data)
+                item_id = item_data.pop('id', None)
                 _delete = item_data.pop('_delete', False)
+                product_instance = item_data.pop('product', None)  # This comes from source='product'
 
                 if item_id:
-                    # Existing item
-                    try:
-                        transaction_product = TransactionProduct.objects.get(
-                            id=item_id, transaction=instance
-                        )
-                        if _delete:
-                            transaction_product.delete()
-                        else:
-                            # Update existing fields, but preserve product reference
-                            product_instance = item_data.pop('product', None) # Pop source='product' field
-                            for key, value in item_data.items():
-                                setattr(transaction_product, key, value)
-                            transaction_product.save() # This will trigger total_price recalculation if unit_price/quantity changed
-                    except TransactionProduct.DoesNotExist:
+                    transaction_product = existing_products.get(item_id)
+                    if transaction_product is None:
                         raise serializers.ValidationError(f"Transaction product with ID {item_id} not found in this transaction.")
+                    if _delete:
+                        to_delete_ids.add(item_id)
+                        to_update.pop(item_id, None)
+                    elif item_id not in to_delete_ids:
+                        # Update existing fields, but preserve product reference
+                        for key, value in item_data.items():
+                            setattr(transaction_product, key, value)
+                        to_update[item_id] = transaction_product
                 elif not _delete:
                     # New item (must have product_id)
-                    product_instance = item_data.pop('product', None)  # This comes from source='product'
                     if product_instance is None:
                         raise serializers.ValidationError("product_id is required for new transaction products.")
-                    TransactionProduct.objects.create(transaction=instance, product=product_instance, **item_data)
+                    to_create.append(TransactionProduct(transaction=instance, product=product_instance, **item_data))
 
-        # After product updates, re-save transaction to trigger total_amount recalculation if it's set to None
-        # This is important if total_amount was not explicitly provided in the update payload.
-        if instance.total_amount is None:
-            instance.save() # Triggers the save method which can recalculate total_amount if it were None
+            # bulk_update/bulk_create bypass TransactionProduct.save, so derive total_price here
+            for transaction_product in list(to_update.values()) + to_create:
+                if transaction_product.quantity is not None and transaction_product.unit_price is not None:
+                    transaction_product.total_price = transaction_product.quantity * transaction_product.unit_price
+
+        # Update main Transaction fields
+        previous_date = instance.transaction_date
+        instance.transaction_date = validated_data.get('transaction_date', instance.transaction_date)
+        instance.total_amount = validated_data.get('total_amount', instance.total_amount)
+        if 'receipt_image' in validated_data:
+            # A new receipt is queued for background processing, same as on create
+            receipt_fields = ReceiptImageService.mark_pending({'receipt_image': validated_data['receipt_image']})
+            for field, value in receipt_fields.items():
+                setattr(instance, field, value)
+
+        with db_transaction.atomic():
+            if to_update:
+                TransactionProduct.objects.bulk_update(
+                    list(to_update.values()), ['quantity', 'unit_price', 'total_price']
+                )
+            if to_create:
+                TransactionProduct.objects.bulk_create(to_create)
+            if to_delete_ids:
+                TransactionProduct.objects.filter(transaction=instance, id__in=to_delete_ids).delete()
+
+            # If total_amount was neither provided nor derivable from the payload,
+            # recompute it from the stored items with a single aggregate.
+            if instance.total_amount is None and products_data is not None:
+                instance.total_amount = instance._calculate_total_from_products()
+            instance.save()
+
+            SpendingRollupService(instance.user_id).refresh_dates([previous_date, instance.transaction_date])
+
+            # Edited prices and purchase days cannot be taken back out of the price index
+            # and frequencies incrementally, so the touched products (or all of them,
+            # when the date moved) are recomputed
+            if instance.transaction_type == 'ACTUAL':
+                if previous_date != instance.transaction_date:
+                    affected = self._get_existing_products().values()
+                else:
+                    affected = list(to_update.values()) + [
+                        self._get_existing_products()[item_id] for item_id in to_delete_ids
+                    ]
+                product_ids = {item.product_id for item in affected} | {item.product_id for item in to_create}
+                PriceIndexService(instance.user_id).rebuild(product_ids)
+                if previous_date != instance.transaction_date or to_create or to_delete_ids:
+                    ProductFrequencyCalculator(instance.user_id).refresh(product_ids)
 
         return instance
 
@@ -286,6 +350,39 @@ class EstimateMissedRequestSerializer(serializers.Serializer):
         return value
 
 
+class EstimateMissedRangeRequestSerializer(serializers.Serializer):
+    """Missed dates as an inclusive date_from/date_to range or an explicit list of dates."""
+    MAX_DATES = 366
+
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    dates = serializers.ListField(child=serializers.DateField(), required=False, allow_empty=False)
+
+    def validate(self, data):
+        has_range = 'date_from' in data or 'date_to' in data
+        if has_range == ('dates' in data):
+            raise serializers.ValidationError("Provide either date_from and date_to, or dates.")
+
+        if has_range:
+            if 'date_from' not in data or 'date_to' not in data:
+                raise serializers.ValidationError("Both date_from and date_to are required for a range.")
+            if data['date_from'] > data['date_to']:
+                raise serializers.ValidationError({"date_to": "date_to must not be before date_from."})
+            span = (data['date_to'] - data['date_from']).days + 1
+            if span > self.MAX_DATES:
+                raise serializers.ValidationError(f"A range may cover at most {self.MAX_DATES} days.")
+            missed_dates = [data['date_from'] + timedelta(days=offset) for offset in range(span)]
+        else:
+            missed_dates = sorted(set(data['dates']))
+            if len(missed_dates) > self.MAX_DATES:
+                raise serializers.ValidationError({"dates": f"At most {self.MAX_DATES} dates are allowed."})
+
+        if missed_dates[-1] > date.today():
+            raise serializers.ValidationError("Missed dates cannot be in the future.")
+        data['missed_dates'] = missed_dates
+        return data
+
+
 class EstimateMissedTransactionProductSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True) # Nested serializer for GET responses
     # quantity and total_price are the main estimated fields
@@ -306,4 +403,68 @@ class EstimateMissedResponseTransactionSerializer(serializers.ModelSerializer):
 
 
 class EstimateMissedResponseSerializer(serializers.Serializer):
-    transaction = EstimateMissedResponseTransactionSerializer()
\ No newline at end of file
+    transaction = EstimateMissedResponseTransactionSerializer()
+
+
+class TransactionImportSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = TransactionImport
+        fields = [
+            'id', 'file_format', 'file_size', 'status', 'chunk_size', 'progress',
+            'last_committed_offset', 'rows_processed', 'rows_imported', 'rows_failed',
+            'row_errors', 'error_message', 'created_at', 'started_at', 'completed_at'
+        ]
+        read_only_fields = fields
+
+
+class CreateTransactionImportSerializer(serializers.ModelSerializer):
+    file_format = serializers.ChoiceField(choices=TransactionImport.FORMAT_CHOICES, required=False)
+    chunk_size = serializers.IntegerField(min_value=1, max_value=5000, required=False)
+
+    class Meta:
+        model = TransactionImport
+        fields = ['source_file', 'file_format', 'chunk_size']
+
+    def validate(self, data):
+        # Infer the format from the file extension when it is not given explicitly
+        if not data.get('file_format'):
+            name = data['source_file'].name.lower()
+            if name.endswith('.csv'):
+                data['file_format'] = 'CSV'
+            elif name.endswith(('.ndjson', '.jsonl')):
+                data['file_format'] = 'NDJSON'
+            else:
+                raise serializers.ValidationError(
+                    {"file_format": "File format could not be inferred from the file name; specify CSV or NDJSON."}
+                )
+        data['file_size'] = data['source_file'].size
+        return data
+
+
+
+class SpendingAnalyticsQuerySerializer(serializers.Serializer):
+    period = serializers.CharField(required=False, default='MONTH')
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    transaction_type = serializers.ChoiceField(choices=Transaction.TRANSACTION_TYPE_CHOICES, required=False)
+    category = serializers.CharField(required=False, allow_blank=True)
+
+    def validate_period(self, value):
+        value = value.upper()
+        if value not in dict(SpendingRollup.PERIOD_CHOICES):
+            raise serializers.ValidationError("Period must be one of DAY, WEEK or MONTH.")
+        return value
+
+    def validate(self, data):
+        if data.get('date_from') and data.get('date_to') and data['date_from'] > data['date_to']:
+            raise serializers.ValidationError({"date_to": "date_to must not be before date_from."})
+        return data
+
+
+class SpendingRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SpendingRollup
+        fields = ['bucket_start', 'category', 'transaction_type', 'total_amount', 'transaction_count', 'item_count']
+        read_only_fields = fields
@@ -0,0 +1,218 @@
+# transactions/services.py
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from django.db import transaction as db_transaction
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import Trunc
+from products.models import Product
+from products.services import PriceIndexService, ProductFrequencyCalculator
+from .models import Transaction, TransactionProduct, SpendingRollup
+
+
+class TransactionService:
+    # Upper bound on the number of transactions accepted by a single bulk request
+    MAX_BULK_TRANSACTIONS = 5000
+
+    @staticmethod
+    def build_transaction_products(transaction, products_data):
+        """
+        Build (unsaved) TransactionProduct instances for a transaction.
+        bulk_create bypasses TransactionProduct.save, so total_price is computed here.
+        """
+        transaction_products = []
+        for item_data in products_data:
+            item_data = dict(item_data)
+            quantity = item_data.get('quantity')
+            unit_price = item_data.get('unit_price')
+            if quantity is not None and unit_price is not None:
+                item_data['total_price'] = quantity * unit_price
+            transaction_products.append(TransactionProduct(transaction=transaction, **item_data))
+        return transaction_products
+
+    @staticmethod
+    def bulk_create_transactions(user, transactions_data, transaction_type='ACTUAL'):
+        """
+        Create many transactions with their products in one atomic unit.
+
+        Args:
+            user: Owner of the new transactions.
+            transactions_data (list[dict]): Validated data as produced by
+                CreateTransactionSerializer, each with a 'products' list.
+            transaction_type (str): Type assigned to every created transaction.
+
+        Returns:
+            list[Transaction]: The created transactions, in input order.
+        """
+        if not transactions_data:
+            return []
+
+        transactions = []
+        products_per_transaction = []
+        for data in transactions_data:
+            data = dict(data)
+            products_per_transaction.append(data.pop('products', []))
+            data['user'] = user
+            data['transaction_type'] = transaction_type
+            if data.get('total_amount') is not None:
+                data['total_amount'] = Decimal(data['total_amount']).quantize(Decimal('0.01'))
+            transactions.append(Transaction(**data))
+
+        with db_transaction.atomic():
+            transactions = Transaction.objects.bulk_create(transactions)
+
+            transaction_products = []
+            for transaction, products_data in zip(transactions, products_per_transaction):
+                transaction_products.extend(
+                    TransactionService.build_transaction_products(transaction, products_data)
+                )
+            TransactionProduct.objects.bulk_create(transaction_products)
+
+            SpendingRollupService(user).refresh_dates(
+                {transaction.transaction_date for transaction in transactions}
+            )
+            if transaction_type == 'ACTUAL':
+                PriceIndexService(user).record_purchases(
+                    (item.product_id, item.transaction.transaction_date, item.unit_price)
+                    for item in transaction_products
+                )
+                ProductFrequencyCalculator(user).record_purchases(
+                    (item.product_id, item.transaction.transaction_date) for item in transaction_products
+                )
+
+        return transactions
+
+
+    @staticmethod
+    def create_estimated_transactions(user, estimates):
+        """
+        Create one ESTIMATED transaction per missed date with bulk inserts in one
+        atomic block.
+
+        Args:
+            user: Owner of the new transactions.
+            estimates (dict[date, dict[int, Decimal]]): Estimated quantity per
+                product id, per date, as returned by ProductService.
+                Unknown product ids are skipped.
+
+        Returns:
+            list[Transaction]: The created transactions, in date order.
+        """
+        product_ids = {product_id for quantities in estimates.values() for product_id in quantities}
+        known_ids = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+        prices = PriceIndexService(user).get_prices(known_ids)
+
+        transactions_data = []
+        for missed_date in sorted(estimates):
+            # Priced at what the user usually pays; never-bought products stay at zero
+            products = [
+                {'product_id': product_id, 'quantity': quantity,
+                 'unit_price': prices.get(product_id, Decimal('0.00'))}
+                for product_id, quantity in estimates[missed_date].items()
+                if product_id in known_ids
+            ]
+            transactions_data.append({
+                'transaction_date': missed_date,
+                'total_amount': sum(
+                    (item['quantity'] * item['unit_price'] for item in products), Decimal('0.00')
+                ).quantize(Decimal('0.01')),
+                'products': products
+            })
+        return TransactionService.bulk_create_transactions(user, transactions_data, transaction_type='ESTIMATED')
+
+
+class SpendingRollupService:
+    """
+    Maintains SpendingRollup rows for a user.
+
+    Writers call refresh_dates() with every transaction date they touched (old and
+    new dates on updates). Only the day, week and month buckets containing those
+    dates are recomputed, with one grouped query per period, so the cost depends
+    on the size of a bucket rather than on the user's whole history.
+    """
+    PERIOD_KINDS = {'DAY': 'day', 'WEEK': 'week', 'MONTH': 'month'}
+    # Buckets recomputed per query; SQLite rejects expression trees deeper than 1000,
+    # so the OR of bucket ranges must stay well below that
+    REFRESH_BATCH_SIZE = 200
+
+    def __init__(self, user):
+        # Accepts a user instance or a user id
+        self.user_id = getattr(user, 'pk', user)
+
+    @staticmethod
+    def bucket_bounds(period, day):
+        """Return the (start, end) dates of the bucket containing `day`."""
+        if period == 'DAY':
+            return day, day
+        if period == 'WEEK':
+            start = day - timedelta(days=day.weekday())
+            return start, start + timedelta(days=6)
+        start = day.replace(day=1)
+        next_month = (start + timedelta(days=32)).replace(day=1)
+        return start, next_month - timedelta(days=1)
+
+    def _grouped_rows(self, period, date_filter=None):
+        """Aggregate the user's line items into rollup rows for one period."""
+        queryset = TransactionProduct.objects.filter(transaction__user_id=self.user_id)
+        if date_filter is not None:
+            queryset = queryset.filter(date_filter)
+        grouped = (
+            queryset
+            .annotate(bucket=Trunc('transaction__transaction_date', self.PERIOD_KINDS[period], output_field=DateField()))
+            .values('bucket', 'product__category', 'transaction__transaction_type')
+            .annotate(
+                total=Sum('total_price'),
+                transactions=Count('transaction', distinct=True),
+                items=Count('id')
+            )
+            .order_by()
+        )
+        for row in grouped.iterator():
+            yield SpendingRollup(
+                user_id=self.user_id,
+                period=period,
+                bucket_start=row['bucket'],
+                category=row['product__category'] or '',
+                transaction_type=row['transaction__transaction_type'],
+                total_amount=row['total'] or Decimal('0.00'),
+                transaction_count=row['transactions'],
+                item_count=row['items']
+            )
+
+    def refresh_dates(self, dates):
+        """Recompute the rollup buckets that contain any of the given dates."""
+        dates = {day for day in dates if day is not None}
+        if not dates:
+            return
+
+        with db_transaction.atomic():
+            for period in self.PERIOD_KINDS:
+                bounds = sorted({self.bucket_bounds(period, day) for day in dates})
+                for offset in range(0, len(bounds), self.REFRESH_BATCH_SIZE):
+                    batch = bounds[offset:offset + self.REFRESH_BATCH_SIZE]
+                    date_filter = reduce(or_, (
+                        Q(transaction__transaction_date__range=(start, end)) for start, end in batch
+                    ))
+                    rows = list(self._grouped_rows(period, date_filter))
+                    SpendingRollup.objects.filter(
+                        user_id=self.user_id, period=period, bucket_start__in=[start for start, _ in batch]
+                    ).delete()
+                    SpendingRollup.objects.bulk_create(rows)
+
+    def rebuild(self, batch_size=1000):
+        """Discard and recompute every rollup row for the user. Returns the number of rows written."""
+        written = 0
+        with db_transaction.atomic():
+            SpendingRollup.objects.filter(user_id=self.user_id).delete()
+            for period in self.PERIOD_KINDS:
+                batch = []
+                for rollup in self._grouped_rows(period):
+                    batch.append(rollup)
+                    if len(batch) >= batch_size:
+                        SpendingRollup.objects.bulk_create(batch)
+                        written += len(batch)
+                        batch = []
+                SpendingRollup.objects.bulk_create(batch)
+                written += len(batch)
+        return written
@@ -1,16 +1,31 @@
 import json
+import os
+import shutil
+import tempfile
 from datetime import date, timedelta
 from decimal import Decimal
-from django.test import TestCase
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework.authtoken.models import Token
+from io import BytesIO, StringIO
 from unittest.mock import patch, MagicMock
+from PIL import Image
 
-from transactions.models import Transaction, TransactionProduct
-from products.models import Product
+from transactions.models import Transaction, TransactionProduct, TransactionImport, SpendingRollup
+from transactions.imports import TransactionImportService
+from transactions.services import SpendingRollupService, TransactionService
+from transactions.receipts import ReceiptImageService
+from products.models import Product, ProductPriceIndex
+from products.services import ProductService, PriceIndexService
 from profiles.models import UserProfile # Assuming UserProfile is in authentication app
 from shoppingList.models import ShoppingList # Used for linking to transactions
 
@@ -454,4 +469,1229 @@ class TransactionAPITest(APITestCase):
         response = self.client.post(self.estimate_missed_url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED) # Still 201 if empty transaction can be created
         self.assertTrue(response.data['success'])
-        self.assertEqual(len(response.data['data']['transaction']['products']), 0)
\ No newline at end of file
+        self.assertEqual(len(response.data['data']['transaction']['products']), 0)
+
+class TransactionBulkCreateAPITest(APITestCase):
+    """Test the bulk transaction ingest endpoint."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='bulkuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.product1 = Product.objects.create(name='Apples', category='Fruit', default_unit='kg')
+        self.product2 = Product.objects.create(name='Milk', category='Dairy', default_unit='liter')
+        self.bulk_url = reverse('transaction-bulk-create')
+
+    def test_bulk_create_transactions(self):
+        """All valid rows are created with their products and a per-row report."""
+        data = [
+            {
+                'transaction_date': str(date.today() - timedelta(days=14)),
+                'products': [
+                    {'product_id': self.product1.id, 'quantity': '2.0', 'unit_price': '3.00'},
+                    {'product_id': self.product2.id, 'quantity': '1.0', 'unit_price': '1.50'}
+                ]
+            },
+            {
+                'transaction_date': str(date.today() - timedelta(days=7)),
+                'total_amount': '9.99',
+                'products': [
+                    {'product_id': self.product2.id, 'quantity': '3.0', 'unit_price': '1.50'}
+                ]
+            }
+        ]
+        response = self.client.post(self.bulk_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['success'])
+        self.assertEqual(response.data['data']['created'], 2)
+        self.assertEqual(response.data['data']['failed'], 0)
+        self.assertTrue(all(result['success'] for result in response.data['data']['results']))
+
+        first = Transaction.objects.get(id=response.data['data']['results'][0]['id'])
+        self.assertEqual(first.transaction_type, 'ACTUAL')
+        self.assertEqual(first.total_amount, Decimal('7.50'))
+        self.assertEqual(first.products.count(), 2)
+        self.assertEqual(
+            first.products.get(product=self.product1).total_price, Decimal('6.00')
+        )
+        second = Transaction.objects.get(id=response.data['data']['results'][1]['id'])
+        self.assertEqual(second.total_amount, Decimal('9.99'))
+
+    def test_bulk_create_reports_invalid_rows(self):
+        """Invalid rows are reported by index while valid rows are still created."""
+        data = {'transactions': [
+            {
+                'transaction_date': str(date.today()),
+                'products': [{'product_id': self.product1.id, 'quantity': '1.0', 'unit_price': '2.00'}]
+            },
+            {
+                'transaction_date': str(date.today()),
+                'products': [{'product_id': 9999, 'quantity': '1.0', 'unit_price': '2.00'}]
+            }
+        ]}
+        response = self.client.post(self.bulk_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        results = response.data['data']['results']
+        self.assertTrue(results[0]['success'])
+        self.assertFalse(results[1]['success'])
+        self.assertEqual(results[1]['index'], 1)
+        self.assertIn('products', results[1]['errors'])
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_create_all_invalid(self):
+        """A payload with no valid rows returns 400 and creates nothing."""
+        data = [{'products': [{'product_id': self.product1.id, 'quantity': '1.0'}]}]
+        response = self.client.post(self.bulk_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.data['success'])
+        self.assertEqual(response.data['errors']['failed'], 1)
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_bulk_create_empty_payload(self):
+        """An empty array is rejected."""
+        response = self.client.post(self.bulk_url, [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('transactions', response.data['errors'])
+
+    def test_bulk_create_uses_constant_inserts(self):
+        """The write phase issues one INSERT per table regardless of row count."""
+        data = [
+            {
+                'transaction_date': str(date.today() - timedelta(days=i)),
+                'products': [
+                    {'product_id': self.product1.id, 'quantity': '1.0', 'unit_price': '1.00'},
+                    {'product_id': self.product2.id, 'quantity': '1.0', 'unit_price': '1.00'}
+                ]
+            }
+            for i in range(20)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.bulk_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        inserts = [
+            q for q in ctx.captured_queries
+            if q['sql'].startswith(('INSERT INTO "transactions_transaction"', 'INSERT INTO "transactions_transactionproduct"'))
+        ]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(TransactionProduct.objects.count(), 40)
+
+
+
+class TransactionImportTest(APITestCase):
+    """Test streaming, chunk-committed transaction imports."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+        self.user = User.objects.create_user(username='importuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.product1 = Product.objects.create(name='Apples', category='Fruit', default_unit='kg')
+        self.product2 = Product.objects.create(name='Milk', category='Dairy', default_unit='liter')
+        self.imports_url = reverse('transaction-import-list')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _ndjson(self, count, invalid_lines=()):
+        lines = []
+        for i in range(count):
+            if i in invalid_lines:
+                lines.append('{not json')
+                continue
+            lines.append(json.dumps({
+                'transaction_date': str(date.today() - timedelta(days=i)),
+                'products': [{'product_id': self.product1.id, 'quantity': '1.0', 'unit_price': '2.00'}]
+            }))
+        return ('\n'.join(lines) + '\n').encode()
+
+    def _upload(self, name, content, **extra):
+        data = {'source_file': SimpleUploadedFile(name, content), **extra}
+        return self.client.post(self.imports_url, data, format='multipart')
+
+    def test_upload_queues_job(self):
+        """Uploading a file creates a PENDING job without importing anything yet."""
+        response = self._upload('history.ndjson', self._ndjson(3))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['data']['status'], 'PENDING')
+        self.assertEqual(response.data['data']['file_format'], 'NDJSON')
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_upload_unknown_format_rejected(self):
+        """A file whose format cannot be inferred is rejected."""
+        response = self._upload('history.txt', b'hello')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('file_format', response.data['errors'])
+
+    def test_process_ndjson_import_in_chunks(self):
+        """The worker imports every row in chunks and reports status through the API."""
+        response = self._upload('history.ndjson', self._ndjson(7, invalid_lines={3}), chunk_size=2)
+        job_id = response.data['data']['id']
+
+        call_command('process_transaction_imports', stdout=StringIO())
+
+        detail = self.client.get(reverse('transaction-import-detail', args=[job_id]))
+        self.assertEqual(detail.status_code, status.HTTP_200_OK)
+        data = detail.data['data']
+        self.assertEqual(data['status'], 'COMPLETED')
+        self.assertEqual(data['rows_processed'], 7)
+        self.assertEqual(data['rows_imported'], 6)
+        self.assertEqual(data['rows_failed'], 1)
+        self.assertEqual(data['row_errors'][0]['line'], 4)
+        self.assertEqual(data['progress'], 1.0)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 6)
+
+    def test_process_csv_import_groups_rows(self):
+        """Consecutive CSV rows with the same transaction_ref form one transaction."""
+        content = (
+            'transaction_ref,transaction_date,product_id,quantity,unit_price\n'
+            f'a,2025-01-01,{self.product1.id},2,1.50\n'
+            f'a,2025-01-01,{self.product2.id},1,1.00\n'
+            f'b,2025-01-08,{self.product1.id},1,1.50\n'
+        ).encode()
+        job_id = self._upload('history.csv', content).data['data']['id']
+
+        call_command('process_transaction_imports', stdout=StringIO())
+
+        job = TransactionImport.objects.get(id=job_id)
+        self.assertEqual(job.status, 'COMPLETED')
+        self.assertEqual(job.rows_imported, 2)
+        first = Transaction.objects.get(user=self.user, transaction_date=date(2025, 1, 1))
+        self.assertEqual(first.products.count(), 2)
+        self.assertEqual(first.total_amount, Decimal('4.00'))
+
+    def test_csv_missing_columns_fails_job(self):
+        """A CSV without the required columns marks the job as FAILED."""
+        job_id = self._upload('history.csv', b'date,item\n2025-01-01,1\n').data['data']['id']
+        call_command('process_transaction_imports', stdout=StringIO(), stderr=StringIO())
+        job = TransactionImport.objects.get(id=job_id)
+        self.assertEqual(job.status, 'FAILED')
+        self.assertIn('missing required columns', job.error_message)
+
+    def test_failed_import_resumes_from_last_offset(self):
+        """A job that fails mid-file resumes after its last committed chunk without duplicates."""
+        job_id = self._upload('history.ndjson', self._ndjson(6), chunk_size=2).data['data']['id']
+
+        original = TransactionService.bulk_create_transactions
+        calls = {'count': 0}
+
+        def flaky_bulk_create(*args, **kwargs):
+            calls['count'] += 1
+            if calls['count'] == 2:
+                raise OSError('disk went away')
+            return original(*args, **kwargs)
+
+        with patch('transactions.services.TransactionService.bulk_create_transactions', side_effect=flaky_bulk_create):
+            call_command('process_transaction_imports', stdout=StringIO(), stderr=StringIO())
+
+        job = TransactionImport.objects.get(id=job_id)
+        self.assertEqual(job.status, 'FAILED')
+        self.assertEqual(job.rows_imported, 2)
+        self.assertGreater(job.last_committed_offset, 0)
+
+        response = self.client.post(reverse('transaction-import-resume', args=[job_id]))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        call_command('process_transaction_imports', stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'COMPLETED')
+        self.assertEqual(job.rows_imported, 6)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 6)
+
+    def test_database_error_fails_job_and_later_jobs_run(self):
+        """A DB error mid-import marks the job FAILED at its committed progress; the queue moves on."""
+        failing_id = self._upload('first.ndjson', self._ndjson(6), chunk_size=2).data['data']['id']
+        next_id = self._upload('second.ndjson', self._ndjson(2)).data['data']['id']
+
+        original = TransactionService.bulk_create_transactions
+        calls = {'count': 0}
+
+        def locked_bulk_create(*args, **kwargs):
+            calls['count'] += 1
+            if calls['count'] == 2:
+                raise OperationalError('database is locked')
+            return original(*args, **kwargs)
+
+        with patch('transactions.services.TransactionService.bulk_create_transactions', side_effect=locked_bulk_create):
+            call_command('process_transaction_imports', stdout=StringIO(), stderr=StringIO())
+
+        failing = TransactionImport.objects.get(id=failing_id)
+        self.assertEqual(failing.status, 'FAILED')
+        self.assertEqual(failing.error_message, 'database is locked')
+        self.assertEqual((failing.rows_processed, failing.rows_imported), (2, 2))
+        self.assertEqual(TransactionImport.objects.get(id=next_id).status, 'COMPLETED')
+
+        self.client.post(reverse('transaction-import-resume', args=[failing_id]))
+        call_command('process_transaction_imports', stdout=StringIO())
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.rows_imported), ('COMPLETED', 6))
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 8)
+
+    def test_stale_running_job_is_reclaimed(self):
+        """A job left RUNNING by a dead worker is resumable and picked up again by the command."""
+        job_id = self._upload('history.ndjson', self._ndjson(3)).data['data']['id']
+        TransactionImport.objects.filter(id=job_id).update(status='RUNNING')
+        resume_url = reverse('transaction-import-resume', args=[job_id])
+
+        # Still within the timeout: the worker may be alive
+        self.assertEqual(self.client.post(resume_url).status_code, status.HTTP_400_BAD_REQUEST)
+        call_command('process_transaction_imports', stdout=StringIO())
+        self.assertEqual(TransactionImport.objects.get(id=job_id).status, 'RUNNING')
+
+        stale = timezone.now() - TransactionImportService.STALE_AFTER - timedelta(minutes=1)
+        TransactionImport.objects.filter(id=job_id).update(updated_at=stale)
+        self.assertEqual(self.client.post(resume_url).status_code, status.HTTP_202_ACCEPTED)
+        TransactionImport.objects.filter(id=job_id).update(status='RUNNING', updated_at=stale)
+        call_command('process_transaction_imports', stdout=StringIO())
+        self.assertEqual(TransactionImport.objects.get(id=job_id).status, 'COMPLETED')
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 3)
+
+    def test_other_users_import_not_visible(self):
+        """Users cannot see each other's import jobs."""
+        other_user = User.objects.create_user(username='otheruser', password='password')
+        job = TransactionImport.objects.create(
+            user=other_user, source_file='imports/x.ndjson', file_format='NDJSON'
+        )
+        response = self.client.get(reverse('transaction-import-detail', args=[job.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TransactionExportAPITest(APITestCase):
+    """Test the streaming CSV/NDJSON export."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='exportuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.product1 = Product.objects.create(name='Apples', category='Fruit', default_unit='kg')
+        self.product2 = Product.objects.create(name='Milk', category='Dairy', default_unit='liter')
+
+        self.actual = Transaction.objects.create(
+            user=self.user, transaction_date=date.today() - timedelta(days=2),
+            transaction_type='ACTUAL', total_amount=Decimal('5.00')
+        )
+        TransactionProduct.objects.create(
+            transaction=self.actual, product=self.product1, quantity=Decimal('2.00'), unit_price=Decimal('1.50')
+        )
+        TransactionProduct.objects.create(
+            transaction=self.actual, product=self.product2, quantity=Decimal('1.00'), unit_price=Decimal('2.00')
+        )
+        self.estimated = Transaction.objects.create(
+            user=self.user, transaction_date=date.today() - timedelta(days=20),
+            transaction_type='ESTIMATED', total_amount=Decimal('0.00')
+        )
+        other_user = User.objects.create_user(username='otheruser', password='password')
+        Transaction.objects.create(user=other_user, transaction_date=date.today(), total_amount=Decimal('1.00'))
+
+        self.export_url = reverse('transaction-export')
+
+    def _content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_csv(self):
+        """CSV export streams one row per line item, plus transactions without items."""
+        response = self.client.get(self.export_url + '?format=csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = self._content(response).strip().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['transaction_id', 'transaction_date', 'transaction_type'])
+        self.assertEqual(len(lines), 4)  # header + 2 line items + 1 empty estimated transaction
+        self.assertIn('Apples', lines[1])
+        self.assertIn('3.00', lines[1])  # total_price of 2 x 1.50
+
+    def test_export_ndjson_with_filters(self):
+        """NDJSON export honours the TransactionFilter parameters."""
+        response = self.client.get(self.export_url + '?format=ndjson&transaction_type=ACTUAL')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = [json.loads(line) for line in self._content(response).strip().splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(all(row['transaction_id'] == self.actual.id for row in rows))
+        self.assertEqual({row['product_name'] for row in rows}, {'Apples', 'Milk'})
+
+        date_from = date.today() - timedelta(days=30)
+        date_to = date.today() - timedelta(days=10)
+        response = self.client.get(self.export_url + f'?format=ndjson&date_from={date_from}&date_to={date_to}')
+        rows = [json.loads(line) for line in self._content(response).strip().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['transaction_id'], self.estimated.id)
+        self.assertIsNone(rows[0]['product_id'])
+
+    def test_export_invalid_filter(self):
+        """Invalid filter values return the standard JSON error envelope."""
+        response = self.client.get(self.export_url + '?format=csv&transaction_type=BOGUS')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.json()['success'])
+        self.assertIn('transaction_type', response.json()['errors'])
+
+    def test_export_unauthenticated(self):
+        """Unauthenticated access to the export is denied."""
+        self.client.credentials()
+        response = self.client.get(self.export_url + '?format=csv')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TransactionPaginationAPITest(APITestCase):
+    """Test page-number and keyset (cursor) pagination of the transaction list."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='pageuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        # Several transactions share a date so the created_at/id tie-breakers matter
+        for i in range(25):
+            Transaction.objects.create(
+                user=self.user,
+                transaction_date=date.today() - timedelta(days=i // 3),
+                transaction_type='ACTUAL',
+                total_amount=Decimal('1.00')
+            )
+        self.expected_ids = list(
+            Transaction.objects.filter(user=self.user)
+            .order_by('-transaction_date', '-created_at', '-id')
+            .values_list('id', flat=True)
+        )
+        self.url = reverse('transaction-list')
+
+    def test_page_number_pagination_envelope(self):
+        """Page-number mode returns a single envelope with count and results."""
+        response = self.client.get(self.url + '?page=1&page_size=10')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['success'])
+        self.assertEqual(response.data['data']['count'], 25)
+        self.assertEqual(len(response.data['data']['results']), 10)
+
+    def test_cursor_pagination_walks_all_pages(self):
+        """Following next cursors visits every transaction exactly once, in order."""
+        seen = []
+        response = self.client.get(self.url + '?pagination=cursor&page_size=10')
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.data['data']
+            self.assertNotIn('count', data)
+            seen.extend(item['id'] for item in data['results'])
+            if data['next_cursor'] is None:
+                break
+            response = self.client.get(self.url + f"?cursor={data['next_cursor']}&page_size=10")
+        self.assertEqual(seen, self.expected_ids)
+
+    def test_cursor_pagination_previous_page(self):
+        """The previous cursor returns the preceding page in the same order."""
+        first = self.client.get(self.url + '?pagination=cursor&page_size=10').data['data']
+        self.assertIsNone(first['previous_cursor'])
+        second = self.client.get(self.url + f"?cursor={first['next_cursor']}&page_size=10").data['data']
+        back = self.client.get(self.url + f"?cursor={second['previous_cursor']}&page_size=10").data['data']
+        self.assertEqual(
+            [item['id'] for item in back['results']],
+            [item['id'] for item in first['results']]
+        )
+
+    def test_cursor_pagination_count_on_request(self):
+        """The total count is only included when explicitly requested."""
+        response = self.client.get(self.url + '?pagination=cursor&include_count=true')
+        self.assertEqual(response.data['data']['count'], 25)
+
+    def test_cursor_pagination_skips_count_query(self):
+        """Without include_count the paginator issues no COUNT query."""
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url + '?pagination=cursor&page_size=5')
+        # The ETag validator aggregate (COUNT + MAX(updated_at)) is the only count allowed
+        self.assertFalse(any(
+            'COUNT(' in q['sql'] and 'MAX(' not in q['sql'] for q in ctx.captured_queries
+        ))
+
+    def test_cursor_pagination_with_filters(self):
+        """Filters still apply in cursor mode."""
+        date_from = date.today() - timedelta(days=1)
+        response = self.client.get(self.url + f'?pagination=cursor&date_from={date_from}')
+        self.assertEqual(len(response.data['data']['results']), 6)
+
+    def test_invalid_cursor(self):
+        """A malformed cursor returns 404."""
+        response = self.client.get(self.url + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TransactionNestedUpdateTest(APITestCase):
+    """Test set-based nested item updates through PUT/PATCH /transactions/{id}/."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='updateuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.products = [
+            Product.objects.create(name=f'Product {i}', category='Test') for i in range(60)
+        ]
+        self.transaction = Transaction.objects.create(
+            user=self.user, transaction_date=date.today(), transaction_type='ACTUAL', total_amount=Decimal('60.00')
+        )
+        self.items = [
+            TransactionProduct.objects.create(
+                transaction=self.transaction, product=product, quantity=Decimal('1.00'), unit_price=Decimal('1.00')
+            )
+            for product in self.products
+        ]
+        self.url = reverse('transaction-detail', args=[self.transaction.id])
+
+    def test_update_delete_and_add_items(self):
+        """Existing items are updated, deleted and added in one request."""
+        data = {
+            'products': [
+                {'id': self.items[0].id, 'product_id': self.products[0].id, 'quantity': '3.00'},
+                {'id': self.items[1].id, 'product_id': self.products[1].id, 'quantity': '1.00', '_delete': True},
+                {'product_id': self.products[2].id, 'quantity': '2.00', 'unit_price': '5.00'}
+            ]
+        }
+        response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # 3 x 1.00 (existing unit price) + 2 x 5.00
+        self.assertEqual(Decimal(response.data['data']['total_amount']), Decimal('13.00'))
+
+        self.items[0].refresh_from_db()
+        self.assertEqual(self.items[0].quantity, Decimal('3.00'))
+        self.assertEqual(self.items[0].total_price, Decimal('3.00'))
+        self.assertFalse(TransactionProduct.objects.filter(id=self.items[1].id).exists())
+        self.assertEqual(self.transaction.products.count(), 60)
+        new_item = self.transaction.products.get(product=self.products[2], unit_price=Decimal('5.00'))
+        self.assertEqual(new_item.total_price, Decimal('10.00'))
+
+    def test_update_unknown_item_id(self):
+        """Referencing an item from another transaction is rejected and nothing is written."""
+        data = {
+            'total_amount': '1.00',
+            'products': [
+                {'id': self.items[0].id, 'product_id': self.products[0].id, 'quantity': '9.00'},
+                {'id': 999999, 'product_id': self.products[0].id, 'quantity': '1.00'}
+            ]
+        }
+        response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.items[0].refresh_from_db()
+        self.assertEqual(self.items[0].quantity, Decimal('1.00'))
+
+    def test_large_update_uses_constant_queries(self):
+        """Editing every line of a 60-line receipt does not issue per-item queries."""
+        data = {
+            'products': [
+                {'id': item.id, 'product_id': item.product_id, 'quantity': '2.00'}
+                for item in self.items
+            ]
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(response.data['data']['total_amount']), Decimal('120.00'))
+        writes = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "transactions_transactionproduct"')]
+        self.assertEqual(len(writes), 1)
+        self.assertFalse(any(
+            'FROM "transactions_transactionproduct"' in q['sql'] and 'LIMIT 21' in q['sql']
+            for q in ctx.captured_queries
+        ))
+
+
+class SpendingAnalyticsTest(APITestCase):
+    """Test the spending rollups and the analytics endpoint."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='analyticsuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.fruit = Product.objects.create(name='Apples', category='Fruit')
+        self.dairy = Product.objects.create(name='Milk', category='Dairy')
+        self.analytics_url = reverse('transaction-analytics')
+
+    def _create(self, transaction_date, products):
+        data = {
+            'transaction_date': str(transaction_date),
+            'products': [
+                {'product_id': product.id, 'quantity': quantity, 'unit_price': price}
+                for product, quantity, price in products
+            ]
+        }
+        response = self.client.post(reverse('transaction-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['data']['id']
+
+    def _rollup(self, period, bucket_start, category):
+        return SpendingRollup.objects.get(
+            user=self.user, period=period, bucket_start=bucket_start,
+            category=category, transaction_type='ACTUAL'
+        )
+
+    def test_rollups_maintained_on_create_update_delete(self):
+        """Rollups follow creates, date-moving updates and deletes."""
+        first = self._create(date(2025, 3, 5), [(self.fruit, '2', '1.50'), (self.dairy, '1', '2.00')])
+        self._create(date(2025, 3, 20), [(self.fruit, '1', '4.00')])
+
+        self.assertEqual(self._rollup('MONTH', date(2025, 3, 1), 'Fruit').total_amount, Decimal('7.00'))
+        self.assertEqual(self._rollup('MONTH', date(2025, 3, 1), 'Fruit').transaction_count, 2)
+        self.assertEqual(self._rollup('WEEK', date(2025, 3, 3), 'Dairy').total_amount, Decimal('2.00'))
+        self.assertEqual(self._rollup('DAY', date(2025, 3, 20), 'Fruit').item_count, 1)
+
+        # Moving the first transaction to April updates both months
+        response = self.client.patch(
+            reverse('transaction-detail', args=[first]), {'transaction_date': '2025-04-02'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._rollup('MONTH', date(2025, 3, 1), 'Fruit').total_amount, Decimal('4.00'))
+        self.assertEqual(self._rollup('MONTH', date(2025, 4, 1), 'Fruit').total_amount, Decimal('3.00'))
+        self.assertFalse(SpendingRollup.objects.filter(
+            user=self.user, period='DAY', bucket_start=date(2025, 3, 5)
+        ).exists())
+
+        self.client.delete(reverse('transaction-detail', args=[first]))
+        self.assertFalse(SpendingRollup.objects.filter(
+            user=self.user, period='MONTH', bucket_start=date(2025, 4, 1)
+        ).exists())
+
+    def test_refresh_many_distinct_dates(self):
+        """A bulk write touching more than 1000 dates refreshes every bucket (SQLite caps expression depth)."""
+        start = date(2020, 1, 1)
+        rows = [
+            {
+                'transaction_date': str(start + timedelta(days=offset)),
+                'products': [{'product_id': self.fruit.id, 'quantity': '1', 'unit_price': '2.00'}]
+            }
+            for offset in range(1500)
+        ]
+        response = self.client.post(reverse('transaction-bulk-create'), rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        rollups = SpendingRollup.objects.filter(user=self.user)
+        self.assertEqual(rollups.filter(period='DAY').count(), 1500)
+        self.assertEqual(self._rollup('MONTH', date(2024, 1, 1), 'Fruit').total_amount, Decimal('62.00'))
+        incremental = set(rollups.values_list('period', 'bucket_start', 'total_amount', 'transaction_count'))
+        SpendingRollupService(self.user).rebuild()
+        self.assertEqual(
+            set(rollups.values_list('period', 'bucket_start', 'total_amount', 'transaction_count')), incremental
+        )
+
+    def test_analytics_endpoint(self):
+        """The analytics endpoint returns rollup rows for the requested period and range."""
+        self._create(date(2025, 1, 10), [(self.fruit, '1', '3.00')])
+        self._create(date(2025, 2, 10), [(self.fruit, '1', '5.00'), (self.dairy, '2', '1.00')])
+
+        response = self.client.get(self.analytics_url + '?period=month&date_from=2025-02-15')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['period'], 'MONTH')
+        results = response.data['data']['results']
+        self.assertEqual(len(results), 2)
+        self.assertEqual({row['category'] for row in results}, {'Fruit', 'Dairy'})
+
+        response = self.client.get(self.analytics_url + '?period=month&category=Fruit')
+        self.assertEqual(
+            [Decimal(row['total_amount']) for row in response.data['data']['results']],
+            [Decimal('3.00'), Decimal('5.00')]
+        )
+
+    def test_analytics_invalid_period(self):
+        """Unknown periods are rejected."""
+        response = self.client.get(self.analytics_url + '?period=year')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('period', response.data['errors'])
+
+    def test_backfill_command(self):
+        """The backfill command rebuilds rollups from existing transactions."""
+        transaction = Transaction.objects.create(
+            user=self.user, transaction_date=date(2025, 5, 6), transaction_type='ESTIMATED'
+        )
+        TransactionProduct.objects.create(
+            transaction=transaction, product=self.dairy, quantity=Decimal('2'), unit_price=Decimal('1.25')
+        )
+        self.assertFalse(SpendingRollup.objects.filter(user=self.user).exists())
+
+        call_command('backfill_spending_rollups', stdout=StringIO())
+
+        rollup = SpendingRollup.objects.get(
+            user=self.user, period='MONTH', bucket_start=date(2025, 5, 1), transaction_type='ESTIMATED'
+        )
+        self.assertEqual(rollup.total_amount, Decimal('2.50'))
+        self.assertEqual(SpendingRollup.objects.filter(user=self.user).count(), 3)
+
+
+class ReceiptImageProcessingTest(APITestCase):
+    """Test background compression and thumbnailing of receipt images."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+        self.user = User.objects.create_user(username='receiptuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.product = Product.objects.create(name='Bread', category='Bakery')
+        self.transaction = Transaction.objects.create(
+            user=self.user, transaction_date=date.today(), total_amount=Decimal('2.00')
+        )
+        TransactionProduct.objects.create(
+            transaction=self.transaction, product=self.product, quantity=Decimal('1'), unit_price=Decimal('2.00')
+        )
+        self.detail_url = reverse('transaction-detail', args=[self.transaction.id])
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _photo(self, size=(3000, 4000)):
+        """A JPEG with EXIF data (orientation and camera model), like a phone photo."""
+        image = Image.new('RGB', size, (200, 180, 160))
+        exif = Image.Exif()
+        exif[0x0110] = 'Test Phone'  # Model
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', quality=95, exif=exif)
+        return SimpleUploadedFile('receipt.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def _upload(self):
+        return self.client.patch(self.detail_url, {'receipt_image': self._photo()}, format='multipart')
+
+    def test_upload_queues_processing(self):
+        """The upload stores the original untouched and marks it PENDING."""
+        response = self._upload()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.receipt_status, 'PENDING')
+        self.assertFalse(self.transaction.receipt_thumbnail_small)
+        with Image.open(self.transaction.receipt_image.path) as stored:
+            self.assertEqual(stored.size, (3000, 4000))
+
+    def test_command_compresses_and_thumbnails(self):
+        """Processing strips EXIF, applies orientation, downscales and writes thumbnails."""
+        self._upload()
+        self.transaction.refresh_from_db()
+        original_path = self.transaction.receipt_image.path
+
+        out = StringIO()
+        call_command('process_receipt_images', stdout=out)
+        self.assertIn('Processed 1 receipt image(s).', out.getvalue())
+
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.receipt_status, 'READY')
+        self.assertFalse(os.path.exists(original_path))
+        with Image.open(self.transaction.receipt_image.path) as stored:
+            # Orientation 6 swaps width and height once applied
+            self.assertEqual(stored.size, (2048, 1536))
+            self.assertEqual(len(stored.getexif()), 0)
+        for field, bound in ReceiptImageService.THUMBNAIL_SIZES.items():
+            with Image.open(getattr(self.transaction, f'receipt_thumbnail_{field}').path) as thumbnail:
+                self.assertEqual(max(thumbnail.size), bound[0])
+                self.assertEqual(len(thumbnail.getexif()), 0)
+
+        response = self.client.get(self.detail_url)
+        data = response.data['data']
+        self.assertEqual(data['receipt_status'], 'READY')
+        self.assertTrue(data['receipt_thumbnail_small'].startswith('http://testserver/media/receipts/thumbnails/'))
+        self.assertTrue(data['receipt_thumbnail_medium'].endswith('_medium.jpg'))
+
+    def test_unreadable_receipt_fails(self):
+        """A file Pillow cannot decode marks the receipt FAILED and keeps the original."""
+        self.transaction.receipt_image.save('broken.jpg', ContentFile(b'not an image'), save=False)
+        self.transaction.receipt_status = 'PENDING'
+        self.transaction.save()
+
+        call_command('process_receipt_images', stdout=StringIO(), stderr=StringIO())
+
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.receipt_status, 'FAILED')
+        self.assertTrue(os.path.exists(self.transaction.receipt_image.path))
+
+    def test_unexpected_error_fails_receipt(self):
+        """Errors past decoding (encoding, storage, database) still mark the receipt FAILED."""
+        self._upload()
+        with patch.object(ReceiptImageService, '_encode', side_effect=RuntimeError('disk full')):
+            call_command('process_receipt_images', stdout=StringIO(), stderr=StringIO())
+
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.receipt_status, 'FAILED')
+        self.assertTrue(os.path.exists(self.transaction.receipt_image.path))
+
+    def test_stale_processing_receipt_is_reclaimed(self):
+        """A receipt left PROCESSING by a dead worker is processed again once it is stale."""
+        self._upload()
+        self.assertIsNotNone(ReceiptImageService.claim(self.transaction.id))
+
+        call_command('process_receipt_images', stdout=StringIO())
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.receipt_status, 'PROCESSING')
+
+        stale = timezone.now() - ReceiptImageService.STALE_AFTER - timedelta(minutes=1)
+        Transaction.objects.filter(id=self.transaction.id).update(updated_at=stale)
+        call_command('process_receipt_images', stdout=StringIO())
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.receipt_status, 'READY')
+
+    def test_replaced_receipt_is_not_overwritten(self):
+        """Output for a receipt replaced mid-processing is discarded."""
+        self._upload()
+        transaction = ReceiptImageService.claim(self.transaction.id)
+        self._upload()  # The user uploads a new receipt while the worker runs
+
+        ReceiptImageService(transaction).process()
+
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.receipt_status, 'PENDING')
+        self.assertFalse(self.transaction.receipt_thumbnail_small)
+
+
+class TransactionConditionalGetTest(APITestCase):
+    """Test ETag / Last-Modified handling on transaction reads."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='etaguser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.product = Product.objects.create(name='Eggs', category='Dairy')
+        self.transactions = []
+        for days_ago in (1, 2):
+            transaction = Transaction.objects.create(
+                user=self.user, transaction_date=date.today() - timedelta(days=days_ago),
+                total_amount=Decimal('3.00')
+            )
+            TransactionProduct.objects.create(
+                transaction=transaction, product=self.product, quantity=Decimal('1'), unit_price=Decimal('3.00')
+            )
+            self.transactions.append(transaction)
+        self.list_url = reverse('transaction-list')
+        self.detail_url = reverse('transaction-detail', args=[self.transactions[0].id])
+
+    def test_list_returns_validators(self):
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+        self.assertIn('Authorization', response['Vary'])
+
+    def test_if_none_match_returns_304_without_serializing(self):
+        etag = self.client.get(self.list_url)['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        # Authentication plus the validator aggregate; no page or product queries
+        self.assertFalse([q for q in ctx.captured_queries if 'transactions_transactionproduct' in q['sql']])
+
+    def test_if_modified_since_returns_304(self):
+        last_modified = self.client.get(self.detail_url)['Last-Modified']
+        response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_nested_item_change_invalidates(self):
+        list_etag = self.client.get(self.list_url)['ETag']
+        detail_etag = self.client.get(self.detail_url)['ETag']
+        item = self.transactions[0].products.get()
+
+        self.client.patch(self.detail_url, {
+            'products': [{'id': item.id, 'product_id': self.product.id, 'quantity': '2', 'unit_price': '3.00'}]
+        }, format='json')
+
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=list_etag).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=detail_etag).status_code, status.HTTP_200_OK)
+
+    def test_deletion_invalidates_list(self):
+        etag = self.client.get(self.list_url)['ETag']
+        self.client.delete(reverse('transaction-detail', args=[self.transactions[1].id]))
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['data']['results']), 1)
+
+    def test_etag_depends_on_query_and_user(self):
+        etag = self.client.get(self.list_url)['ETag']
+        self.assertNotEqual(self.client.get(self.list_url + '?page_size=1')['ETag'], etag)
+
+        other = User.objects.create_user(username='etagother', password='testpass123')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=other).key)
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_missing_transaction_still_404(self):
+        response = self.client.get(reverse('transaction-detail', args=[999999]), HTTP_IF_NONE_MATCH='"x"')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_non_numeric_pk_is_404(self):
+        for method in ('get', 'patch', 'delete'):
+            response = getattr(self.client, method)(self.list_url + 'abc/', HTTP_IF_NONE_MATCH='"x"')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, method)
+
+
+class TransactionSparseFieldsetTest(APITestCase):
+    """Test ?fields= / ?expand= on transaction reads."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='fieldsuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.product = Product.objects.create(name='Rice', category='Grains')
+        for days_ago in range(5):
+            transaction = Transaction.objects.create(
+                user=self.user, transaction_date=date.today() - timedelta(days=days_ago),
+                # No stored total: the serializer falls back to the item total
+                total_amount=None
+            )
+            TransactionProduct.objects.create(
+                transaction=transaction, product=self.product, quantity=Decimal('2'), unit_price=Decimal('1.50')
+            )
+        self.url = reverse('transaction-list')
+
+    def _page_queries(self, captured_queries):
+        """Queries that read transactions or their items (excludes auth and validators)."""
+        return [
+            q['sql'] for q in captured_queries
+            if 'transactions_' in q['sql'] and 'MAX(' not in q['sql'] and 'COUNT(' not in q['sql']
+        ]
+
+    def test_default_representation_unchanged(self):
+        response = self.client.get(self.url)
+        result = response.data['data']['results'][0]
+        self.assertIn('products', result)
+        self.assertEqual(result['products'][0]['product']['name'], 'Rice')
+
+    def test_summary_fields_single_lean_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url + '?fields=id,transaction_date,total_amount')
+        results = response.data['data']['results']
+        self.assertEqual(len(results), 5)
+        self.assertEqual(set(results[0]), {'id', 'transaction_date', 'total_amount'})
+        self.assertEqual(results[0]['total_amount'], '3.00')
+
+        page_queries = self._page_queries(ctx.captured_queries)
+        self.assertEqual(len(page_queries), 1, page_queries)
+        self.assertNotIn('receipt_image', page_queries[0])
+
+    def test_expand_products(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url + '?fields=id&expand=products')
+        result = response.data['data']['results'][0]
+        self.assertEqual(set(result), {'id', 'products'})
+        self.assertEqual(result['products'][0]['product']['name'], 'Rice')
+        # Page, items, products
+        self.assertEqual(len([q for q in ctx.captured_queries if 'SELECT' in q['sql']
+                              and 'COUNT(' not in q['sql'] and 'MAX(' not in q['sql']
+                              and ('transactions_' in q['sql'] or 'products_product' in q['sql'])]), 3)
+
+    def test_fields_on_detail_and_cursor_pages(self):
+        transaction = Transaction.objects.filter(user=self.user).first()
+        response = self.client.get(
+            reverse('transaction-detail', args=[transaction.id]) + '?fields=id,transaction_type'
+        )
+        self.assertEqual(set(response.data['data']), {'id', 'transaction_type'})
+
+        response = self.client.get(self.url + '?pagination=cursor&page_size=2&fields=id')
+        self.assertEqual(set(response.data['data']['results'][0]), {'id'})
+        next_page = self.client.get(self.url + f"?cursor={response.data['data']['next_cursor']}&page_size=2&fields=id")
+        self.assertEqual(len(next_page.data['data']['results']), 2)
+
+
+class EstimateMissedRangeTest(APITestCase):
+    """Test multi-date missed-shopping estimation."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rangeuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('transaction-estimate-missed')
+
+        self.weekly = Product.objects.create(name='Weekly Bread', category='Bakery')
+        self.biweekly = Product.objects.create(name='Biweekly Rice', category='Grains')
+        self.once = Product.objects.create(name='One-off Grill', category='Garden')
+
+        # Eight weeks of history ending 43 days ago, then the user was away
+        self.away_from = date.today() - timedelta(days=42)
+        for week in range(8):
+            day = self.away_from - timedelta(days=7 * (8 - week))
+            transaction = Transaction.objects.create(user=self.user, transaction_date=day, total_amount=Decimal('0'))
+            TransactionProduct.objects.create(
+                transaction=transaction, product=self.weekly, quantity=Decimal('2'), unit_price=Decimal('1.00')
+            )
+            if week % 2 == 0:
+                TransactionProduct.objects.create(
+                    transaction=transaction, product=self.biweekly, quantity=Decimal('1'), unit_price=Decimal('3.00')
+                )
+            if week == 0:
+                TransactionProduct.objects.create(
+                    transaction=transaction, product=self.once, quantity=Decimal('1'), unit_price=Decimal('50.00')
+                )
+
+    def _weekly_dates(self, weeks=6):
+        return [self.away_from + timedelta(days=7 * week) for week in range(weeks)]
+
+    def test_estimator_single_pass(self):
+        """Quantities for every date come from one history query."""
+        with CaptureQueriesContext(connection) as ctx:
+            estimates = ProductService(self.user).estimate_missed_products_for_dates(self._weekly_dates())
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        for missed_date in self._weekly_dates():
+            self.assertEqual(estimates[missed_date][self.weekly.id], Decimal('2.00'))
+            self.assertNotIn(self.once.id, estimates[missed_date])
+        # The biweekly product is due every other missed week
+        self.assertEqual(
+            [self.biweekly.id in estimates[missed_date] for missed_date in self._weekly_dates()],
+            [True, False, True, False, True, False]
+        )
+
+    def test_list_of_dates(self):
+        response = self.client.post(self.url, {'dates': [str(d) for d in self._weekly_dates()]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data['data']['created'], 6)
+        transactions = response.data['data']['transactions']
+        self.assertEqual([t['transaction_date'] for t in transactions], [str(d) for d in self._weekly_dates()])
+        self.assertTrue(all(t['transaction_type'] == 'ESTIMATED' for t in transactions))
+        self.assertEqual(len(transactions[0]['products']), 2)
+        self.assertEqual(len(transactions[1]['products']), 1)
+
+    def test_range_uses_bulk_inserts(self):
+        """A six-week range is inserted with one INSERT per table."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, {
+                'date_from': str(self.away_from), 'date_to': str(self.away_from + timedelta(days=41))
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data['data']['created'], 42)
+        self.assertEqual(Transaction.objects.filter(user=self.user, transaction_type='ESTIMATED').count(), 42)
+
+        inserts = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len([sql for sql in inserts if '"transactions_transaction"' in sql]), 1)
+        self.assertEqual(len([sql for sql in inserts if '"transactions_transactionproduct"' in sql]), 1)
+        # Weekly product: every seven days across the range
+        self.assertEqual(
+            TransactionProduct.objects.filter(
+                transaction__user=self.user, transaction__transaction_type='ESTIMATED', product=self.weekly
+            ).count(),
+            6
+        )
+
+    def test_range_validation(self):
+        future = str(date.today() + timedelta(days=1))
+        cases = [
+            {'date_from': str(self.away_from)},
+            {'date_from': str(self.away_from), 'date_to': future},
+            {'date_from': str(date.today()), 'date_to': str(self.away_from)},
+            {'date_from': str(self.away_from), 'date_to': str(date.today()), 'dates': [str(self.away_from)]},
+            {'dates': []},
+            {'date_from': str(date.today() - timedelta(days=400)), 'date_to': str(date.today())},
+        ]
+        for data in cases:
+            response = self.client.post(self.url, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+            self.assertFalse(response.data['success'])
+        self.assertFalse(Transaction.objects.filter(user=self.user, transaction_type='ESTIMATED').exists())
+
+
+class PriceIndexTest(APITestCase):
+    """Test the per-user price index maintained on ACTUAL transaction writes."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='priceuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.milk = Product.objects.create(name='Index Milk', category='Dairy')
+        self.eggs = Product.objects.create(name='Index Eggs', category='Dairy')
+
+    def _create(self, day, *items):
+        response = self.client.post(reverse('transaction-list'), {
+            'transaction_date': str(day),
+            'products': [
+                {'product_id': product.id, 'quantity': '1', 'unit_price': price} for product, price in items
+            ]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return Transaction.objects.get(id=response.data['data']['id'])
+
+    def _entry(self, product):
+        return ProductPriceIndex.objects.get(user=self.user, product=product)
+
+    def test_create_updates_index(self):
+        today = date.today()
+        self._create(today - timedelta(days=2), (self.milk, '1.00'), (self.eggs, '3.00'))
+        self._create(today, (self.milk, '1.60'))
+        self._create(today - timedelta(days=1), (self.milk, '1.20'))
+
+        entry = self._entry(self.milk)
+        self.assertEqual(entry.purchase_count, 3)
+        # A back-dated purchase does not replace the latest price
+        self.assertEqual(entry.last_price, Decimal('1.60'))
+        self.assertEqual(entry.last_purchased_on, today)
+        self.assertEqual(entry.median_price, Decimal('1.20'))
+        self.assertEqual(entry.mean_price, Decimal('1.27'))
+        self.assertEqual([price for _, price in entry.recent_prices], ['1.00', '1.20', '1.60'])
+        self.assertEqual(self._entry(self.eggs).last_price, Decimal('3.00'))
+
+    def test_window_is_bounded(self):
+        for days_ago in range(PriceIndexService.RECENT_PRICES + 5, 0, -1):
+            self._create(date.today() - timedelta(days=days_ago), (self.milk, f'{days_ago}.00'))
+
+        entry = self._entry(self.milk)
+        self.assertEqual(entry.purchase_count, PriceIndexService.RECENT_PRICES + 5)
+        self.assertEqual(len(entry.recent_prices), PriceIndexService.RECENT_PRICES)
+        self.assertEqual(entry.last_price, Decimal('1.00'))
+        self.assertEqual(entry.median_price, Decimal('5.50'))
+
+    def test_concurrent_first_purchase_does_not_conflict(self):
+        """A row inserted by another writer after the locking read is upserted, not duplicated."""
+        original = PriceIndexService._apply
+
+        def apply_after_concurrent_insert(service, entry, prices):
+            if entry.pk is None:
+                ProductPriceIndex.objects.create(
+                    user=self.user, product_id=entry.product_id, last_price=Decimal('9.00'),
+                    last_purchased_on=date.today(), mean_price=Decimal('9.00'), median_price=Decimal('9.00'),
+                    purchase_count=1
+                )
+            return original(service, entry, prices)
+
+        with patch.object(PriceIndexService, '_apply', apply_after_concurrent_insert):
+            PriceIndexService(self.user).record_purchases([(self.milk.id, date.today(), Decimal('1.50'))])
+
+        entry = self._entry(self.milk)
+        self.assertEqual((entry.last_price, entry.purchase_count), (Decimal('1.50'), 1))
+
+    def test_update_and_delete_rebuild_affected_products(self):
+        first = self._create(date.today() - timedelta(days=1), (self.milk, '1.00'), (self.eggs, '3.00'))
+        self._create(date.today(), (self.milk, '2.00'))
+        milk_item = first.products.get(product=self.milk)
+        eggs_item = first.products.get(product=self.eggs)
+
+        response = self.client.patch(reverse('transaction-detail', args=[first.id]), {
+            'products': [
+                {'id': milk_item.id, 'unit_price': '4.00'},
+                {'id': eggs_item.id, '_delete': True},
+            ]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        entry = self._entry(self.milk)
+        self.assertEqual(entry.purchase_count, 2)
+        self.assertEqual(entry.median_price, Decimal('3.00'))
+        self.assertEqual(entry.last_price, Decimal('2.00'))
+        self.assertFalse(ProductPriceIndex.objects.filter(user=self.user, product=self.eggs).exists())
+
+        response = self.client.delete(reverse('transaction-detail', args=[first.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        entry = self._entry(self.milk)
+        self.assertEqual(entry.purchase_count, 1)
+        self.assertEqual(entry.median_price, Decimal('2.00'))
+
+    def test_complete_shopping_list_updates_index(self):
+        from shoppingList.models import ShoppingListItem
+        from shoppingList.services import ShoppingListService
+
+        shopping_list = ShoppingList.objects.create(user=self.user, scheduled_date=date.today(), status='PENDING')
+        item = ShoppingListItem.objects.create(
+            shopping_list=shopping_list, product=self.milk,
+            predicted_quantity=Decimal('1.000'), predicted_price=Decimal('1.00')
+        )
+        ShoppingListService.complete_shopping_list(shopping_list, {'items': [
+            {'item_id': item.id, 'is_purchased': True, 'actual_quantity': Decimal('2'), 'unit_price': Decimal('1.75')}
+        ]})
+        self.assertEqual(self._entry(self.milk).last_price, Decimal('1.75'))
+
+    def test_estimates_are_priced_from_index(self):
+        self._create(date.today() - timedelta(days=30), (self.milk, '2.50'))
+        transaction = TransactionService.create_estimated_transactions(
+            self.user, {date.today() - timedelta(days=1): {self.milk.id: Decimal('2'), self.eggs.id: Decimal('1')}}
+        )[0]
+        prices = dict(transaction.products.values_list('product_id', 'unit_price'))
+        self.assertEqual(prices, {self.milk.id: Decimal('2.50'), self.eggs.id: Decimal('0.00')})
+        self.assertEqual(transaction.total_amount, Decimal('5.00'))
+        # Estimated purchases never feed the index
+        self.assertEqual(self._entry(self.milk).purchase_count, 1)
+
+    def test_rebuild_command_matches_incremental_index(self):
+        for days_ago, price in ((5, '1.00'), (3, '1.40'), (1, '1.10')):
+            self._create(date.today() - timedelta(days=days_ago), (self.milk, price), (self.eggs, '2.00'))
+        expected = list(ProductPriceIndex.objects.filter(user=self.user).order_by('product_id').values(
+            'product_id', 'last_price', 'last_purchased_on', 'mean_price', 'median_price',
+            'purchase_count', 'recent_prices'
+        ))
+        ProductPriceIndex.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_price_index', user_ids=[self.user.id], stdout=out)
+        self.assertIn('Rebuilt 2 price index row(s) for 1 user(s).', out.getvalue())
+        rebuilt = list(ProductPriceIndex.objects.filter(user=self.user).order_by('product_id').values(
+            'product_id', 'last_price', 'last_purchased_on', 'mean_price', 'median_price',
+            'purchase_count', 'recent_prices'
+        ))
+        self.assertEqual(rebuilt, expected)
+
+
+class ProductLoaderTest(APITestCase):
+    """Line-item products are resolved with one query per payload, with the same errors as before."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='loaderuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.products = [Product.objects.create(name=f'Loader Product {i}') for i in range(8)]
+
+    def product_selects(self, captured_queries):
+        """Product lookups issued while validating, i.e. before the first write."""
+        selects = []
+        for query in captured_queries:
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE')):
+                break
+            if query['sql'].startswith('SELECT') and 'FROM "products_product"' in query['sql']:
+                selects.append(query['sql'])
+        return selects
+
+    def line_items(self, products):
+        return [{'product_id': product.id, 'quantity': '1', 'unit_price': '1.00'} for product in products]
+
+    def test_create_resolves_products_once(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('transaction-list'), {
+                'transaction_date': str(date.today()), 'products': self.line_items(self.products)
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(len(self.product_selects(ctx.captured_queries)), 1)
+
+    def test_update_resolves_products_once(self):
+        transaction = Transaction.objects.create(user=self.user, transaction_date=date.today(), total_amount=Decimal('0'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(reverse('transaction-detail', args=[transaction.id]), {
+                'products': self.line_items(self.products)
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(len(self.product_selects(ctx.captured_queries)), 1)
+        self.assertEqual(transaction.products.count(), 8)
+
+    def test_bulk_resolves_products_once(self):
+        rows = [
+            {'transaction_date': str(date.today() - timedelta(days=i)), 'products': self.line_items(self.products[i:i + 3])}
+            for i in range(5)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('transaction-bulk-create'), rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data['data']['created'], 5)
+        self.assertEqual(len(self.product_selects(ctx.captured_queries)), 1)
+
+    def test_invalid_product_ids_keep_error_messages(self):
+        items = self.line_items(self.products[:1]) + [
+            {'product_id': 999999, 'quantity': '1'},
+            {'product_id': 'abc', 'quantity': '1'},
+            {'product_id': True, 'quantity': '1'},
+        ]
+        response = self.client.post(reverse('transaction-list'), {
+            'transaction_date': str(date.today()), 'products': items
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.data['errors']['products']
+        self.assertEqual(errors[0], {})
+        self.assertEqual(errors[1]['product_id'], ['Invalid pk "999999" - object does not exist.'])
+        self.assertEqual(errors[2]['product_id'], ['Incorrect type. Expected pk value, received str.'])
+        self.assertEqual(errors[3]['product_id'], ['Incorrect type. Expected pk value, received bool.'])
@@ -2,13 +2,28 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TransactionViewSet
+from .views import TransactionViewSet, TransactionImportViewSet
+from .async_views import AsyncTransactionListView, AsyncTransactionDetailView
 
 router = DefaultRouter()
+# Registered before the transaction routes so 'imports/' is not captured as a transaction pk
+router.register(r'imports', TransactionImportViewSet, basename='transaction-import')
 router.register(r'', TransactionViewSet, basename='transaction')
 
+ASYNC_ROUTE_NAMES = {'transaction-list', 'transaction-detail'}
+
 urlpatterns = [
-    path('', include(router.urls)),
+    # List and detail reads are served by async views; writes fall through to the viewset
+    path('', AsyncTransactionListView.as_view(
+        sync_view=TransactionViewSet.as_view({'get': 'list', 'post': 'create'})
+    ), name='transaction-list'),
+    path('<int:pk>/', AsyncTransactionDetailView.as_view(
+        sync_view=TransactionViewSet.as_view({
+            'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'
+        })
+    ), name='transaction-detail'),
+    # The router's own list/detail routes are replaced by the two paths above
+    path('', include([url for url in router.urls if url.name not in ASYNC_ROUTE_NAMES])),
     # Custom action 'estimate-missed' is automatically routed by DefaultRouter
     # to /transactions/estimate-missed/
-]
\ No newline at end of file
+]
@@ -1,21 +1,33 @@
-from rest_framework import viewsets, status
+from rest_framework import viewsets, mixins, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.renderers import JSONRenderer
 from django.db import transaction as db_transaction_atomic
-from django.db.models import Sum, F # For aggregation if needed
+from django.http import StreamingHttpResponse
+from django.db.models import Sum, OuterRef, Subquery # For aggregation if needed
 import django_filters.rest_framework
-from decimal import Decimal
+import csv
+import json
 
-from .models import Transaction, TransactionProduct
+from .models import Transaction, TransactionProduct, TransactionImport, SpendingRollup
 from .serializers import (
     TransactionSerializer, CreateTransactionSerializer, UpdateTransactionSerializer,
-    EstimateMissedRequestSerializer, EstimateMissedResponseSerializer
+    EstimateMissedRequestSerializer, EstimateMissedResponseSerializer,
+    EstimateMissedRangeRequestSerializer, EstimateMissedResponseTransactionSerializer,
+    TransactionImportSerializer, CreateTransactionImportSerializer,
+    SpendingAnalyticsQuerySerializer, SpendingRollupSerializer
 )
 from .permissions import IsOwnerPermission
-from .pagination import CustomPageNumberPagination # Assuming you have this
-from products.models import Product # Needed for EstimateMissedTransaction
-from products.services import ProductService # Import the service for business logic
+from .pagination import CustomPageNumberPagination, TransactionCursorPagination
+from .renderers import CSVExportRenderer, NDJSONExportRenderer
+from .conditional import ConditionalGetMixin
+from .fieldsets import SparseFieldsetViewMixin
+from .imports import TransactionImportService
+from .services import TransactionService, SpendingRollupService
+from products.loaders import ProductLoader
+from products.services import ProductService, PriceIndexService, ProductFrequencyCalculator # Import the service for business logic
 
 class TransactionFilter(django_filters.rest_framework.FilterSet):
     transaction_type = django_filters.rest_framework.ChoiceFilter(
@@ -34,20 +46,39 @@ class TransactionFilter(django_filters.rest_framework.FilterSet):
         fields = ['transaction_type', 'date_from', 'date_to']
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class Echo:
+    """Pseudo-buffer for csv.writer: write() returns the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+class TransactionViewSet(SparseFieldsetViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Transaction.objects.all()
     permission_classes = [IsAuthenticated, IsOwnerPermission]
     pagination_class = CustomPageNumberPagination
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
     filterset_class = TransactionFilter
+    fieldset_prefetches = {'products': ('products__product',)}
+    fieldset_required = ('id', 'user', 'transaction_date', 'transaction_type', 'total_amount', 'created_at')
     # lookup_field = 'id' # default is 'pk', which is usually fine
+    # Non-numeric pks must not reach the conditional-GET pre-check in retrieve()
+    lookup_value_regex = r'\d+'
 
     def get_queryset(self):
         """
         Ensure users can only see their own transactions.
-        Prefetch related products to avoid N+1 queries.
+        Prefetch related products (only when they are rendered) to avoid N+1 queries.
         """
-        return self.queryset.filter(user=self.request.user).prefetch_related('products__product')
+        queryset = self.narrow_queryset(self.queryset.filter(user=self.request.user))
+        names = self.get_requested_field_names()
+        if names is not None and 'total_amount' in names and 'products' not in names:
+            # TransactionSerializer falls back to the item total; compute it in the same query
+            queryset = queryset.annotate(products_total=Subquery(
+                TransactionProduct.objects.filter(transaction=OuterRef('pk'))
+                .order_by().values('transaction').annotate(total=Sum('total_price')).values('total')
+            ))
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -73,41 +104,65 @@ class TransactionViewSet(viewsets.ModelViewSet):
             'data': serializer.data
         }, status=status.HTTP_201_CREATED, headers=headers)
 
+    @property
+    def paginator(self):
+        """
+        Page-number pagination by default; keyset pagination when the request
+        asks for it with `pagination=cursor` or carries a `cursor`.
+        """
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params if self.request is not None else {}
+            if self.action == 'list' and (params.get('pagination') == 'cursor' or 'cursor' in params):
+                self._paginator = TransactionCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
 
+        not_modified = self.not_modified_response(request, queryset)
+        if not_modified is not None:
+            return not_modified
+
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response({
-                'success': True,
-                'message': 'Transactions retrieved successfully',
-                'data': {
-                    'results': serializer.data,
-                    'count': self.paginator.page.paginator.count,
-                    'next': self.paginator.get_next_link(),
-                    'previous': self.paginator.get_previous_link()
-                }
-            })
+            return self.set_conditional_headers(self.get_paginated_response(serializer.data))
 
         serializer = self.get_serializer(queryset, many=True)
+        return self.set_conditional_headers(self.list_response(serializer.data))
+
+    def list_response(self, data):
+        """Envelope for an unpaginated list (shared with the async read path)."""
         return Response({
             'success': True,
             'message': 'Transactions retrieved successfully',
             'data': {
-                'results': serializer.data
+                'results': data
             }
         })
 
+    def retrieve_response(self, data):
+        """Envelope for a single transaction (shared with the async read path)."""
+        return Response({
+            'success': True,
+            'message': 'Transaction retrieved successfully',
+            'data': data
+        })
+
     def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        not_modified = self.not_modified_response(
+            request, self.get_queryset().filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        )
+        if not_modified is not None:
+            return not_modified
+
         try:
             instance = self.get_object()
             serializer = self.get_serializer(instance)
-            return Response({
-                'success': True,
-                'message': 'Transaction retrieved successfully',
-                'data': serializer.data
-            })
+            return self.set_conditional_headers(self.retrieve_response(serializer.data))
         except Transaction.DoesNotExist:
             return Response({
                 'success': False,
@@ -163,13 +218,27 @@ class TransactionViewSet(viewsets.ModelViewSet):
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def perform_destroy(self, instance):
+        with db_transaction_atomic.atomic():
+            product_ids = set(instance.products.values_list('product_id', flat=True))
+            instance.delete()
+            SpendingRollupService(instance.user_id).refresh_dates([instance.transaction_date])
+            if instance.transaction_type == 'ACTUAL':
+                PriceIndexService(instance.user_id).rebuild(product_ids)
+                ProductFrequencyCalculator(instance.user_id).refresh(product_ids)
+
     @action(detail=False, methods=['post'], url_path='estimate-missed',
             serializer_class=EstimateMissedRequestSerializer)
     def estimate_missed(self, request):
         """
         POST /transactions/estimate-missed/
-        Creates an estimated transaction for a missed shopping date.
+        Creates estimated transactions for missed shopping dates: one date via
+        `transaction_date`, or several via `date_from`/`date_to` or `dates`.
+        All dates are estimated in one pass and inserted in one atomic block.
         """
+        if any(key in request.data for key in ('date_from', 'date_to', 'dates')):
+            return self._estimate_missed_range(request)
+
         serializer = self.get_serializer(data=request.data)
         if not serializer.is_valid():
             
@@ -182,58 +251,284 @@ class TransactionViewSet(viewsets.ModelViewSet):
         missed_date = serializer.validated_data['transaction_date']
 
         product_service = ProductService(request.user)
+        # An empty estimate still creates an (empty) estimated transaction
+        estimates = {missed_date: product_service.estimate_missed_products(missed_date)}
+        estimated_transaction = self._create_estimated_transactions(request.user, estimates)[0]
 
-        with db_transaction_atomic.atomic():
-            # 1. Estimate products for the missed date
-            estimated_product_quantities = product_service.estimate_missed_products(missed_date)
-
-            if not estimated_product_quantities:
-                # If no products are estimated, still create an empty estimated transaction
-                # or return a specific message/error if empty transactions are not allowed.
-                # OpenAPI suggests a 201 response with data, so creating an empty one is acceptable.
-                pass # Proceed to create transaction, it will just have no products
-
-            # 2. Create the estimated transaction
-            estimated_transaction = Transaction.objects.create(
-                user=request.user,
-                transaction_date=missed_date,
-                transaction_type='ESTIMATED',
-                total_amount=Decimal('0.00') # Initialize total_amount, will sum up from products
-            )
-
-            # 3. Add estimated products to the transaction
-            for product_id, quantity in estimated_product_quantities.items():
-                try:
-                    product = Product.objects.get(id=product_id)
-                    # For estimated transactions, unit_price might not be precise,
-                    # or could be an average. For now, let's assume it's part of estimation or 0.
-                    # If Product has a default price, could use that. Let's use 0 for simplicity if not defined.
-                    unit_price = product.default_unit_price if hasattr(product, 'default_unit_price') else Decimal('0.00')
-                    TransactionProduct.objects.create(
-                        transaction=estimated_transaction,
-                        product=product,
-                        quantity=quantity,
-                        unit_price=unit_price, # This might be zero or a placeholder
-                        total_price=quantity * unit_price
-                    )
-                except Product.DoesNotExist:
-                    # Log this or handle error: estimated product ID doesn't exist
-                    continue
-
-            # Recalculate total_amount after products are added
-            # This is important if total_amount was initially set to 0.00
-            actual_total_amount = estimated_transaction.products.aggregate(
-                sum_total=Sum(F('quantity') * F('unit_price'))
-            )['sum_total'] or Decimal('0.00')
-            estimated_transaction.total_amount = actual_total_amount.quantize(Decimal('0.01'))
-            estimated_transaction.save()
-
-            response_serializer = EstimateMissedResponseSerializer(
-                {'transaction': estimated_transaction}
-            )
+        response_serializer = EstimateMissedResponseSerializer(
+            {'transaction': estimated_transaction}
+        )
+
+        return Response({
+            'success': True,
+            'message': 'Missed transaction estimated successfully',
+            'data': response_serializer.data
+        }, status=status.HTTP_201_CREATED)
 
+    def _estimate_missed_range(self, request):
+        serializer = EstimateMissedRangeRequestSerializer(data=request.data)
+        if not serializer.is_valid():
             return Response({
-                'success': True,
-                'message': 'Missed transaction estimated successfully',
-                'data': response_serializer.data
-            }, status=status.HTTP_201_CREATED)
\ No newline at end of file
+                'success': False,
+                'message': 'Validation failed',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        missed_dates = serializer.validated_data['missed_dates']
+        estimates = ProductService(request.user).estimate_missed_products_for_dates(missed_dates)
+        estimated_transactions = self._create_estimated_transactions(request.user, estimates)
+
+        return Response({
+            'success': True,
+            'message': 'Missed transactions estimated successfully',
+            'data': {
+                'created': len(estimated_transactions),
+                'transactions': EstimateMissedResponseTransactionSerializer(estimated_transactions, many=True).data
+            }
+        }, status=status.HTTP_201_CREATED)
+
+    @staticmethod
+    def _create_estimated_transactions(user, estimates):
+        """Bulk-create the estimated transactions and reload them with their products for the response."""
+        created = TransactionService.create_estimated_transactions(user, estimates)
+        return list(
+            Transaction.objects.filter(id__in=[transaction.id for transaction in created])
+            .order_by('transaction_date')
+            .prefetch_related('products__product')
+        )
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """
+        POST /transactions/bulk/
+        Validates an array of transactions and creates every valid one in a single
+        atomic unit. Returns a per-row report so clients can surface failures.
+        """
+        rows = request.data if isinstance(request.data, list) else request.data.get('transactions')
+        if not isinstance(rows, list) or not rows:
+            return Response({
+                'success': False,
+                'message': 'Validation failed',
+                'errors': {'transactions': ['A non-empty array of transactions is required.']}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(rows) > TransactionService.MAX_BULK_TRANSACTIONS:
+            return Response({
+                'success': False,
+                'message': 'Validation failed',
+                'errors': {'transactions': [
+                    f'At most {TransactionService.MAX_BULK_TRANSACTIONS} transactions can be uploaded at once.'
+                ]}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        results = []
+        valid_rows = []
+        context = self.get_serializer_context()
+        # Resolve the products of every row with one query before validating rows one by one
+        ProductLoader.for_context(context).prime_from_rows(rows)
+        for index, row in enumerate(rows):
+            serializer = CreateTransactionSerializer(data=row, context=context)
+            if serializer.is_valid():
+                valid_rows.append((index, serializer.validated_data))
+            else:
+                results.append({'index': index, 'success': False, 'errors': serializer.errors})
+
+        created_transactions = TransactionService.bulk_create_transactions(
+            request.user, [validated_data for _, validated_data in valid_rows]
+        )
+        for (index, _), transaction in zip(valid_rows, created_transactions):
+            results.append({'index': index, 'success': True, 'id': transaction.id})
+        results.sort(key=lambda result: result['index'])
+
+        created_count = len(created_transactions)
+        failed_count = len(rows) - created_count
+        report = {
+            'created': created_count,
+            'failed': failed_count,
+            'results': results
+        }
+
+        if created_count == 0:
+            return Response({
+                'success': False,
+                'message': 'Validation failed',
+                'errors': report
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'message': f'Created {created_count} of {len(rows)} transactions',
+            'data': report
+        }, status=status.HTTP_201_CREATED)
+
+    # Flat line-item projection used by the export; LEFT JOINs products so
+    # transactions without line items still produce one row.
+    EXPORT_COLUMNS = [
+        ('transaction_id', 'id'),
+        ('transaction_date', 'transaction_date'),
+        ('transaction_type', 'transaction_type'),
+        ('total_amount', 'total_amount'),
+        ('product_id', 'products__product_id'),
+        ('product_name', 'products__product__name'),
+        ('product_category', 'products__product__category'),
+        ('quantity', 'products__quantity'),
+        ('unit_price', 'products__unit_price'),
+        ('total_price', 'products__total_price'),
+    ]
+    EXPORT_CHUNK_SIZE = 2000
+
+    @action(detail=False, methods=['get'], url_path='export',
+            renderer_classes=[CSVExportRenderer, NDJSONExportRenderer])
+    def export(self, request):
+        """
+        GET /transactions/export/?format=csv|ndjson
+        Streams the user's transaction line items, honouring the TransactionFilter
+        date and type filters. Rows are read with a server-side iterator so memory
+        stays constant regardless of history size.
+        """
+        filterset = TransactionFilter(
+            request.query_params, queryset=Transaction.objects.filter(user=request.user), request=request
+        )
+        if not filterset.is_valid():
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+            return Response({
+                'success': False,
+                'message': 'Validation failed',
+                'errors': filterset.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        header = [name for name, _ in self.EXPORT_COLUMNS]
+        rows = (
+            filterset.qs
+            .order_by('-transaction_date', '-created_at', 'id', 'products__id')
+            .values_list(*[lookup for _, lookup in self.EXPORT_COLUMNS])
+            .iterator(chunk_size=self.EXPORT_CHUNK_SIZE)
+        )
+
+        export_format = request.accepted_renderer.format
+        if export_format == 'ndjson':
+            content = (json.dumps(dict(zip(header, row)), default=str) + '\n' for row in rows)
+        else:
+            writer = csv.writer(Echo())
+            content = self._stream_csv(writer, header, rows)
+
+        response = StreamingHttpResponse(content, content_type=request.accepted_renderer.media_type)
+        response['Content-Disposition'] = f'attachment; filename="transactions.{export_format}"'
+        return response
+
+    @staticmethod
+    def _stream_csv(writer, header, rows):
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(['' if value is None else value for value in row])
+
+    @action(detail=False, methods=['get'], url_path='analytics')
+    def analytics(self, request):
+        """
+        GET /transactions/analytics/?period=day|week|month
+        Spend per period bucket, product category and transaction type, read from
+        the pre-aggregated SpendingRollup table.
+        """
+        query_serializer = SpendingAnalyticsQuerySerializer(data=request.query_params)
+        if not query_serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Validation failed',
+                'errors': query_serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        params = query_serializer.validated_data
+        period = params['period']
+
+        rollups = SpendingRollup.objects.filter(user=request.user, period=period)
+        if params.get('date_from'):
+            # Include the bucket that contains date_from
+            bucket_start, _ = SpendingRollupService.bucket_bounds(period, params['date_from'])
+            rollups = rollups.filter(bucket_start__gte=bucket_start)
+        if params.get('date_to'):
+            rollups = rollups.filter(bucket_start__lte=params['date_to'])
+        if params.get('transaction_type'):
+            rollups = rollups.filter(transaction_type=params['transaction_type'])
+        if 'category' in params:
+            rollups = rollups.filter(category=params['category'])
+
+        serializer = SpendingRollupSerializer(rollups.order_by('bucket_start', 'category', 'transaction_type'), many=True)
+        return Response({
+            'success': True,
+            'message': 'Analytics retrieved successfully',
+            'data': {
+                'period': period,
+                'results': serializer.data
+            }
+        })
+
+
+class TransactionImportViewSet(mixins.CreateModelMixin,
+                               mixins.RetrieveModelMixin,
+                               mixins.ListModelMixin,
+                               viewsets.GenericViewSet):
+    """
+    Streaming import jobs for large transaction histories.
+    Uploads are stored to disk by the multipart parser and processed in chunks
+    by the `process_transaction_imports` management command.
+    """
+    queryset = TransactionImport.objects.all()
+    permission_classes = [IsAuthenticated, IsOwnerPermission]
+    parser_classes = [MultiPartParser, FormParser]
+    pagination_class = CustomPageNumberPagination
+
+    def get_queryset(self):
+        return self.queryset.filter(user=self.request.user)
+
+    def get_serializer_class(self):
+        if self.action == 'create':
+            return CreateTransactionImportSerializer
+        return TransactionImportSerializer
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Validation failed',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        job = serializer.save(user=request.user)
+        return Response({
+            'success': True,
+            'message': 'Import queued successfully',
+            'data': TransactionImportSerializer(job).data
+        }, status=status.HTTP_202_ACCEPTED)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        return Response({
+            'success': True,
+            'message': 'Import retrieved successfully',
+            'data': serializer.data
+        })
+
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        """
+        POST /transactions/imports/{id}/resume/
+        Re-queues a failed import, or one whose worker stopped while it was RUNNING;
+        processing continues from the last committed offset.
+        """
+        job = self.get_object()
+        if job.status != 'FAILED' and not TransactionImportService.is_stale(job):
+            return Response({
+                'success': False,
+                'message': 'Only failed or stalled imports can be resumed',
+                'errors': {'status': [f'Import is {job.status}.']}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        job.status = 'PENDING'
+        job.save(update_fields=['status', 'updated_at'])
+        return Response({
+            'success': True,
+            'message': 'Import re-queued successfully',
+            'data': TransactionImportSerializer(job).data
+        }, status=status.HTTP_202_ACCEPTED)
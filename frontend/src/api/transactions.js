@@ -12,6 +12,11 @@ export const createTransaction = async (transactionData) => {
   return response.data;
 };
 
+export const bulkCreateTransactions = async (transactionsData) => {
+  const response = await api.post('/transactions/bulk/', transactionsData);
+  return response.data;
+};
+
 export const getTransactionDetail = async (id) => {
   const response = await api.get(`/transactions/${id}/`);
   return response.data;
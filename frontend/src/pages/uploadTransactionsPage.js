@@ -1,5 +1,5 @@
 // src/pages/uploadTransactionsPage.js
-import { createTransaction } from '../api/transactions';
+import { bulkCreateTransactions } from '../api/transactions';
 import { renderLoadingSpinner, removeLoadingSpinner } from '../components/loadingSpinner';
 
 export async function renderUploadTransactionsPage(targetElement, navigate) {
@@ -90,34 +90,42 @@ export async function renderUploadTransactionsPage(targetElement, navigate) {
         let failCount = 0;
         let errorDetails = [];
 
-        for (const transaction of transactionsData) {
-            try {
-                // The API endpoint is designed to create a single transaction at a time.
-                // We will loop through the provided JSON array and send each as a separate request.
-                // If the backend was designed for bulk upload, we'd send the whole array.
-                const response = await createTransaction(transaction);
-                if (response.success) {
-                    successCount++;
-                } else {
-                    failCount++;
-                    errorDetails.push(`Transaction on ${transaction.transaction_date}: ${response.message || 'Unknown error.'}`);
-                    if (response.errors) {
-                         for (const key in response.errors) {
-                            errorDetails.push(` - ${key}: ${response.errors[key].join(', ')}`);
-                        }
-                    }
+        const collectRowErrors = (results) => {
+            for (const result of results) {
+                if (result.success) {
+                    continue;
+                }
+                const transaction = transactionsData[result.index];
+                errorDetails.push(`Transaction on ${transaction.transaction_date || 'unknown date'}:`);
+                for (const key in result.errors) {
+                    const messages = Array.isArray(result.errors[key]) ? result.errors[key] : [JSON.stringify(result.errors[key])];
+                    errorDetails.push(` - ${key}: ${messages.join(', ')}`);
                 }
-            } catch (error) {
-                failCount++;
-                const errorMessage = error.response?.data?.message || 'Network/Server error.';
-                errorDetails.push(`Transaction on ${transaction.transaction_date}: ${errorMessage}`);
-                if (error.response?.data?.errors) {
-                    for (const key in error.response.data.errors) {
-                        errorDetails.push(` - ${key}: ${error.response.data.errors[key].join(', ')}`);
+            }
+        };
+
+        try {
+            // The whole array is sent in one request; the backend validates each row
+            // and reports per-row success or failure.
+            const response = await bulkCreateTransactions(transactionsData);
+            successCount = response.data.created;
+            failCount = response.data.failed;
+            collectRowErrors(response.data.results);
+        } catch (error) {
+            const report = error.response?.data?.errors;
+            if (report && Array.isArray(report.results)) {
+                failCount = report.failed;
+                collectRowErrors(report.results);
+            } else {
+                failCount = transactionsData.length;
+                errorDetails.push(error.response?.data?.message || 'Network/Server error.');
+                if (report) {
+                    for (const key in report) {
+                        errorDetails.push(` - ${key}: ${[].concat(report[key]).join(', ')}`);
                     }
                 }
-                console.error('Error uploading individual transaction:', transaction, error);
             }
+            console.error('Error uploading transactions:', error);
         }
 
         removeLoadingSpinner(targetElement);